@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""
+Benchmark for `compute_changes()` scaling
+
+Diffs two synthetic zones of increasing size and reports the time spent
+per record, which should stay roughly constant as the zone grows.
+Run it from the repository root with `PYTHONPATH=.`
+
+Usage:
+  bench_compute_changes.py [options]
+
+Options:
+  -h --help               Show this screen.
+  --sizes=SIZES           Comma separated zone sizes [default: 1000,10000,100000,1000000]
+  --changed=RATIO         Ratio of records modified between the two zones [default: 0.1]
+  --no-upsert             Diff with CREATE + DELETE instead of UPSERT operations
+"""
+
+import time
+
+from boto.route53.record import Record
+from docopt import docopt
+
+from route53_transfer.app import compute_changes
+
+ZONE = {"id": "BENCH", "name": "bench.dev."}
+
+
+def make_record(n, value):
+    record = Record()
+    record.name = f"host{n}.bench.dev."
+    record.type = "A"
+    record.ttl = "300"
+    record.resource_records = [value]
+    return record
+
+
+def make_zones(size, changed_ratio):
+    """
+    Returns the existing and desired record lists for a zone of `size`
+    records, with one in every `1 / changed_ratio` records modified.
+    """
+    every = max(1, int(1 / changed_ratio)) if changed_ratio else size + 1
+    existing = []
+    desired = []
+    for n in range(size):
+        existing.append(make_record(n, f"10.0.{n // 256 % 256}.{n % 256}"))
+        if n % every == 0:
+            desired.append(make_record(n, f"10.1.{n // 256 % 256}.{n % 256}"))
+        else:
+            desired.append(existing[-1])
+    return existing, desired
+
+
+def main():
+    params = docopt(__doc__)
+    sizes = [int(s) for s in params['--sizes'].split(',')]
+    changed_ratio = float(params['--changed'])
+    use_upsert = not params['--no-upsert']
+
+    print(f"{'records':>10} {'changes':>10} {'seconds':>10} {'us/record':>10}")
+    for size in sizes:
+        existing, desired = make_zones(size, changed_ratio)
+        start = time.perf_counter()
+        changes = compute_changes(ZONE, existing, desired, use_upsert=use_upsert)
+        elapsed = time.perf_counter() - start
+        print(f"{size:>10} {len(changes):>10} {elapsed:>10.3f} {elapsed / size * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
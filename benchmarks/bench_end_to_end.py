@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+"""
+End to end benchmark of the load and dump commands
+
+Runs the command line against the in-memory Route53 stand-in of
+`route53_transfer.testing`, with simulated request latency and
+throttling: a generated zone is loaded into an empty hosted zone, dumped,
+loaded again with a modified copy of it, and loaded a last time with no
+changes. Reports the wall time and the Route53 requests of each step.
+Run it from the repository root with `PYTHONPATH=.`
+
+Usage:
+  bench_end_to_end.py [options]
+
+Options:
+  -h --help               Show this screen.
+  --size=SIZE             Number of records of the zone [default: 10000]
+  --changed=RATIO         Ratio of records modified by the second load [default: 0.1]
+  --seed=SEED             Seed of the generated zone [default: 0]
+  --max-alias-chain=N     Maximum length of the chains of aliases of the zone [default: 3]
+  --latency=SECONDS       Latency of every Route53 request [default: 0.05]
+  --page-size=N           Record sets per ListResourceRecordSets page [default: 300]
+  --route53-rate=N        Requests per second accepted before throttling [default: 5]
+  --max-rate=N            Request rate of the command line [default: 5]
+  -o --output=FILE        Write the results as JSON to this file
+"""
+
+import ast
+import contextlib
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+
+from docopt import docopt
+
+from route53_transfer import app
+from route53_transfer.testing import FakeRoute53Connection, generate_zone, mutate_zone
+
+ZONE_NAME = "bench.dev"
+CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'bin', 'route53-transfer')
+
+
+def cli_params(argv):
+    with open(CLI) as f:
+        usage = ast.get_docstring(ast.parse(f.read()))
+    return docopt(usage, argv)
+
+
+def write_csv(records, path):
+    with open(path, 'w', newline='') as fout:
+        out = csv.writer(fout)
+        out.writerow(app.CSV_HEADER)
+        for record in records:
+            out.writerows(app.record_to_stringlist(record))
+
+
+def timed_run(con, argv):
+    calls_before = sum(con.calls.values())
+    throttled_before = con.throttled
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.run(cli_params(argv), con=con)
+    return {
+        "seconds": time.perf_counter() - start,
+        "requests": sum(con.calls.values()) - calls_before,
+        "throttled": con.throttled - throttled_before,
+    }
+
+
+def main():
+    params = docopt(__doc__)
+    size = int(params['--size'])
+    seed = int(params['--seed'])
+
+    con = FakeRoute53Connection(page_size=int(params['--page-size']),
+                                latency=float(params['--latency']),
+                                max_rate=float(params['--route53-rate']))
+    zone_id = con.add_zone(ZONE_NAME)
+    records = generate_zone(ZONE_NAME, size, seed=seed, zone_id=zone_id,
+                            max_alias_chain=int(params['--max-alias-chain']))
+    modified = mutate_zone(records, float(params['--changed']), seed=seed)
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'AKIAFAKE')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'fake')
+    options = ['--max-rate', params['--max-rate']]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        initial_csv = os.path.join(tmp, 'initial.csv')
+        modified_csv = os.path.join(tmp, 'modified.csv')
+        dump_csv = os.path.join(tmp, 'dump.csv')
+        write_csv(records, initial_csv)
+        write_csv(modified, modified_csv)
+
+        steps = [
+            ("load", options + ['load', ZONE_NAME, initial_csv]),
+            ("dump", options + ['dump', ZONE_NAME, dump_csv]),
+            ("load changes", options + ['load', ZONE_NAME, modified_csv]),
+            ("load unchanged", options + ['load', ZONE_NAME, modified_csv]),
+        ]
+
+        print(f"{'step':<16} {'records':>10} {'seconds':>10} {'requests':>10} {'throttled':>10}")
+        results = []
+        for name, argv in steps:
+            result = dict(step=name, records=size, **timed_run(con, argv))
+            print(f"{name:<16} {size:>10} {result['seconds']:>10.3f} "
+                  f"{result['requests']:>10} {result['throttled']:>10}")
+            results.append(result)
+
+    if params['--output']:
+        with open(params['--output'], 'w') as f:
+            json.dump({"parameters": {k.lstrip('-'): v for k, v in params.items()},
+                       "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of parsing and diffing a zone file on several processes
+
+Parses a CSV dump of a generated zone and diffs it against a modified
+copy of the zone, first in a single process like `load()` does by
+default, then with `route53_transfer.parallel` for each number of
+processes, and checks that the changes are the same. The speedup is
+bounded by the number of cores of the machine.
+Run it from the repository root with `PYTHONPATH=.`
+
+Usage:
+  bench_parallel.py [options]
+
+Options:
+  -h --help               Show this screen.
+  --size=SIZE             Number of records of the zone [default: 200000]
+  --changed=RATIO         Ratio of records modified between the two zones [default: 0.1]
+  --processes=LIST        Comma separated numbers of processes [default: 2,4,8]
+"""
+
+import csv
+import io
+import os
+import time
+
+from docopt import docopt
+
+from route53_transfer import app
+from route53_transfer.parallel import parallel_changes
+from route53_transfer.testing import generate_zone, mutate_zone
+
+ZONE = {"id": "ZGENERATED", "name": "bench.dev."}
+
+
+def main():
+    params = docopt(__doc__)
+    records = generate_zone("bench.dev", int(params['--size']))
+    existing = app.comparable(mutate_zone(records, float(params['--changed']), seed=1))
+
+    fout = io.StringIO()
+    out = csv.writer(fout)
+    out.writerow(app.CSV_HEADER)
+    for record in records:
+        out.writerows(app.record_to_stringlist(record))
+    zone_csv = fout.getvalue()
+
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'processes':>10} {'changes':>10} {'seconds':>10} {'speedup':>10}")
+
+    start = time.perf_counter()
+    expected = app.compute_changes(ZONE, existing, app.read_records(io.StringIO(zone_csv)))
+    serial = time.perf_counter() - start
+    print(f"{1:>10} {len(expected):>10} {serial:>10.3f} {1:>10.2f}")
+
+    for processes in [int(p) for p in params['--processes'].split(',')]:
+        start = time.perf_counter()
+        changes, _ = parallel_changes(ZONE, existing, io.StringIO(zone_csv),
+                                      processes=processes)
+        elapsed = time.perf_counter() - start
+        assert [(c["operation"], c["record"]) for c in changes] == \
+            [(c["operation"], c["record"]) for c in expected], "different changes"
+        print(f"{processes:>10} {len(changes):>10} {elapsed:>10.3f} {serial / elapsed:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
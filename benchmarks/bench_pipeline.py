@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+"""
+Benchmark for every stage of the dump and load pipeline
+
+Generates seeded synthetic zones of increasing size with
+`route53_transfer.testing`, then times each stage of the pipeline on them
+and measures the memory it allocates at its peak:
+
+* `record_to_stringlist`: writing the zone as a CSV dump
+* `read_records`: parsing the CSV dump back into records
+* `group_values`: grouping already parsed CSV rows into records
+* `compute_changes`: diffing the zone with a modified copy of it
+* `assign_change_priority`: ordering the changes for alias targets
+* `changes_to_r53_updates`: packing the changes into update batches
+* `to_rrsets`: building the boto change requests of the batches
+
+Results are printed as a table, and written as JSON with `--output`, to
+be compared between versions. Memory is measured with `tracemalloc`, in a
+separate run of each stage so that it doesn't slow down the timings.
+Run it from the repository root with `PYTHONPATH=.`
+
+Usage:
+  bench_pipeline.py [options]
+
+Options:
+  -h --help               Show this screen.
+  --sizes=SIZES           Comma separated zone sizes [default: 1000,10000,100000,1000000]
+  --changed=RATIO         Ratio of records modified between the two zones [default: 0.1]
+  --seed=SEED             Seed of the generated zones [default: 0]
+  --no-upsert             Diff with CREATE + DELETE instead of UPSERT operations
+  --no-memory             Only measure time, skipping the memory measurements
+  -o --output=FILE        Write the results as JSON to this file
+"""
+
+import csv
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from docopt import docopt
+
+from route53_transfer.app import (
+    CSV_HEADER,
+    assign_change_priority,
+    changes_to_r53_updates,
+    compute_changes,
+    group_values,
+    read_records,
+    record_to_stringlist,
+)
+from route53_transfer.testing import generate_zone, mutate_zone
+
+ZONE_NAME = "bench.dev"
+ZONE = {"id": "ZGENERATED", "name": ZONE_NAME + "."}
+
+
+def write_csv(records):
+    fout = io.StringIO()
+    out = csv.writer(fout)
+    out.writerow(CSV_HEADER)
+    for record in records:
+        out.writerows(record_to_stringlist(record))
+    return fout.getvalue()
+
+
+def csv_rows(csv_data):
+    rows = csv.reader(io.StringIO(csv_data))
+    next(rows)
+    return list(rows)
+
+
+def stages(existing, desired, use_upsert):
+    """
+    Returns the stages to benchmark, as (name, function) tuples. Each
+    function runs its stage on the output of the previous ones, and returns
+    the number of items it produced.
+    """
+    state = {}
+
+    def dump_csv():
+        state["csv"] = write_csv(existing)
+        state["rows"] = csv_rows(state["csv"])
+        return len(state["rows"])
+
+    def parse_csv():
+        return len(read_records(io.StringIO(state["csv"])))
+
+    def group_rows():
+        return sum(1 for _ in group_values(state["rows"]))
+
+    def diff():
+        state["changes"] = compute_changes(ZONE, existing, desired, use_upsert=use_upsert)
+        return len(state["changes"])
+
+    def prioritize():
+        assign_change_priority(ZONE, state["changes"])
+        return len(state["changes"])
+
+    def pack():
+        state["batches"] = changes_to_r53_updates(ZONE, state["changes"])
+        return len(state["batches"])
+
+    def to_rrsets():
+        return sum(len(batch.to_rrsets(None, ZONE).changes) for batch in state["batches"])
+
+    return [
+        ("record_to_stringlist", dump_csv),
+        ("read_records", parse_csv),
+        ("group_values", group_rows),
+        ("compute_changes", diff),
+        ("assign_change_priority", prioritize),
+        ("changes_to_r53_updates", pack),
+        ("to_rrsets", to_rrsets),
+    ]
+
+
+def measure_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(size, changed_ratio, seed, use_upsert, memory):
+    existing = generate_zone(ZONE_NAME, size, seed=seed, zone_id=ZONE["id"])
+    desired = mutate_zone(existing, changed_ratio, seed=seed)
+
+    results = []
+    for name, function in stages(existing, desired, use_upsert):
+        start = time.perf_counter()
+        items = function()
+        seconds = time.perf_counter() - start
+        results.append({
+            "stage": name,
+            "records": size,
+            "items": items,
+            "seconds": seconds,
+            "us_per_record": seconds / size * 1e6,
+            "peak_bytes": measure_memory(function) if memory else None,
+        })
+    return results
+
+
+def main():
+    params = docopt(__doc__)
+    sizes = [int(s) for s in params['--sizes'].split(',')]
+    changed_ratio = float(params['--changed'])
+    seed = int(params['--seed'])
+    use_upsert = not params['--no-upsert']
+    memory = not params['--no-memory']
+
+    print(f"{'stage':<24} {'records':>10} {'items':>10} {'seconds':>10} "
+          f"{'us/record':>10} {'peak MiB':>10}")
+    results = []
+    for size in sizes:
+        for result in run_benchmark(size, changed_ratio, seed, use_upsert, memory):
+            peak = f"{result['peak_bytes'] / 2 ** 20:.1f}" if memory else "-"
+            print(f"{result['stage']:<24} {size:>10} {result['items']:>10} "
+                  f"{result['seconds']:>10.3f} {result['us_per_record']:>10.2f} {peak:>10}")
+            sys.stdout.flush()
+            results.append(result)
+
+    if params['--output']:
+        with open(params['--output'], 'w') as f:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "parameters": {"changed": changed_ratio, "seed": seed, "use_upsert": use_upsert},
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
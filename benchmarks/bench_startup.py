@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""
+Startup time benchmark of the command line
+
+Runs short invocations of `bin/route53-transfer` in fresh interpreters,
+which is what shell loops over zones do: `--version`, and `validate` and
+`convert` of a small generated zone, which work on local files alone.
+Reports the median wall time of each, and the time above a bare
+`python -c pass`, which is what the command line adds to the startup of
+the interpreter. Exits with an error when that goes over the budget.
+Run it from the repository root with `PYTHONPATH=.`
+
+Usage:
+  bench_startup.py [options]
+
+Options:
+  -h --help               Show this screen.
+  --runs=N                Number of runs of each invocation [default: 20]
+  --size=SIZE             Number of records of the zone [default: 100]
+  --budget-ms=MS          Maximum milliseconds added to the interpreter startup [default: 100]
+  -o --output=FILE        Write the results as JSON to this file
+"""
+
+import csv
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from docopt import docopt
+
+from route53_transfer import app
+from route53_transfer.testing import generate_zone
+
+CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'bin', 'route53-transfer')
+
+
+def median_seconds(argv, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + argv, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    params = docopt(__doc__)
+    runs = int(params['--runs'])
+    budget = float(params['--budget-ms']) / 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        zone_csv = os.path.join(tmp, 'zone.csv')
+        with open(zone_csv, 'w', newline='') as fout:
+            out = csv.writer(fout)
+            out.writerow(app.CSV_HEADER)
+            for record in generate_zone('bench.dev', int(params['--size'])):
+                out.writerows(app.record_to_stringlist(record))
+
+        baseline = median_seconds(['-c', 'pass'], runs)
+        invocations = [
+            ("--version", [CLI, '--version']),
+            ("validate", [CLI, 'validate', zone_csv]),
+            ("convert", [CLI, 'convert', zone_csv, os.path.join(tmp, 'zone.r53s')]),
+        ]
+
+        print(f"{'invocation':<12} {'ms':>10} {'startup ms':>12}")
+        print(f"{'python':<12} {baseline * 1000:>10.1f}")
+        results = []
+        for name, argv in invocations:
+            seconds = median_seconds(argv, runs)
+            result = dict(invocation=name, seconds=seconds, startup_seconds=seconds - baseline)
+            print(f"{name:<12} {seconds * 1000:>10.1f} {result['startup_seconds'] * 1000:>12.1f}")
+            results.append(result)
+
+    if params['--output']:
+        with open(params['--output'], 'w') as f:
+            json.dump({"parameters": {k.lstrip('-'): v for k, v in params.items()},
+                       "baseline_seconds": baseline, "results": results}, f, indent=2)
+
+    over_budget = [r['invocation'] for r in results if r['startup_seconds'] > budget]
+    if over_budget:
+        sys.exit("Over the startup budget of {} ms: {}".format(
+            params['--budget-ms'], ', '.join(over_budget)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of transfer against dump and load between two accounts
+
+Runs the command line against two in-memory Route53 stand-ins of
+`route53_transfer.testing`, with simulated request latency: a generated
+zone in the source account is copied to a target account holding a
+modified copy of it, once by dumping it to a file and loading the file,
+and once with `transfer`, which lists both zones at the same time.
+Reports the wall time and the Route53 requests of each.
+Run it from the repository root with `PYTHONPATH=.`
+
+Usage:
+  bench_transfer.py [options]
+
+Options:
+  -h --help               Show this screen.
+  --size=SIZE             Number of records of the zone [default: 10000]
+  --changed=RATIO         Ratio of records of the target zone that differ [default: 0.01]
+  --latency=SECONDS       Latency of every Route53 request [default: 0.05]
+  --page-size=N           Record sets per ListResourceRecordSets page [default: 300]
+  --max-rate=N            Request rate of the command line, per account [default: 1000]
+  -o --output=FILE        Write the results as JSON to this file
+"""
+
+import ast
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from docopt import docopt
+
+from route53_transfer import app
+from route53_transfer.testing import FakeRoute53Connection, generate_zone, mutate_zone
+
+ZONE_NAME = "bench.dev"
+FIRST_ZONE_ID = "ZFAKE000000001"
+CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'bin', 'route53-transfer')
+
+
+def cli_params(argv):
+    with open(CLI) as f:
+        usage = ast.get_docstring(ast.parse(f.read()))
+    return docopt(usage, argv)
+
+
+def make_accounts(params):
+    """
+    Returns the source and target accounts, the target zone holding a
+    modified copy of the source zone.
+    """
+    # The first zone of every account gets the same id, which the aliases
+    # of the generated zone point to
+    records = generate_zone(ZONE_NAME, int(params['--size']), zone_id=FIRST_ZONE_ID)
+    accounts = []
+    for zone_records in (records, mutate_zone(records, float(params['--changed']))):
+        con = FakeRoute53Connection(page_size=int(params['--page-size']),
+                                    latency=float(params['--latency']))
+        assert con.add_zone(ZONE_NAME, zone_records) == FIRST_ZONE_ID
+        accounts.append(con)
+    return accounts
+
+
+def main():
+    params = docopt(__doc__)
+    options = ['--max-rate', params['--max-rate'], '--access-key-id', 'AKIAFAKE',
+               '--secret-key', 'fake']
+    results = []
+
+    print(f"{'method':<16} {'seconds':>10} {'requests':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        dump_csv = os.path.join(tmp, 'dump.csv')
+        for method in ("dump and load", "transfer"):
+            source, target = make_accounts(params)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                if method == "transfer":
+                    app.run(cli_params(options + [
+                        '--target-access-key-id', 'AKIATARGET', '--target-secret-key', 'fake',
+                        'transfer', ZONE_NAME]), con=source, target_con=target)
+                else:
+                    app.run(cli_params(options + ['dump', ZONE_NAME, dump_csv]), con=source)
+                    app.run(cli_params(options + ['load', ZONE_NAME, dump_csv]), con=target)
+            result = dict(method=method, seconds=time.perf_counter() - start,
+                          requests=sum(source.calls.values()) + sum(target.calls.values()))
+            print(f"{method:<16} {result['seconds']:>10.3f} {result['requests']:>10}")
+            results.append(result)
+
+    if params['--output']:
+        with open(params['--output'], 'w') as f:
+            json.dump({"parameters": {k.lstrip('-'): v for k, v in params.items()},
+                       "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
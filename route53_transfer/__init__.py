@@ -2,4 +2,11 @@ from __future__ import absolute_import
 
 __version__ = "0.1.3_dev"
 
-from .app import load, dump
+
+def __getattr__(name):
+    # The app module, and boto with it, are only imported when they're
+    # used, so that getting the version of the package stays cheap
+    if name in ('load', 'dump'):
+        from . import app
+        return getattr(app, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
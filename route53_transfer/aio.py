@@ -0,0 +1,150 @@
+"""
+Asyncio versions of `load()` and `dump()`
+
+The boto Route53 calls are blocking, so they run on the event loop's
+default executor. What the async versions add is overlap between the
+steps the synchronous functions run one after the other:
+
+* `load()` parses the input file while the zone is being resolved and its
+  existing records are still downloading.
+
+* `dump()` requests the next page of records while the current one is
+  being written out.
+
+They take the same arguments and return the same values as their
+counterparts in `route53_transfer.app`, and can be gathered to work on
+several zones at once. Arguments they don't know of raise a TypeError.
+With `stats`, the phases running at the same time are timed each on its
+own, so their times add up to more than the time the run took.
+"""
+
+import asyncio
+import csv
+import functools
+
+from . import app
+from .stats import RunStats
+
+# Keyword arguments of the app functions the async versions take
+LOAD_OPTIONS = ('dry_run', 'use_upsert', 'vpc', 'zones', 'zone_cache', 'rrset_cache',
+                'wait', 'wait_timeout', 'change_waiter', 'file_format', 'stats', 'processes')
+DUMP_OPTIONS = ('vpc', 'zones', 'zone_cache', 'file_format', 'sort', 'stats')
+
+
+def check_options(function_name, kwargs, options):
+    """
+    Raises a TypeError naming the keyword arguments in `kwargs` that
+    aren't among `options`.
+    """
+    unknown = sorted(set(kwargs) - set(options))
+    if unknown:
+        raise TypeError("{}() got unexpected keyword arguments: {}".format(
+            function_name, ', '.join(unknown)))
+
+
+def timed(stats, phase, function):
+    """
+    Returns a function calling `function`, adding the time it takes to
+    `phase` of `stats`.
+    """
+    def timed_function(*args):
+        with stats.phase(phase):
+            return function(*args)
+    return timed_function
+
+
+async def load(con, zone_name, file_in, **kwargs):
+    ''' Send DNS records from input file to Route 53.
+
+        Arguments are Route53 connection, zone name, vpc info, and file to open for reading.
+        Returns the number of changes computed for the zone.
+    '''
+    check_options('load', kwargs, LOAD_OPTIONS)
+    loop = asyncio.get_running_loop()
+
+    stats = kwargs.get('stats') or RunStats()
+    kwargs = dict(kwargs, stats=stats)
+
+    def run(function, *args, **options):
+        return loop.run_in_executor(
+            None, functools.partial(function, *args, **dict(kwargs, **options)))
+
+    # With several processes, the worker processes parse their shard of a
+    # CSV file as they diff it, once the zone is listed
+    parsing = None
+    if not app.parses_in_processes(**kwargs):
+        parsing = run(app.read_load_records, file_in)
+
+    try:
+        zone, existing_records = await run(app.find_load_zone, con, zone_name)
+    except BaseException:
+        if parsing is not None:
+            # The file isn't left to the caller while it's still being read
+            await asyncio.gather(parsing, return_exceptions=True)
+        raise
+
+    desired_records = await parsing if parsing is not None else None
+    changes = await run(app.diff_load_records, zone, existing_records, file_in,
+                        desired_records=desired_records)
+
+    await run(app.commit_changes, con, zone, changes, existing_records)
+    return len(changes)
+
+
+async def dump(con, zone_name, fout, **kwargs):
+    ''' Receive DNS records from Route 53 to output file.
+
+        Arguments are Route53 connection, zone name, vpc info, and file to open for writing.
+        Returns the number of resource record sets written.
+    '''
+    check_options('dump', kwargs, DUMP_OPTIONS)
+    loop = asyncio.get_running_loop()
+
+    vpc = kwargs.get('vpc', {})
+    stats = kwargs.get('stats') or RunStats()
+
+    zone = await loop.run_in_executor(
+        None, timed(stats, 'zone',
+                    lambda: app.get_zone(con, zone_name, vpc, zones=kwargs.get('zones'),
+                                         cache=kwargs.get('zone_cache'))))
+    if not zone:
+        app.exit_with_error("ERROR: {} zone {} not found!".format(
+            'Private' if vpc.get('is_private') else 'Public', zone_name))
+
+    if kwargs.get('file_format') == 'binary':
+        from .snapshot import write_snapshot
+
+        # Snapshots are sorted, so the whole zone is listed first
+        records = await loop.run_in_executor(
+            None, timed(stats, 'list', lambda: list(app.iter_rrsets(con, zone['id']))))
+        record_count = await loop.run_in_executor(
+            None, timed(stats, 'write', write_snapshot), records, fout)
+        stats.count('records_written', record_count)
+        return record_count
+
+    out = csv.writer(fout)
+    out.writerow(app.CSV_HEADER)
+    fout.flush()
+
+    if kwargs.get('sort'):
+        return await loop.run_in_executor(None, app.dump_sorted, con, zone, out, stats)
+
+    pages = app.iter_rrset_pages(con, zone['id'])
+    next_page = timed(stats, 'list', lambda: next(pages, None))
+    fetching = loop.run_in_executor(None, next_page)
+
+    record_count = 0
+    while True:
+        page = await fetching
+        if page is None:
+            break
+
+        fetching = loop.run_in_executor(None, next_page)
+        with stats.phase('write'):
+            for r in page:
+                out.writerows(app.record_to_stringlist(r))
+            fout.flush()
+        record_count += len(page)
+
+    stats.count('records_written', record_count)
+    return record_count
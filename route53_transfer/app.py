@@ -1,18 +1,54 @@
 from __future__ import print_function
 from collections import defaultdict
 
-import csv, sys, time
+import csv, os, sys, tempfile, time, uuid
 from datetime import datetime
+import heapq
 import itertools
 from os import environ
+from typing import TYPE_CHECKING
 
-from boto import route53
-from boto import connect_s3
-from boto.route53.record import Record, ResourceRecordSets
-from boto.s3.key import Key
+# boto, the throttling of Route53 calls and thread pools are imported
+# where they're needed, so that commands working on local files alone,
+# like `validate` or `convert`, start without loading any of them
+from .propagation import DEFAULT_WAIT_TIMEOUT, ChangeWaiter
+from .stats import RunStats, StatsConnection, count_transfers
+from .zone_cache import DEFAULT_ZONE_CACHE_TTL, ZoneCache
+
+if TYPE_CHECKING:
+    from boto.route53.record import Record
 
 ts = time.strftime("%Y-%m-%dT%H:%M:%SZ", datetime.utcnow().utctimetuple())
 
+CSV_HEADER = ['NAME', 'TYPE', 'VALUE', 'TTL', 'REGION', 'WEIGHT', 'SETID', 'FAILOVER', 'EVALUATE_HEALTH',
+              'HEALTH_CHECK']
+
+# Formats of the files written by dump() and read by load(): the CSV
+# layout of CSV_HEADER, or the binary snapshots of route53_transfer.snapshot
+FILE_FORMATS = ('csv', 'binary')
+
+# Commands of the command line, and those that only work on local files
+# and never connect to AWS
+COMMANDS = ('load', 'dump', 'load-all', 'dump-all', 'transfer', 'plan', 'apply', 'archive',
+            'unarchive', 'convert', 'validate', 'diff')
+OFFLINE_COMMANDS = ('validate', 'convert', 'unarchive', 'diff')
+
+# Maximum number of CSV rows sorted in memory before spilling to disk
+SORT_CHUNK_SIZE = 100000
+
+# In-process cache of hosted zone lookups, used unless another is given
+ZONE_CACHE = ZoneCache()
+
+# Maximum concurrent GetHostedZone requests when matching private zones
+MAX_ZONE_LOOKUP_WORKERS = 8
+
+# Number of zones processed at the same time by dump_all() and load_all()
+DEFAULT_CONCURRENCY = 4
+
+# Route53 limits for a single ChangeResourceRecordSets request
+MAX_BATCH_RECORDS = 1000
+MAX_BATCH_VALUE_CHARS = 32000
+
 
 class ChangeBatch():
     """
@@ -21,60 +57,154 @@ class ChangeBatch():
     Having such a class simplifies the handling of the change operations as
     we can use `ChangeBatch.add_change()` passing the change operation dict
     as it was returned by `compute_changes()`.
+
+    The batch keeps track of how much it counts against the Route53 request
+    limits (see `change_size()`), so callers can check with `fits()` whether
+    more changes can be added to it.
+
+    `prio` is the priority of its changes (see `assign_change_priority()`):
+    a batch depends on the batches of higher priority committed before it.
     """
-    def __init__(self):
+    def __init__(self, max_records=MAX_BATCH_RECORDS,
+                 max_value_chars=MAX_BATCH_VALUE_CHARS, prio=0):
         self._changes = []
+        self.prio = prio
+        self.max_records = max_records
+        self.max_value_chars = max_value_chars
+        self.record_count = 0
+        self.value_chars = 0
 
     @property
     def changes(self):
         return self._changes
 
-    def add_change(self, change_operation):
+    def fits(self, size) -> bool:
+        records, value_chars = size
+        return (self.record_count + records <= self.max_records and
+                self.value_chars + value_chars <= self.max_value_chars)
+
+    def add_change(self, change_operation, size=None):
         record = change_operation["record"]
         change = dict()
         change["operation"] = change_operation["operation"]
-        change["change_dict"] = {**record.to_change_dict()}
-        change["rr_values"] = []
-        for value in record.resource_records:
-            change["rr_values"].append(value)
+        change["record"] = record
+        change["change_dict"] = record.to_change_dict()
         self._changes.append(change)
 
+        records, value_chars = size or change_size(change_operation)
+        self.record_count += records
+        self.value_chars += value_chars
+
     def to_rrsets(self, con, zone):
+        from boto.route53.record import ResourceRecordSets
+
         rrsets = ResourceRecordSets(con, zone['id'])
 
         for change in self.changes:
-            operation = change['operation']
-            change_dict = change['change_dict']
-            rrset = rrsets.add_change(operation, **change_dict)
-            for value in change['rr_values']:
-                rrset.add_value(value)
+            rrsets.add_change_record(change['operation'],
+                                     change['record'].to_record())
 
         return rrsets
 
 
+def change_size(change_operation) -> tuple:
+    """
+    Returns how much a change operation counts against the Route53 limits
+    of a single change request, as a (resource records, value characters)
+    tuple. UPSERT changes count twice. Alias records have no values, but
+    are counted as one record so that they also take up room in a batch.
+    """
+    record = change_operation["record"]
+    factor = 2 if change_operation["operation"] == "UPSERT" else 1
+    records = max(1, len(record.resource_records))
+    value_chars = sum(map(len, record.resource_records))
+    return records * factor, value_chars * factor
+
+
+def _record_field(index):
+    return property(lambda self: self._values[index])
+
+
 class ComparableRecord(object):
-    def __init__(self, obj):
-        for k, v in obj.__dict__.items():
-            self.__dict__[k] = v
+    """
+    Immutable, canonical representation of a Route53 resource record set
+
+    Instances are compact (`__slots__`), can be used as set members and dict
+    keys, and compute their hash only once. The resource record values are
+    kept as a sorted tuple, so two records holding the same values in a
+    different order compare as equal.
+
+    Use `ComparableRecord.from_record()` to build one from a
+    `boto.route53.record.Record` and `to_record()` to convert it back.
+    """
+    FIELDS = ('name', 'type', 'ttl', 'resource_records',
+              'alias_hosted_zone_id', 'alias_dns_name', 'identifier',
+              'weight', 'region', 'alias_evaluate_target_health',
+              'health_check', 'failover')
+
+    # Fields accepted by ResourceRecordSets.add_change()
+    CHANGE_FIELDS = FIELDS[:3] + FIELDS[4:]
+
+    __slots__ = ('_values', '_hash')
+
+    name = _record_field(0)
+    type = _record_field(1)
+    ttl = _record_field(2)
+    resource_records = _record_field(3)
+    alias_hosted_zone_id = _record_field(4)
+    alias_dns_name = _record_field(5)
+    identifier = _record_field(6)
+    weight = _record_field(7)
+    region = _record_field(8)
+    alias_evaluate_target_health = _record_field(9)
+    health_check = _record_field(10)
+    failover = _record_field(11)
+
+    def __init__(self, name=None, type=None, ttl=600, resource_records=None,
+                 alias_hosted_zone_id=None, alias_dns_name=None,
+                 identifier=None, weight=None, region=None,
+                 alias_evaluate_target_health=None, health_check=None,
+                 failover=None):
+        values = (name, type, ttl, tuple(sorted(resource_records or ())),
+                  alias_hosted_zone_id, alias_dns_name, identifier, weight,
+                  region, alias_evaluate_target_health, health_check, failover)
+        object.__setattr__(self, '_values', values)
+        object.__setattr__(self, '_hash', hash(values))
+
+    @classmethod
+    def from_record(cls, record):
+        if isinstance(record, cls):
+            return record
+        return cls(record.name, record.type, record.ttl,
+                   record.resource_records, record.alias_hosted_zone_id,
+                   record.alias_dns_name, record.identifier, record.weight,
+                   record.region, record.alias_evaluate_target_health,
+                   record.health_check, record.failover)
+
+    def to_record(self) -> 'Record':
+        from boto.route53.record import Record
+
+        return Record(resource_records=list(self.resource_records),
+                      **self.to_change_dict())
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        # Rebuilt through __init__, as string hashes differ between processes
+        return type(self), self._values
 
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        if not isinstance(other, ComparableRecord):
+            return NotImplemented
+        return self._hash == other._hash and self._values == other._values
 
     def __hash__(self):
-        it = (self.name, self.type, self.alias_hosted_zone_id,
-              self.alias_dns_name, tuple(sorted(self.resource_records)),
-              self.ttl, self.region, self.weight, self.identifier,
-              self.failover, self.alias_evaluate_target_health)
-        return it.__hash__()
+        return self._hash
 
     def to_change_dict(self):
-        data = {}
-        for k, v in self.__dict__.items():
-            if k == 'resource_records':
-                continue
-            else:
-                data[k] = v
-        return data
+        values = self._values
+        return dict(zip(self.CHANGE_FIELDS, values[:3] + values[4:]))
 
     def __repr__(self):
         rr = " ".join(self.resource_records)
@@ -102,119 +232,507 @@ def get_aws_credentials(params):
     return access_key, secret_key
 
 
-def get_zone(con, zone_name, vpc):
+def get_target_credentials(params):
+    """
+    Returns the credentials of the account `transfer` copies zones to,
+    which have no default.
+    """
+    access_key = params.get('--target-access-key-id')
+    if params.get('--target-secret-key-file'):
+        with open(params.get('--target-secret-key-file')) as f:
+            secret_key = f.read().strip()
+    else:
+        secret_key = params.get('--target-secret-key')
+    if not (access_key and secret_key):
+        exit_with_error("ERROR: transfer needs the credentials of the target account "
+                        "(--target-access-key-id, --target-secret-key)")
+    return access_key, secret_key
+
 
+def get_hosted_zones(con):
     res = con.get_all_hosted_zones()
-    zones = res['ListHostedZonesResponse']['HostedZones']
-    zone_list = [z for z in zones
-                    if z['Config']['PrivateZone'] == (u'true' if vpc.get('is_private') else u'false')
-                        and z['Name'] == zone_name + '.']
-
-    for zone in zone_list:
-        data = {}
-        data['id'] = zone.get('Id','').replace('/hostedzone/', '')
-        data['name'] = zone.get('Name')
-        if vpc.get("is_private"):
-            z = con.get_hosted_zone(data.get('id'))
-            z_vpc_id = z.get('GetHostedZoneResponse',{}).get('VPCs',{}).get('VPC',{}).get('VPCId','')
-            if z_vpc_id == vpc.get('id'):
-                return data
-            else:
-                continue
+    return res['ListHostedZonesResponse']['HostedZones']
+
+
+def parse_response(response, list_marker, item_marker) -> dict:
+    """
+    Parses the XML body of a Route53 response made with `make_request()`,
+    as boto does for the calls it implements.
+
+    :raises DNSServerError: if Route53 answered with an error
+    """
+    from boto import jsonresponse
+    from boto.route53.exception import DNSServerError
+
+    body = response.read()
+    if response.status >= 300:
+        raise DNSServerError(response.status, response.reason, body)
+
+    e = jsonresponse.Element(list_marker=list_marker, item_marker=item_marker)
+    h = jsonresponse.XmlHandler(e, None)
+    h.parse(body)
+    return e
+
+
+def list_hosted_zones_by_name(con, dns_name, hosted_zone_id=None, maxitems=None):
+    """
+    Sends a single ListHostedZonesByName request, which lists the hosted
+    zones in name order starting at `dns_name` (and `hosted_zone_id`, when
+    continuing a truncated listing).
+
+    :return: the ListHostedZonesByNameResponse dict
+    """
+    params = {'dnsname': dns_name, 'hostedzoneid': hosted_zone_id,
+              'maxitems': maxitems}
+    response = con.make_request('GET', '/%s/hostedzonesbyname' % con.Version,
+                                params=params)
+    e = parse_response(response, 'HostedZones', ('HostedZone',))
+    return e['ListHostedZonesByNameResponse']
+
+
+def find_hosted_zones(con, zone_name, is_private, cache=None):
+    """
+    Returns the hosted zones named `zone_name` with the given privacy flag.
+
+    Instead of listing every zone of the account, the listing starts at
+    `zone_name` and stops as soon as it moves past it. The zones found are
+    kept in `cache` (by default, the in-process `ZONE_CACHE`); a miss isn't,
+    since the zone may be created at any time by someone else.
+
+    :return: list of hosted zone dicts with `Id`, `Name` and `Config` keys
+    """
+    if cache is None:
+        cache = ZONE_CACHE
+
+    account = getattr(con, 'aws_access_key_id', None)
+    zones = cache.get(account, is_private, zone_name)
+    if zones is not None:
+        return zones
+
+    name = zone_name.rstrip('.').lower() + '.'
+    private = u'true' if is_private else u'false'
+
+    zones = []
+    dns_name, hosted_zone_id = name, None
+    while dns_name is not None:
+        res = list_hosted_zones_by_name(con, dns_name, hosted_zone_id)
+        for z in res['HostedZones']:
+            if z['Name'].lower() != name:
+                dns_name = None
+                break
+            if z['Config']['PrivateZone'] == private:
+                zones.append({'Id': z['Id'], 'Name': z['Name'],
+                              'Config': {'PrivateZone': z['Config']['PrivateZone']}})
         else:
-            return data
+            if res.get('IsTruncated') == 'true':
+                dns_name = res['NextDNSName']
+                hosted_zone_id = res['NextHostedZoneId']
+            else:
+                dns_name = None
+
+    if zones:
+        cache.put(account, is_private, zone_name, zones)
+    return zones
+
+
+def get_zone(con, zone_name, vpc, zones=None, cache=None):
+    """
+    Finds the hosted zone named `zone_name` matching the given vpc info.
+
+    :param zones: hosted zones list as returned by `get_hosted_zones()`.
+           If not given, the zones are looked up with `find_hosted_zones()`.
+    :param cache: ZoneCache used to look up the zones and, for private
+           zones, their VPC associations
+    """
+    if zones is None:
+        zone_list = find_hosted_zones(con, zone_name, vpc.get('is_private'), cache)
     else:
+        zone_list = [z for z in zones
+                        if z['Config']['PrivateZone'] == (u'true' if vpc.get('is_private') else u'false')
+                            and z['Name'] == zone_name + '.']
+
+    if vpc.get('is_private') and zone_list:
+        zone_list = filter_vpc_zones(con, zone_list, vpc, cache)
+
+    if not zone_list:
         return None
 
+    zone = zone_list[0]
+    return {'id': zone_id(zone), 'name': zone.get('Name')}
+
 
-def create_zone(con, zone_name, vpc):
-    con.create_hosted_zone(domain_name=zone_name,
-                           private_zone=vpc.get('is_private'),
-                           vpc_region=vpc.get('region'),
-                           vpc_id=vpc.get('id'),
-                           comment='autogenerated by route53-transfer @ {}'.format(ts))
-    return get_zone(con, zone_name, vpc)
+def zone_id(zone: dict) -> str:
+    return zone.get('Id', '').replace('/hostedzone/', '')
+
+
+def get_hosted_zone_vpcs(con, hosted_zone_id):
+    """
+    Returns every VPC associated with a private hosted zone, as a list of
+    `{"VPCRegion": ..., "VPCId": ...}` dicts.
+    """
+    uri = '/%s/hostedzone/%s' % (con.Version, hosted_zone_id)
+    response = con.make_request('GET', uri)
+    e = parse_response(response, ('NameServers', 'VPCs'), ('NameServer', 'VPC'))
+    return e['GetHostedZoneResponse'].get('VPCs', [])
+
+
+def list_hosted_zones_by_vpc(con, vpc_id, vpc_region):
+    """
+    Returns the ids of all the hosted zones associated with a VPC, using
+    ListHostedZonesByVPC and following its pagination tokens.
+    """
+    zone_ids = []
+    next_token = None
+    while True:
+        params = {'vpcid': vpc_id, 'vpcregion': vpc_region, 'nexttoken': next_token}
+        response = con.make_request('GET', '/%s/hostedzonesbyvpc' % con.Version,
+                                    params=params)
+        e = parse_response(response, 'HostedZoneSummaries', ('HostedZoneSummary',))
+        res = e['ListHostedZonesByVPCResponse']
+
+        zone_ids.extend(z['HostedZoneId'] for z in res['HostedZoneSummaries'])
+        next_token = res.get('NextToken')
+        if not next_token:
+            return zone_ids
+
+
+def filter_vpc_zones(con, zones, vpc, cache=None):
+    """
+    Returns the private hosted zones among `zones` that are associated
+    with the VPC in `vpc`, looking at every VPC association of each zone.
+
+    A single candidate zone is checked with GetHostedZone. With several
+    candidates, all the zones of the VPC are listed at once with
+    ListHostedZonesByVPC and, should that not be allowed, the candidates
+    are checked with concurrent GetHostedZone requests instead. Both the
+    zone to VPC and VPC to zones mappings are cached.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from boto.route53.exception import DNSServerError
+
+    if cache is None:
+        cache = ZONE_CACHE
+    account = getattr(con, 'aws_access_key_id', None)
+
+    if len(zones) > 1:
+        vpc_zone_ids = cache.get_vpc_zones(account, vpc.get('region'), vpc.get('id'))
+        if vpc_zone_ids is None:
+            try:
+                vpc_zone_ids = list_hosted_zones_by_vpc(con, vpc.get('id'), vpc.get('region'))
+            except DNSServerError:
+                vpc_zone_ids = None
+            else:
+                cache.put_vpc_zones(account, vpc.get('region'), vpc.get('id'), vpc_zone_ids)
+
+        if vpc_zone_ids is not None:
+            vpc_zone_ids = set(vpc_zone_ids)
+            return [z for z in zones if zone_id(z) in vpc_zone_ids]
+
+    def zone_vpcs(zone):
+        vpcs = cache.get_zone_vpcs(account, zone_id(zone))
+        if vpcs is None:
+            vpcs = get_hosted_zone_vpcs(con, zone_id(zone))
+            cache.put_zone_vpcs(account, zone_id(zone), vpcs)
+        return vpcs
+
+    with ThreadPoolExecutor(max_workers=min(len(zones), MAX_ZONE_LOOKUP_WORKERS)) as executor:
+        all_vpcs = list(executor.map(zone_vpcs, zones))
+
+    return [zone for zone, vpcs in zip(zones, all_vpcs)
+            if any(v.get('VPCId') == vpc.get('id') for v in vpcs)]
+
+
+def create_zone(con, zone_name, vpc, cache=None):
+    from boto.route53.exception import DNSServerError
+
+    # The cached lookups that led here may predate the zone being created
+    # out-of-band: look it up again, bypassing the cache, before creating it
+    response = None
+    if get_zone(con, zone_name, vpc, cache=ZoneCache()) is None:
+        # Retries of the request send the same caller reference, which
+        # Route53 turns down once the zone exists, rather than creating
+        # another one
+        caller_ref = str(uuid.uuid4())
+        try:
+            response = con.create_hosted_zone(domain_name=zone_name,
+                                              caller_ref=caller_ref,
+                                              private_zone=vpc.get('is_private'),
+                                              vpc_region=vpc.get('region'),
+                                              vpc_id=vpc.get('id'),
+                                              comment='autogenerated by route53-transfer @ {}'.format(ts))
+        except DNSServerError as e:
+            if e.error_code != 'HostedZoneAlreadyExists':
+                raise
+
+    if cache is None:
+        cache = ZONE_CACHE
+    account = getattr(con, 'aws_access_key_id', None)
+    cache.invalidate(account, vpc.get('is_private'), zone_name)
+    if vpc.get('is_private'):
+        # The VPC to zones mapping cached by filter_vpc_zones() lacks the
+        # new zone
+        cache.invalidate_vpc_zones(account, vpc.get('region'), vpc.get('id'))
+        if response is not None:
+            cache.invalidate_zone_vpcs(
+                account, zone_id(response['CreateHostedZoneResponse']['HostedZone']))
+
+    zone = get_zone(con, zone_name, vpc, cache=cache)
+    if not zone:
+        exit_with_error("ERROR: Created {} zone {} not found!\n".format(
+            'private' if vpc.get('is_private') else 'public', zone_name))
+    return zone
 
 
 def inflate_csv_record(all_recs):
     """
-    Converts a CSV zone record into a route53.record.Record instance
+    Converts a CSV zone record into a ComparableRecord instance
 
     Example:
 
-        NAME,TYPE,VALUE,TTL,REGION,WEIGHT,SETID,FAILOVER,EVALUATE_HEALTH
-        db.example.com.,A,1.2.3.4,300,,,production-db,,
+        NAME,TYPE,VALUE,TTL,REGION,WEIGHT,SETID,FAILOVER,EVALUATE_HEALTH,HEALTH_CHECK
+        db.example.com.,A,1.2.3.4,300,,,production-db,,,
+
+    Dumps written before the HEALTH_CHECK column was added have one
+    column less, and records without a health check.
 
     :param all_recs: All CSV records for a single resource
-    :return: Record
+    :return: ComparableRecord
     """
-    record = Record()
-
     # List of CSV fields as parsed from a single line of a zone dump
     csv_fields = all_recs[0]
 
-    record.name = csv_fields[0]
-    record.type = csv_fields[1]
+    fields = dict()
+    fields['name'] = csv_fields[0]
+    fields['type'] = csv_fields[1]
 
     if csv_fields[2].startswith('ALIAS'):
         _, alias_hosted_zone_id, alias_dns_name = csv_fields[2].split(':')
-        record.alias_hosted_zone_id = alias_hosted_zone_id
-        record.alias_dns_name = alias_dns_name
+        fields['alias_hosted_zone_id'] = alias_hosted_zone_id
+        fields['alias_dns_name'] = alias_dns_name
     else:
-        record.resource_records = [r[2] for r in all_recs]
-        record.ttl = csv_fields[3]
+        fields['resource_records'] = [r[2] for r in all_recs]
+        fields['ttl'] = csv_fields[3]
 
-    record.region = csv_fields[4] or None
-    record.weight = csv_fields[5] or None
-    record.identifier = csv_fields[6] or None
-    record.failover = csv_fields[7] or None
+    fields['region'] = csv_fields[4] or None
+    fields['weight'] = csv_fields[5] or None
+    fields['identifier'] = csv_fields[6] or None
+    fields['failover'] = csv_fields[7] or None
+    fields['health_check'] = (csv_fields[9] or None) if len(csv_fields) > 9 else None
 
     try:
         if csv_fields[8] == 'True':
-            record.alias_evaluate_target_health = True
+            fields['alias_evaluate_target_health'] = True
         elif csv_fields[8] == 'False':
-            record.alias_evaluate_target_health = False
+            fields['alias_evaluate_target_health'] = False
         else:
-            record.alias_evaluate_target_health = None
+            fields['alias_evaluate_target_health'] = None
     except IndexError as e:
         print("Invalid record: ", csv_fields)
         raise e
 
-    return record
+    return ComparableRecord(**fields)
 
 
-def group_values(lines):
-    records = []
-    for _, records in itertools.groupby(lines, lambda row: row[0:2]):
-        for __, by_value in itertools.groupby(records, lambda row: row[-3:]):
-            recs = list(by_value)  # consume the iterator so we can grab positionally
-            record = inflate_csv_record(recs)
+def csv_group_key(row: list) -> tuple:
+    """
+    Returns the grouping key of a CSV zone row. All the rows sharing the
+    same key hold the values of a single resource record set.
+    """
+    return tuple(row[0:2] + row[6:])
 
-            yield record
+
+def sort_rows(rows, key, chunk_size=SORT_CHUNK_SIZE):
+    """
+    Sorts an iterable of CSV rows by `key` using bounded memory.
+
+    Rows are sorted in memory in chunks of at most `chunk_size` rows. When
+    the input fits in a single chunk, that's all there is to it. Otherwise,
+    every sorted chunk is spilled to a temporary file and the chunks are
+    merged back together. The sort is stable, so rows with the same key
+    keep their input order.
+
+    :param rows: iterable of CSV rows (lists of strings)
+    :param key: function returning the sort key of a row
+    :param chunk_size: maximum number of rows held in memory
+    :return: generator of the sorted rows
+    """
+    rows = iter(rows)
+    chunk_files = []
+
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            chunk.sort(key=key)
+
+            if not chunk_files and len(chunk) < chunk_size:
+                yield from chunk
+                return
+
+            if not chunk:
+                break
+
+            chunk_file = tempfile.TemporaryFile(mode='w+', newline='')
+            csv.writer(chunk_file).writerows(chunk)
+            chunk_file.seek(0)
+            chunk_files.append(chunk_file)
+
+        yield from heapq.merge(*[csv.reader(f) for f in chunk_files], key=key)
+    finally:
+        for chunk_file in chunk_files:
+            chunk_file.close()
+
+
+def group_values(lines, chunk_size=SORT_CHUNK_SIZE, key=csv_group_key):
+    """
+    Groups the CSV rows of a zone dump into records, one per resource
+    record set, regardless of the order the rows come in.
+
+    :param lines: iterable of CSV rows
+    :param chunk_size: maximum number of rows held in memory while grouping
+    :param key: function returning the grouping key of a row, by which
+           the records come out sorted
+    :return: generator of ComparableRecord
+    """
+    sorted_lines = sort_rows(lines, key, chunk_size=chunk_size)
+    for _, rows in itertools.groupby(sorted_lines, key):
+        yield inflate_csv_record(list(rows))
 
 
 def read_lines(file_in):
     reader = csv.reader(file_in)
-    lines = list(reader)
-    if lines[0][0] == 'NAME':
-        lines = lines[1:]
-    return lines
+    for line in reader:
+        if not line or (reader.line_num == 1 and line[0] == 'NAME'):
+            continue
+        yield line
+
+
+def iter_records(file_in):
+    return group_values(read_lines(file_in))
 
 
 def read_records(file_in):
-    return list(group_values(read_lines(file_in)))
+    return list(iter_records(file_in))
+
+
+def iter_rrset_pages(con, zone_id):
+    """
+    Lists the resource record sets of a zone one ListResourceRecordSets
+    page at a time, so callers can process each page as soon as it
+    arrives, without holding the whole zone in memory.
+
+    :param con: Route53 connection
+    :param zone_id: id of the hosted zone
+    :return: generator of lists of boto Records, one list per page
+    """
+    page = con.get_all_rrsets(zone_id)
+    while True:
+        # Slicing yields a plain list, bypassing the auto-paging iterator
+        # of ResourceRecordSets
+        yield page[:]
+        if not page.is_truncated:
+            break
+        page = con.get_all_rrsets(zone_id,
+                                  name=page.next_record_name,
+                                  type=page.next_record_type,
+                                  identifier=page.next_record_identifier)
+
+
+def iter_rrsets(con, zone_id):
+    for page in iter_rrset_pages(con, zone_id):
+        yield from page
 
 
 def skip_apex_soa_ns(zone, records):
+    if zone['name'] is None:
+        yield from records
+        return
+
+    apex = zone['name'].rstrip('.').lower()
     for record in records:
-        if record.name == zone['name'] and record.type in ['SOA', 'NS']:
+        if record.type in ['SOA', 'NS'] and record.name.rstrip('.').lower() == apex:
             continue
         else:
             yield record
 
 
 def comparable(records):
-    return {ComparableRecord(record) for record in records}
+    return {ComparableRecord.from_record(record) for record in records}
+
+
+def record_key(record) -> tuple:
+    """
+    Returns the identity of a resource record set within a zone.
+
+    Route53 identifies a record set by its name, type and set identifier,
+    so two records with the same key describe the same resource, and a
+    DELETE of one and CREATE of the other can be merged into an UPSERT.
+    """
+    return record.name, record.type, record.identifier
+
+
+def get_record_count(con, zone_id) -> int:
+    """
+    Returns the number of resource record sets of a zone, as reported by
+    GetHostedZone.
+    """
+    res = con.get_hosted_zone(zone_id.replace('/hostedzone/', ''))
+    return int(res['GetHostedZoneResponse']['HostedZone']['ResourceRecordSetCount'])
+
+
+def get_zone_records(con, zone_id, cache=None) -> set:
+    """
+    Returns the records of a zone as a set of ComparableRecord.
+
+    With a `RRSetCache`, the cached records are returned as long as the
+    zone still has as many record sets as when they were cached, and the
+    cache is refreshed with a full listing otherwise.
+    """
+    if cache is not None:
+        records = cache.get(zone_id, get_record_count(con, zone_id))
+        if records is not None:
+            return records
+
+    records = comparable(iter_rrsets(con, zone_id))
+    if cache is not None:
+        cache.put(zone_id, records)
+    return records
+
+
+def apply_changes(records, changes) -> set:
+    """
+    Returns the records a zone holding `records` ends up with once
+    `changes` are committed.
+    """
+    upserted = {record_key(c["record"]) for c in changes if c["operation"] == "UPSERT"}
+    records = {r for r in records if record_key(r) not in upserted}
+    for change in changes:
+        record = ComparableRecord.from_record(change["record"])
+        if change["operation"] == "DELETE":
+            records.discard(record)
+        else:
+            records.add(record)
+    return records
+
+
+def commit_change_info(result) -> dict:
+    """
+    Returns the `ChangeInfo` of the change submitted by a
+    ChangeResourceRecordSets request, given its response.
+    """
+    return result['ChangeResourceRecordSetsResponse']['ChangeInfo']
+
+
+def commit_change_id(result):
+    return commit_change_info(result)['Id']
+
+
+def record_sort_key(record) -> tuple:
+    """
+    Sort key for records that orders them by `record_key()`. The set
+    identifier is None for simple records, so it's replaced by an
+    empty string to keep it comparable with strings.
+    """
+    return record.name, record.type, record.identifier or ""
 
 
 def get_file(filename, mode):
@@ -224,9 +742,9 @@ def get_file(filename, mode):
     '''
     if filename == '-':
         if mode.startswith('r'):
-            return sys.stdin
+            return sys.stdin.buffer if 'b' in mode else sys.stdin
         elif mode.startswith('w'):
-            return sys.stdout
+            return sys.stdout.buffer if 'b' in mode else sys.stdout
         else:
             raise ValueError('Unknown mode "{}"'.format(mode))
     else:
@@ -237,47 +755,216 @@ def load(con, zone_name, file_in, **kwargs):
     ''' Send DNS records from input file to Route 53.
 
         Arguments are Route53 connection, zone name, vpc info, and file to open for reading.
+        Returns the number of changes computed for the zone.
+
+        With `wait`, batches depending on earlier ones are only committed
+        once those are INSYNC, and the load returns once all the changes are.
+
+        With `processes` above 1, a CSV file is parsed and diffed by that
+        many processes, see `route53_transfer.parallel`.
     '''
+    stats = kwargs.get('stats') or RunStats()
+    kwargs = dict(kwargs, stats=stats)
+
+    zone, existing_records, changes = compute_load_changes(con, zone_name, file_in, **kwargs)
+    commit_changes(con, zone, changes, existing_records, **kwargs)
+    return len(changes)
+
+
+def compute_load_changes(con, zone_name, file_in, **kwargs):
+    """
+    Finds or creates the zone `load()` loads `file_in` into, and computes
+    the changes to make to it. A dry run doesn't create a missing zone,
+    and computes the changes against an empty one.
+
+    :return: tuple of the zone, its existing records and the changes
+    """
+    zone, existing_records = find_load_zone(con, zone_name, **kwargs)
+    changes = diff_load_records(zone, existing_records, file_in, **kwargs)
+    return zone, existing_records, changes
+
+
+def find_load_zone(con, zone_name, **kwargs):
+    """
+    Finds the zone `load()` loads into, creating it unless `dry_run`, and
+    lists its records.
+
+    :return: tuple of the zone and its existing records
+    """
     dry_run = kwargs.get('dry_run', False)
-    use_upsert = kwargs.get('use_upsert', False)
 
     vpc = kwargs.get('vpc', {})
 
-    zone = get_zone(con, zone_name, vpc)
-    if not zone:
-        if dry_run:
-            print('CREATE ZONE:', zone_name)
-        else:
-            zone = create_zone(con, zone_name, vpc)
+    zone_cache = kwargs.get('zone_cache')
+    stats = kwargs.get('stats') or RunStats()
 
-    existing_records = con.get_all_rrsets(zone['id'])
-    desired_records = read_records(file_in)
+    with stats.phase('zone'):
+        zone = get_zone(con, zone_name, vpc, zones=kwargs.get('zones'), cache=zone_cache)
+        if not zone:
+            if dry_run:
+                print('CREATE ZONE:', zone_name)
+            else:
+                zone = create_zone(con, zone_name, vpc, cache=zone_cache)
+
+    if zone:
+        with stats.phase('list'):
+            existing_records = get_zone_records(con, zone['id'], cache=kwargs.get('rrset_cache'))
+    else:
+        # Only a dry run gets here, as create_zone() fails otherwise
+        zone, existing_records = {'id': None, 'name': zone_name.rstrip('.') + '.'}, set()
+    stats.count('records_listed', len(existing_records))
+    return zone, existing_records
 
-    changes = compute_changes(zone, existing_records, desired_records,
-                              use_upsert=use_upsert)
 
-    r53_update_batches = changes_to_r53_updates(zone, changes)
-    if r53_update_batches:
+def parses_in_processes(**kwargs):
+    """
+    Tells whether `load()` leaves the parsing of its input file to the
+    worker processes diffing it.
+    """
+    return kwargs.get('processes', 1) > 1 and kwargs.get('file_format') != 'binary'
+
+
+def read_load_records(file_in, **kwargs):
+    """
+    Reads the records `load()` loads from `file_in`.
+    """
+    stats = kwargs.get('stats') or RunStats()
 
-        if dry_run:
-            print("Dry-run requested. No changes are going to be applied")
+    with stats.phase('parse'):
+        if kwargs.get('file_format') == 'binary':
+            from .snapshot import Snapshot
+            with Snapshot.from_file(file_in) as snapshot:
+                desired_records = list(snapshot)
         else:
-            print("Applying changes...")
+            desired_records = list(iter_records(file_in))
+    stats.count('records_read', len(desired_records))
+    return desired_records
 
-        n = 1
+
+def diff_load_records(zone, existing_records, file_in, desired_records=None, **kwargs):
+    """
+    Computes the changes turning the records of `zone` into the ones of
+    `file_in`.
+
+    :param desired_records: records already read from `file_in`, which is
+           then left alone
+    """
+    use_upsert = kwargs.get('use_upsert', False)
+    stats = kwargs.get('stats') or RunStats()
+
+    if desired_records is None and parses_in_processes(**kwargs):
+        from .parallel import parallel_changes
+
+        # The worker processes parse their shard of the file as they diff it
+        with stats.phase('diff'):
+            changes, record_count = parallel_changes(zone, existing_records, file_in,
+                                                     use_upsert=use_upsert,
+                                                     processes=kwargs['processes'])
+        stats.count('records_read', record_count)
+    else:
+        if desired_records is None:
+            desired_records = read_load_records(file_in, **kwargs)
+
+        with stats.phase('diff'):
+            changes = compute_changes(zone, existing_records, desired_records,
+                                      use_upsert=use_upsert)
+    stats.count('changes', len(changes))
+    return changes
+
+
+def commit_changes(con, zone, changes, existing_records, **kwargs):
+    """
+    Plans the changes computed for a zone into batches, and commits them,
+    unless `dry_run`. With an `rrset_cache`, the records of the zone are
+    updated with the changes.
+
+    :param existing_records: records of the zone the changes were computed
+           against
+    """
+    rrset_cache = kwargs.get('rrset_cache')
+    stats = kwargs.get('stats') or RunStats()
+
+    with stats.phase('plan'):
+        r53_update_batches = changes_to_r53_updates(zone, changes)
+
+    result = commit_update_batches(con, zone, r53_update_batches, **kwargs)
+    if result is not None and rrset_cache is not None:
+        rrset_cache.put(zone['id'], apply_changes(existing_records, changes),
+                        change_id=commit_change_id(result))
+
+
+def commit_update_batches(con, zone, r53_update_batches, **kwargs):
+    """
+    Commits the ChangeBatches of a zone one after the other, or only
+    prints them with `dry_run`.
+
+    With `wait`, batches depending on earlier ones are only committed once
+    those are INSYNC, and it returns once all the changes are.
+
+    :return: the response to the last ChangeResourceRecordSets request,
+             or None if nothing was committed
+    """
+    dry_run = kwargs.get('dry_run', False)
+    rrset_cache = kwargs.get('rrset_cache')
+    stats = kwargs.get('stats') or RunStats()
+
+    if not r53_update_batches:
+        print("No changes.")
+        return None
+
+    if dry_run:
+        print("Dry-run requested. No changes are going to be applied")
+    else:
+        print("Applying changes...")
+
+    waiter = None
+    if kwargs.get('wait') and not dry_run:
+        waiter = kwargs.get('change_waiter') or \
+            ChangeWaiter(con, timeout=kwargs.get('wait_timeout', DEFAULT_WAIT_TIMEOUT))
+
+    n = 1
+    try:
         for update_batch in r53_update_batches:
-            rrsets = update_batch.to_rrsets(con, zone)
-            print(f"* Update batch {n} ({len(rrsets.changes)} changes)")
-            if dry_run:
-                for change in rrsets.changes:
-                    print("    -", change[0], change[1])
-            else:
-                rrsets.commit()
+            # Only batches depending on the previous ones wait for them
+            if waiter is not None and n > 1 and update_batch.prio != prio:
+                with stats.phase('wait'):
+                    waiter.wait()
+            prio = update_batch.prio
+
+            with stats.phase('commit'):
+                result = apply_update_batch(con, zone, update_batch, n, dry_run)
+            stats.count('batches')
+            if waiter is not None:
+                waiter.add(commit_change_info(result))
             n += 1
 
-        print("Done.")
+        if waiter is not None:
+            with stats.phase('wait'):
+                waiter.wait()
+            stats.count('propagation_seconds', waiter.latency())
+            print("Changes in sync after {:.1f} seconds".format(waiter.latency()))
+    except BaseException:
+        # Some of the batches may have been committed
+        if rrset_cache is not None:
+            rrset_cache.invalidate(zone['id'])
+        raise
+
+    print("Done.")
+    return result
+
+
+def apply_update_batch(con, zone, update_batch, n, dry_run=False):
+    """
+    Commits a single ChangeBatch to Route53, or just prints its changes
+    when `dry_run` is set. `n` is the number of the batch in the update.
+    """
+    rrsets = update_batch.to_rrsets(con, zone)
+    print(f"* Update batch {n} ({len(rrsets.changes)} changes)")
+    if dry_run:
+        for change in rrsets.changes:
+            print("    -", change[0], change[1])
     else:
-        print("No changes.")
+        return rrsets.commit()
 
 
 def assign_change_priority(zone: dict, change_operations: list) -> None:
@@ -293,9 +980,23 @@ def assign_change_priority(zone: dict, change_operations: list) -> None:
 
     2. Group together all change operations that can be committed together
        in the same ResourceRecordSet change transaction.
-    """
-    rr_prio = defaultdict(int)
 
+    The record names being changed are the nodes of a graph of their
+    same-zone alias dependencies:
+
+    * an alias being created or updated needs the changes to its target
+      to be committed in an earlier transaction, and
+    * a target deleted for good can't be deleted before the aliases to it
+      that are deleted too, but can go in the same transaction.
+
+    Names are scheduled by topological levels, each one as early as its
+    dependencies allow, so that there are as many priorities as alias
+    records in the longest chain being changed, plus one. All the changes
+    to a name get the same priority.
+
+    :raises ValueError: if the aliases being created depend on each other
+            in a cycle
+    """
     def is_same_zone(change: dict) -> bool:
         return change["zone"]["id"] == zone["id"]
 
@@ -303,22 +1004,131 @@ def assign_change_priority(zone: dict, change_operations: list) -> None:
         record = change["record"]
         return record.alias_dns_name is not None and is_same_zone(change)
 
-    def is_new_alias(change: ComparableRecord) -> bool:
-        return is_alias(change) and change["operation"] in ("CREATE", "UPSERT")
+    def node(name: str) -> str:
+        return name.rstrip('.').lower()
 
+    created, deleted = set(), set()
     for change in change_operations:
-        if is_new_alias(change):
-            record = change["record"]
-            rr_prio[record.alias_dns_name] += 1
+        name = node(change["record"].name)
+        (deleted if change["operation"] == "DELETE" else created).add(name)
 
+    # successors[a] holds (b, distance) pairs, b having to be scheduled
+    # at least `distance` levels after a
+    successors = defaultdict(list)
+    predecessor_count = dict.fromkeys(created | deleted, 0)
     for change in change_operations:
-        if is_new_alias(change):
-            record = change["record"]
-            rr_prio[record.alias_dns_name] += rr_prio[record.name]
+        if not is_alias(change):
+            continue
+        name = node(change["record"].name)
+        target = node(change["record"].alias_dns_name)
+        if target == name:
+            continue
+        if change["operation"] == "DELETE":
+            if target in deleted and target not in created:
+                successors[name].append((target, 0))
+                predecessor_count[target] += 1
+        elif target in created:
+            successors[target].append((name, 1))
+            predecessor_count[name] += 1
+
+    level = dict.fromkeys(predecessor_count, 0)
+    ready = [name for name, count in predecessor_count.items() if not count]
+    scheduled = 0
+    while ready:
+        name = ready.pop()
+        scheduled += 1
+        for successor, distance in successors.get(name, ()):
+            level[successor] = max(level[successor], level[name] + distance)
+            predecessor_count[successor] -= 1
+            if not predecessor_count[successor]:
+                ready.append(successor)
+
+    if scheduled < len(level):
+        raise ValueError("Alias records depend on each other in a cycle: {}".format(
+            ", ".join(sorted(name for name, count in predecessor_count.items() if count))))
+
+    last_level = max(level.values(), default=0)
+    for change in change_operations:
+        change["prio"] = last_level - level[node(change["record"].name)]
+
+
+def pack_changes(change_operations, max_records=MAX_BATCH_RECORDS,
+                 max_value_chars=MAX_BATCH_VALUE_CHARS):
+    """
+    Packs change operations that can be committed in any order into the
+    fewest `ChangeBatch` objects that respect the Route53 request limits.
+
+    Changes to the same name, like the DELETE and CREATE replacing a
+    record, or the DELETE of an A record and the CREATE of the CNAME
+    replacing it, are kept together in the same batch, so the name is
+    never missing or in conflict between two commits. The groups of
+    changes are placed with a first-fit decreasing strategy, while the
+    changes inside each batch keep their original relative order.
+
+    The changes to a name that don't fit in a single batch are split
+    over batches of their own, in their original order, so that deletes,
+    which `compute_changes()` lists first, are committed in the same
+    batch as the creates or an earlier one.
+
+    :param change_operations: list of change operations
+    :return: list of ChangeBatch objects
+    """
+    from .canonical import canonical_name
 
+    sized_changes = []
+    unit_sizes = dict()
     for change in change_operations:
-        record = change["record"]
-        change["prio"] = rr_prio[record.name]
+        key = canonical_name(change["record"].name)
+        size = change_size(change)
+        sized_changes.append((key, change, size))
+        unit_size = unit_sizes.get(key, (0, 0))
+        unit_sizes[key] = (unit_size[0] + size[0], unit_size[1] + size[1])
+
+    if not unit_sizes:
+        return []
+
+    # Batches with less room than the smallest unit can't take any more
+    min_records = min(size[0] for size in unit_sizes.values())
+    min_value_chars = min(size[1] for size in unit_sizes.values())
+
+    # Remaining room of each batch still accepting changes
+    open_batches = []
+    batch_count = 0
+    batch_of_key = dict()
+
+    for key, (records, value_chars) in sorted(unit_sizes.items(),
+                                              key=lambda item: item[1],
+                                              reverse=True):
+        if records > max_records or value_chars > max_value_chars:
+            continue
+        for room in open_batches:
+            if records <= room[1] and value_chars <= room[2]:
+                break
+        else:
+            room = [batch_count, max_records, max_value_chars]
+            open_batches.append(room)
+            batch_count += 1
+
+        room[1] -= records
+        room[2] -= value_chars
+        batch_of_key[key] = room[0]
+        if room[1] < min_records or room[2] < min_value_chars:
+            open_batches.remove(room)
+
+    batches = [ChangeBatch(max_records, max_value_chars) for _ in range(batch_count)]
+    split_batches = dict()
+    for key, change, size in sized_changes:
+        if key in batch_of_key:
+            batches[batch_of_key[key]].add_change(change, size)
+            continue
+        # A change exceeding the limits on its own gets a batch to itself
+        batch = split_batches.get(key)
+        if batch is None or not batch.fits(size):
+            batch = split_batches[key] = ChangeBatch(max_records, max_value_chars)
+            batches.append(batch)
+        batch.add_change(change, size)
+
+    return batches
 
 
 def changes_to_r53_updates(zone, change_operations):
@@ -328,7 +1138,11 @@ def changes_to_r53_updates(zone, change_operations):
     a `ResourceRecordSets` object, will suffice for all updates. In certain
     cases, when records are aliases and their target records do not already
     exist in a zone, it's necessary to split the zone updates in different
-    batches, which have to be committed in two separate operations.
+    batches, committed one after the other, one more for every alias in the
+    longest chain of aliases being created (see `assign_change_priority()`).
+
+    Changes with the same priority that don't fit in a single Route53
+    request are further split by `pack_changes()`.
 
     :param zone: Route53 zone object (dict with `id` and `name`)
     :param change_operations: list of zone change operations as returned by
@@ -336,30 +1150,22 @@ def changes_to_r53_updates(zone, change_operations):
     :return: r53_updates: list of ChangeBatch objects
     """
 
-    assign_change_priority(zone, change_operations)
-
-    r53_update_batches = []
-    current_batch = ChangeBatch()
-    current_prio = None
+    return list(iter_r53_updates(zone, change_operations))
 
-    for change in sorted(change_operations, key=lambda c: c["prio"], reverse=True):
-        order = change["prio"]
 
-        if current_prio is None:
-            current_prio = order
-
-        if order != current_prio:
-            if current_batch.changes:
-                r53_update_batches.append(current_batch)
-            current_batch = ChangeBatch()
-
-        current_batch.add_change(change)
-        current_prio = order
-
-    if current_batch.changes:
-        r53_update_batches.append(current_batch)
+def iter_r53_updates(zone, change_operations):
+    """
+    Generator version of `changes_to_r53_updates()`. The batches of each
+    priority level are yielded as soon as they are packed, so the first
+    batches can be committed while the next ones are still being planned.
+    """
+    assign_change_priority(zone, change_operations)
 
-    return r53_update_batches
+    by_priority = sorted(change_operations, key=lambda c: c["prio"], reverse=True)
+    for prio, changes in itertools.groupby(by_priority, key=lambda c: c["prio"]):
+        for batch in pack_changes(list(changes)):
+            batch.prio = prio
+            yield batch
 
 
 def compute_changes(zone, existing_records, desired_records, use_upsert=False):
@@ -372,74 +1178,138 @@ def compute_changes(zone, existing_records, desired_records, use_upsert=False):
     transaction in certain cases. One such cases is when we introduce records
     that are aliases to existing records. Route53 will reject our updates
     if the target record for the alias does not exist yet. The workaround is
-    to execute the change in two distinct transactions (ResourceRecordSet
-    changes), the first to commit the target resources of all the new aliases
-    and the second one for all the other resource records.
+    to execute the change in distinct transactions (ResourceRecordSet
+    changes), committing the target resources of the new aliases before
+    the aliases themselves (see `changes_to_r53_updates()`).
 
     :param zone: Route53 zone object
     :param existing_records: list of rrsets that exist in the r53 zone
     :param desired_records: list of rrsets that we desire as final state
     :param use_upsert: if True, prefers UPSERT operations to CREATE and DELETE
-    :return: list of ResourceRecordSet changes to be applied
+    :return: list of ResourceRecordSet changes to be applied, holding the
+             records in canonical form (see `route53_transfer.canonical`)
     """
+    from .canonical import canonical_record
 
-    existing_records = comparable(skip_apex_soa_ns(zone, existing_records))
-    desired_records = comparable(skip_apex_soa_ns(zone, desired_records))
+    # Both sides are compared in the form Route53 lists records in, so
+    # that records only written differently aren't replaced
+    existing_records = set(skip_apex_soa_ns(zone, map(canonical_record, existing_records)))
+    desired_records = set(skip_apex_soa_ns(zone, map(canonical_record, desired_records)))
 
     to_delete = existing_records.difference(desired_records)
     to_add = desired_records.difference(existing_records)
-    changes = list()
-
-    def is_in_set(record: ComparableRecord, s: set) -> bool:
-        for entry in s:
-            if entry.to_change_dict()["name"] == record.to_change_dict()["name"]:
-                return True
-        return False
-
-    def sort_by_name(s: set):
-        return sorted(s, key=lambda comparable_record: comparable_record.name)
-
-    if to_add or to_delete:
-        for record in sort_by_name(to_add):
-            op_type = "UPSERT" if use_upsert and is_in_set(record, to_delete) else "CREATE"
-            changes.append({"zone": zone,
-                            "operation": op_type,
-                            "record": record})
-
-        for record in sort_by_name(to_delete):
-            if not (use_upsert and is_in_set(record, to_add)):
-                changes.insert(0, {"zone": zone,
-                                   "operation": "DELETE",
-                                   "record": record})
 
-    return changes
+    if not (to_add or to_delete):
+        return []
+
+    # Index the records to delete by their Route53 identity, so that
+    # pairing a CREATE with its DELETE into an UPSERT is a single lookup
+    # instead of a scan of the whole opposite set.
+    deletes_by_key = defaultdict(list)
+    for record in to_delete:
+        deletes_by_key[record_key(record)].append(record)
+
+    creates = list()
+    for record in sorted(to_add, key=record_sort_key):
+        op_type = "CREATE"
+        if use_upsert:
+            replaced = deletes_by_key.get(record_key(record))
+            if replaced:
+                replaced.pop()
+                op_type = "UPSERT"
+        creates.append({"zone": zone,
+                        "operation": op_type,
+                        "record": record})
+
+    remaining = [r for records in deletes_by_key.values() for r in records]
+
+    deletes = list()
+    for record in sorted(remaining, key=record_sort_key, reverse=True):
+        deletes.append({"zone": zone,
+                        "operation": "DELETE",
+                        "record": record})
+
+    return deletes + creates
 
 
 def dump(con, zone_name, fout, **kwargs):
     ''' Receive DNS records from Route 53 to output file.
 
         Arguments are Route53 connection, zone name, vpc info, and file to open for writing.
+        Returns the number of resource record sets written.
     '''
     vpc = kwargs.get('vpc', {})
+    stats = kwargs.get('stats') or RunStats()
 
-    zone = get_zone(con, zone_name, vpc)
+    with stats.phase('zone'):
+        zone = get_zone(con, zone_name, vpc, zones=kwargs.get('zones'),
+                        cache=kwargs.get('zone_cache'))
     if not zone:
         exit_with_error("ERROR: {} zone {} not found!".format('Private' if vpc.get('is_private') else 'Public',
                                                               zone_name))
 
+    if kwargs.get('file_format') == 'binary':
+        from .snapshot import write_snapshot
+        with stats.phase('list'):
+            records = list(iter_rrsets(con, zone['id']))
+        with stats.phase('write'):
+            record_count = write_snapshot(records, fout)
+        stats.count('records_written', record_count)
+        return record_count
+
     out = csv.writer(fout)
-    out.writerow(['NAME', 'TYPE', 'VALUE', 'TTL', 'REGION', 'WEIGHT', 'SETID', 'FAILOVER', "EVALUATE_HEALTH"])
+    out.writerow(CSV_HEADER)
+    fout.flush()
 
-    records = list(con.get_all_rrsets(zone['id']))
-    for r in records:
-        lines = record_to_stringlist(r)
-        for line in lines:
-            out.writerow(line)
+    if kwargs.get('sort'):
+        return dump_sorted(con, zone, out, stats)
 
-    fout.flush()
+    record_count = 0
+    pages = iter_rrset_pages(con, zone['id'])
+    while True:
+        # Listing and writing alternate page by page, and are timed apart
+        with stats.phase('list'):
+            page = next(pages, None)
+        if page is None:
+            break
+        with stats.phase('write'):
+            for r in page:
+                out.writerows(record_to_stringlist(r))
+            fout.flush()
+        record_count += len(page)
 
+    stats.count('records_written', record_count)
+    return record_count
 
-def record_to_stringlist(r: Record) -> list:
+
+def dump_sorted(con, zone, out, stats) -> int:
+    """
+    Writes the records of a zone to the CSV writer `out`, sorted by
+    `record_sort_key()` rather than in the order of Route53 listings,
+    which compares names label by label from the right. The rows are
+    sorted in bounded memory by `sort_rows()`.
+
+    :return: number of resource record sets written
+    """
+    record_count = 0
+
+    def rows():
+        nonlocal record_count
+        for page in iter_rrset_pages(con, zone['id']):
+            record_count += len(page)
+            for r in page:
+                for row in record_to_stringlist(r):
+                    yield ['' if value is None else str(value) for value in row]
+
+    # Listing, sorting and writing are interleaved, and timed together
+    with stats.phase('sort'):
+        out.writerows(sort_rows(rows(), csv_group_key))
+
+    stats.count('records_written', record_count)
+    return record_count
+
+
+def record_to_stringlist(r: 'Record') -> list:
     out_lines = []
 
     if r.alias_dns_name:
@@ -450,12 +1320,12 @@ def record_to_stringlist(r: Record) -> list:
     for val in vals:
         out_lines.append([
             r.name, r.type, val, r.ttl, r.region, r.weight, r.identifier,
-            r.failover, r.alias_evaluate_target_health])
+            r.failover, r.alias_evaluate_target_health, r.health_check])
 
     return out_lines
 
 
-def record_short_summary(r: Record) -> str:
+def record_short_summary(r: 'Record') -> str:
     """
     Given a R53 resource record, returns a short string summary of it.
 
@@ -471,20 +1341,239 @@ def record_short_summary(r: Record) -> str:
         return f"{r.name} {r.type} {r.resource_records} {r.ttl}"
 
 
-def up_to_s3(con, file, s3_bucket):
+def read_manifest(manifest_file, base_dir):
+    """
+    Reads a multi-zone manifest. Every non-empty line holds a zone name,
+    optionally followed by a comma and the zone file name. File names
+    default to `<zone>.csv` and are relative to `base_dir`.
+
+    :return: list of (zone name, file path) tuples
+    """
+    zone_files = []
+    for row in csv.reader(manifest_file):
+        if not row or row[0].startswith('#'):
+            continue
+        zone_name = row[0].strip()
+        filename = row[1].strip() if len(row) > 1 and row[1].strip() else zone_name + '.csv'
+        zone_files.append((zone_name, os.path.join(base_dir, filename)))
+    return zone_files
+
+
+def run_zone_jobs(job, zone_files, concurrency):
+    """
+    Runs `job(zone_name, filename)` for every zone on a pool of
+    `concurrency` threads and returns a summary of each run, in the same
+    order as `zone_files`.
+
+    :return: list of dicts with `zone`, `file`, `seconds`, `count` and
+             `error` keys. `count` is whatever the job returned.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def timed_job(zone_name, filename):
+        result = {"zone": zone_name, "file": filename, "count": None, "error": None}
+        start = time.time()
+        try:
+            result["count"] = job(zone_name, filename)
+        except (Exception, SystemExit) as e:
+            result["error"] = str(e) or e.__class__.__name__
+        result["seconds"] = time.time() - start
+        return result
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(timed_job, zone_name, filename)
+                   for zone_name, filename in zone_files]
+        return [future.result() for future in futures]
+
+
+def print_zone_summary(results, count_label, fout=sys.stdout):
+    out = csv.writer(fout)
+    out.writerow(['ZONE', 'FILE', 'SECONDS', count_label, 'ERROR'])
+    for result in results:
+        count = result['count'] if result['count'] is not None else ''
+        out.writerow([result['zone'], result['file'], '{:.2f}'.format(result['seconds']),
+                      count, result['error'] or ''])
+    fout.flush()
+
+
+def dump_all(con, out_dir, zone_files=None, **kwargs):
+    """
+    Dumps several zones concurrently, each one to its own file.
+
+    All the zones share the Route53 connection and a single listing of the
+    hosted zones.
+
+    :param out_dir: directory the zone files are written to
+    :param zone_files: list of (zone name, file path) tuples. If not given,
+           every zone of the account matching the vpc info is dumped to
+           `<out_dir>/<zone>.csv`
+    :return: list of per-zone results, see `run_zone_jobs()`
+    """
+    vpc = kwargs.get('vpc', {})
+    concurrency = kwargs.get('concurrency', DEFAULT_CONCURRENCY)
+
+    zones = get_hosted_zones(con)
+    if zone_files is None:
+        private = u'true' if vpc.get('is_private') else u'false'
+        zone_names = sorted({z['Name'].rstrip('.') for z in zones
+                             if z['Config']['PrivateZone'] == private})
+        zone_files = [(zone_name, os.path.join(out_dir, zone_name + '.csv'))
+                      for zone_name in zone_names]
+
+    def dump_zone(zone_name, filename):
+        with open(filename, 'w', newline='') as fout:
+            return dump(con, zone_name, fout, vpc=vpc, zones=zones,
+                        stats=kwargs.get('stats'))
+
+    return run_zone_jobs(dump_zone, zone_files, concurrency)
+
+
+def load_all(con, in_dir, zone_files=None, **kwargs):
+    """
+    Loads several zones concurrently, each one from its own file.
+
+    All the zones share the Route53 connection and a single listing of the
+    hosted zones.
+
+    :param in_dir: directory the zone files are read from
+    :param zone_files: list of (zone name, file path) tuples. If not given,
+           every `<zone>.csv` file in `in_dir` is loaded into `<zone>`
+    :return: list of per-zone results, see `run_zone_jobs()`
+    """
+    concurrency = kwargs.pop('concurrency', DEFAULT_CONCURRENCY)
+
+    if zone_files is None:
+        zone_files = [(filename[:-len('.csv')], os.path.join(in_dir, filename))
+                      for filename in sorted(os.listdir(in_dir))
+                      if filename.endswith('.csv')]
+
+    zones = get_hosted_zones(con)
+
+    def load_zone(zone_name, filename):
+        with open(filename, newline='') as file_in:
+            return load(con, zone_name, file_in, zones=zones, **kwargs)
+
+    return run_zone_jobs(load_zone, zone_files, concurrency)
+
+
+def connect_to_s3(access_key, secret_key, endpoint=None):
+    """
+    Connects to S3, or to the S3-compatible service at the `endpoint` URL
+    (such as a local stand-in) when given.
+    """
+    from boto import connect_s3
+    from boto.s3.connection import OrdinaryCallingFormat
+    from urllib.parse import urlparse
+
+    if not endpoint:
+        return connect_s3(aws_access_key_id=access_key, aws_secret_access_key=secret_key)
+
+    url = urlparse(endpoint)
+    return connect_s3(aws_access_key_id=access_key, aws_secret_access_key=secret_key,
+                      host=url.hostname, port=url.port, is_secure=url.scheme == 'https',
+                      calling_format=OrdinaryCallingFormat())
+
+
+def get_s3_bucket(con, s3_bucket):
     con.create_bucket(s3_bucket)
-    bucket = con.get_bucket(s3_bucket)
-    bucket_key = Key(bucket)
-    bucket_key.key = file
-    bucket_key.set_contents_from_filename(file, num_cb=10)
+    return con.get_bucket(s3_bucket)
+
+
+def run(params, con=None, target_con=None):
+    """
+    Runs the command line, given its parsed `params`.
+
+    Commands working on local files alone never connect to AWS, and the
+    other ones only connect to S3 when they have an S3 bucket to use.
+
+    :param con: Route53 connection to use instead of connecting to AWS,
+           such as a `route53_transfer.testing.FakeRoute53Connection`
+    :param target_con: Route53 connection `transfer` copies the zone to,
+           instead of connecting to the target account
+    """
+    stats = RunStats()
+    try:
+        if any(params.get(command) for command in OFFLINE_COMMANDS):
+            return run_offline(params, stats)
+        con = connect_to_route53(params, stats, con)
+        if params.get('transfer'):
+            credentials = None if target_con else get_target_credentials(params)
+            target_con = connect_to_route53(params, stats, target_con, credentials)
+        return run_command(params, con, stats, target_con=target_con)
+    finally:
+        write_stats(params, stats)
+
+
+def connect_to_route53(params, stats, con=None, credentials=None):
+    """
+    Returns the Route53 connection commands run with, which paces and
+    retries its calls (see `route53_transfer.throttle`) and records them
+    in `stats`.
+
+    :param con: Route53 connection to wrap, instead of connecting to AWS
+    :param credentials: access and secret key to connect with, instead of
+           the ones of `get_aws_credentials()`
+    """
+    from .throttle import MAX_RATE, ThrottledConnection
+
+    if con is None:
+        from boto import route53
+        access_key, secret_key = credentials or get_aws_credentials(params)
+        con = route53.connect_to_region('universal', aws_access_key_id=access_key,
+                                        aws_secret_access_key=secret_key)
 
+    if params.get('--stats') or params.get('--stats-json'):
+        count_transfers(con, stats)
 
-def run(params):
-    access_key, secret_key = get_aws_credentials(params)
-    con = route53.connect_to_region('universal', aws_access_key_id=access_key, aws_secret_access_key=secret_key)
-    con_s3 = connect_s3(aws_access_key_id=access_key, aws_secret_access_key=secret_key)
-    zone_name = params['<zone>']
-    filename = params['<file>']
+    max_rate = float(params.get('--max-rate') or MAX_RATE)
+    con = ThrottledConnection(con, rate=max_rate, max_rate=max_rate)
+    # With two connections, as for transfer, those of the first one are reported
+    if stats.throttle is None:
+        stats.throttle = con.stats
+    return StatsConnection(con, stats)
+
+
+def write_stats(params, stats):
+    """
+    Reports the stats of the run as asked by `--stats` (readable, on
+    stderr) and `--stats-json` (one JSON object, to a file or stdout).
+    """
+    command = next((c for c in COMMANDS if params.get(c)), None)
+    extra = dict(command=command, zone=params.get('<zone>'), time=ts)
+
+    if params.get('--stats'):
+        stats.write_text(sys.stderr, **extra)
+
+    stats_file = params.get('--stats-json')
+    if stats_file == '-':
+        stats.write_json(sys.stdout, **extra)
+    elif stats_file:
+        with open(stats_file, 'w') as fout:
+            stats.write_json(fout, **extra)
+
+
+def run_command(params, con, stats, target_con=None):
+    """
+    Runs the command of the parsed `params` with Route53 connection `con`,
+    recording its timings and counters in `stats`. `transfer` copies the
+    zone to the account of `target_con`.
+    """
+    zone_name = params.get('<zone>')
+    filename = params.get('<file>')
+
+    zone_cache = ZONE_CACHE
+    if params.get('--zone-cache'):
+        zone_cache = ZoneCache(params['--zone-cache'],
+                               int(params.get('--zone-cache-ttl') or DEFAULT_ZONE_CACHE_TTL))
+
+    rrset_cache = None
+    if params.get('--rrset-cache'):
+        from .rrset_cache import RRSetCache
+        rrset_cache = RRSetCache(params['--rrset-cache'])
+        # Route53 doesn't tell the latest change of a zone, so the cache can
+        # only be revalidated by counting records
+        sys.stderr.write("WARNING: --rrset-cache misses changes made to the zone by other "
+                         "means that keep its number of records\n")
 
     vpc = {}
     if params.get('--private'):
@@ -497,16 +1586,168 @@ def run(params):
     else:
         vpc['is_private'] = False
 
-    if params.get('dump'):
-        dump(con, zone_name, get_file(filename, 'w'), vpc=vpc)
-        if params.get('--s3-bucket'):
-            up_to_s3(con_s3, params.get('<file>'), params.get('--s3-bucket'))
+    file_format = params.get('--format') or 'csv'
+    if file_format not in FILE_FORMATS:
+        exit_with_error("ERROR: Unknown file format {}, use one of {}".format(
+            file_format, ', '.join(FILE_FORMATS)))
+    binary_mode = 'b' if file_format == 'binary' else ''
+
+    wait_timeout = float(params.get('--wait-timeout') or DEFAULT_WAIT_TIMEOUT)
+    processes = int(params.get('--processes') or 1)
+
+    if params.get('dump') and params.get('--s3-bucket'):
+        from .s3_upload import COMPRESSION_SUFFIXES, dump_to_s3
+        compression = params.get('--compression') or 'none'
+        if compression not in COMPRESSION_SUFFIXES:
+            exit_with_error("ERROR: Unknown compression {}, use one of {}".format(
+                compression, ', '.join(COMPRESSION_SUFFIXES)))
+
+        key_name = filename
+        if filename == '-':
+            key_name = zone_name + ('.r53s' if binary_mode else '.csv')
+        key_name += COMPRESSION_SUFFIXES[compression]
+
+        con_s3 = connect_to_s3(*get_aws_credentials(params), params.get('--s3-endpoint'))
+        dump_to_s3(con, zone_name, get_s3_bucket(con_s3, params['--s3-bucket']), key_name,
+                   vpc=vpc, zone_cache=zone_cache, file_format=file_format,
+                   stats=stats, sort=params.get('--sorted', False), compression=compression,
+                   part_size=int(params.get('--s3-part-size') or 8) * 1024 * 1024,
+                   concurrency=int(params.get('--concurrency') or DEFAULT_CONCURRENCY))
+
+    elif params.get('dump'):
+        dump(con, zone_name, get_file(filename, 'w' + binary_mode), vpc=vpc,
+             zone_cache=zone_cache, file_format=file_format, stats=stats,
+             sort=params.get('--sorted', False))
 
     elif params.get('load'):
         dry_run = params.get('--dry-run', False)
         use_upsert = params.get('--use-upsert', False)
 
-        load(con, zone_name, get_file(filename, 'r'), vpc=vpc,
-             dry_run=dry_run, use_upsert=use_upsert)
+        # Records that can't be ordered, such as aliases in a cycle, are
+        # reported rather than raised
+        try:
+            load(con, zone_name, get_file(filename, 'r' + binary_mode), vpc=vpc,
+                 dry_run=dry_run, use_upsert=use_upsert, zone_cache=zone_cache,
+                 rrset_cache=rrset_cache, file_format=file_format, stats=stats,
+                 wait=params.get('--wait', False), wait_timeout=wait_timeout,
+                 processes=processes)
+        except ValueError as e:
+            exit_with_error("ERROR: {}: {}\n".format(filename, e))
+
+    elif params.get('plan'):
+        from .plan import plan
+        with open(params['<plan>'], 'wb') as fout:
+            try:
+                plan(con, zone_name, get_file(filename, 'r' + binary_mode), fout, vpc=vpc,
+                     use_upsert=params.get('--use-upsert', False), zone_cache=zone_cache,
+                     rrset_cache=rrset_cache, file_format=file_format, stats=stats,
+                     processes=processes)
+            except ValueError as e:
+                exit_with_error("ERROR: {}: {}\n".format(filename, e))
+
+    elif params.get('apply'):
+        from .plan import apply_plan
+        with open(params['<plan>'], 'rb') as fin:
+            try:
+                apply_plan(con, fin, vpc=vpc, zone_cache=zone_cache, rrset_cache=rrset_cache,
+                           stats=stats, wait=params.get('--wait', False),
+                           wait_timeout=wait_timeout)
+            except ValueError as e:
+                exit_with_error("ERROR: {}: {}\n".format(params['<plan>'], e))
+
+    elif params.get('transfer'):
+        from .transfer import transfer
+        try:
+            transfer(con, target_con, zone_name, vpc=vpc, zone_cache=zone_cache,
+                     rrset_cache=rrset_cache, stats=stats,
+                     dry_run=params.get('--dry-run', False),
+                     use_upsert=params.get('--use-upsert', False),
+                     wait=params.get('--wait', False), wait_timeout=wait_timeout)
+        except ValueError as e:
+            exit_with_error("ERROR: {}\n".format(e))
+
+    elif params.get('archive'):
+        from .archive import archive
+        try:
+            path = archive(con, zone_name, params['<dir>'], vpc=vpc,
+                           zone_cache=zone_cache, compact=params.get('--compact', False))
+        except ValueError as e:
+            exit_with_error("ERROR: {}\n".format(e))
+        print(path or "No changes.")
+
+    elif params.get('dump-all') or params.get('load-all'):
+        directory = params['<dir>']
+        concurrency = int(params.get('--concurrency') or DEFAULT_CONCURRENCY)
+
+        zone_files = None
+        if params.get('--manifest'):
+            with open(params['--manifest']) as manifest_file:
+                zone_files = read_manifest(manifest_file, directory)
+
+        if params.get('dump-all'):
+            os.makedirs(directory, exist_ok=True)
+            results = dump_all(con, directory, zone_files, vpc=vpc,
+                               concurrency=concurrency, stats=stats)
+            print_zone_summary(results, 'RECORDS')
+        else:
+            results = load_all(con, directory, zone_files, vpc=vpc,
+                               concurrency=concurrency, zone_cache=zone_cache,
+                               rrset_cache=rrset_cache, stats=stats,
+                               dry_run=params.get('--dry-run', False),
+                               use_upsert=params.get('--use-upsert', False),
+                               wait=params.get('--wait', False), wait_timeout=wait_timeout,
+                               processes=processes)
+            print_zone_summary(results, 'CHANGES')
+
+        if any(result['error'] for result in results):
+            return 1
+    else:
+        return 1
+
+
+def run_offline(params, stats):
+    """
+    Runs the commands of the parsed `params` that only work on local
+    files, without connecting to AWS.
+    """
+    filename = params.get('<file>')
+
+    if params.get('validate'):
+        from .validate import print_problems, validate_file
+        with stats.phase('validate'):
+            record_count, problems = validate_file(filename)
+        stats.count('records_read', record_count)
+        stats.count('problems', len(problems))
+        print_problems(filename, record_count, problems)
+        if problems:
+            return 1
+
+    elif params.get('diff'):
+        from contextlib import ExitStack
+        from .diff import merge_changes, open_records
+        with ExitStack() as stack, stats.phase('diff'):
+            changes = merge_changes(None, open_records(params['<old>'], stack),
+                                    open_records(params['<new>'], stack),
+                                    use_upsert=params.get('--use-upsert', False))
+        stats.count('changes', len(changes))
+        for change in changes:
+            print(change['operation'], record_short_summary(change['record']))
+        if changes:
+            return 1
+
+    elif params.get('convert'):
+        from .snapshot import Snapshot, csv_to_snapshot, is_snapshot, snapshot_to_csv
+        with open(filename, 'rb') as f:
+            from_snapshot = is_snapshot(f.read(4))
+        if from_snapshot:
+            with Snapshot.open(filename) as snapshot:
+                snapshot_to_csv(snapshot, get_file(params['<output>'], 'w'))
+        else:
+            csv_to_snapshot(get_file(filename, 'r'), get_file(params['<output>'], 'wb'))
+
+    elif params.get('unarchive'):
+        from .archive import SnapshotArchive
+        SnapshotArchive(params['<dir>']).write_csv(get_file(filename, 'w'),
+                                                   at=params.get('--at'))
     else:
         return 1
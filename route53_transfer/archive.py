@@ -0,0 +1,251 @@
+"""
+Archive of zone snapshots stored as a base snapshot plus forward deltas
+
+Dumping a zone every hour rewrites all of its records, even when hardly
+any of them changed. A `SnapshotArchive` keeps a full CSV dump of the zone
+as its base, and then only stores the differences between each snapshot
+and the previous one, as computed by `compute_changes()`. Any archived
+snapshot can be rebuilt as a regular CSV dump that `read_records()` and
+`load()` accept, and old deltas can be compacted into a new base.
+
+An archive is a directory holding one zone, with files named after the
+UTC time of their snapshot:
+
+    base-20240101T000000Z.csv     full dump, in the CSV format of `dump()`
+    delta-20240101T010000Z.csv    changes since the previous snapshot
+    delta-20240101T020000Z.csv
+
+Delta files use the dump CSV format, with an extra OPERATION column in
+front holding either CREATE or DELETE.
+"""
+
+import csv
+import os
+import re
+import time
+
+from .app import (
+    CSV_HEADER,
+    compute_changes,
+    exit_with_error,
+    get_zone,
+    group_values,
+    iter_rrsets,
+    record_sort_key,
+    record_to_stringlist,
+)
+from .canonical import canonical_record
+
+SNAPSHOT_FILE_RE = re.compile(r'^(base|delta)-(\d{8}T\d{6}Z)\.csv$')
+
+TIMESTAMP_FORMAT = "%Y%m%dT%H%M%SZ"
+
+# compute_changes() skips the SOA and NS records of the zone apex, which
+# the archive has to keep like any other record. Using a zone without a
+# name makes sure no record is taken for the apex.
+ARCHIVE_ZONE = {"id": None, "name": None}
+
+
+def snapshot_timestamp(t=None) -> str:
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(t))
+
+
+def csv_rows(records):
+    """
+    Converts records to the CSV rows a dump would contain, with every field
+    as a string, the way they are read back from a file.
+    """
+    for record in records:
+        for row in record_to_stringlist(record):
+            yield ['' if field is None else str(field) for field in row]
+
+
+def write_records(records, fout):
+    out = csv.writer(fout)
+    out.writerow(CSV_HEADER)
+    out.writerows(csv_rows(sorted(records, key=record_sort_key)))
+
+
+class SnapshotArchive(object):
+    """
+    Snapshots of a single zone, stored in `directory`
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def snapshots(self) -> list:
+        """
+        Returns the archived snapshots, oldest first, as a list of
+        (timestamp, kind, path) tuples, where kind is `base` or `delta`.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            match = SNAPSHOT_FILE_RE.match(filename)
+            if match:
+                kind, timestamp = match.groups()
+                snapshots.append((timestamp, kind, os.path.join(self.directory, filename)))
+        return sorted(snapshots)
+
+    def _chain(self, at=None) -> list:
+        """
+        Returns the base snapshot and the deltas that must be applied to it
+        to rebuild the zone as it was at the time `at` (the latest snapshot
+        if None).
+        """
+        chain = []
+        for snapshot in self.snapshots():
+            timestamp, kind, _ = snapshot
+            if at is not None and timestamp > at:
+                break
+            if kind == 'base':
+                chain = [snapshot]
+            elif chain:
+                chain.append(snapshot)
+        return chain
+
+    def records_at(self, at=None) -> set:
+        """
+        Rebuilds the records of the zone as they were at the time `at`, a
+        timestamp in the archive's `YYYYMMDDTHHMMSSZ` format, or at the
+        latest snapshot if None.
+
+        :return: set of ComparableRecord
+        """
+        chain = self._chain(at)
+        if not chain:
+            raise ValueError("No snapshot archived in {} at {}".format(
+                self.directory, at or 'any time'))
+
+        _, _, base_path = chain[0]
+        with open(base_path, newline='') as f:
+            rows = csv.reader(f)
+            next(rows, None)
+            records = set(group_values(rows))
+
+        for _, _, delta_path in chain[1:]:
+            deleted, created = self._read_delta(delta_path)
+            records.difference_update(deleted)
+            records.update(created)
+
+        return records
+
+    @staticmethod
+    def _read_delta(path):
+        rows = {'DELETE': [], 'CREATE': []}
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if row:
+                    rows[row[0]].append(row[1:])
+        return list(group_values(rows['DELETE'])), list(group_values(rows['CREATE']))
+
+    def add(self, records, timestamp=None) -> str:
+        """
+        Archives a new snapshot of the zone. The first snapshot is stored as
+        the base, and the following ones as the changes since the latest
+        snapshot. No file is written when nothing changed.
+
+        :param records: the records of the zone, as boto Records or
+               ComparableRecords
+        :param timestamp: time of the snapshot, defaults to now
+        :return: the path of the file written, or None
+        """
+        timestamp = timestamp or snapshot_timestamp()
+        snapshots = self.snapshots()
+        if snapshots and snapshots[-1][0] >= timestamp:
+            raise ValueError("A snapshot at or after {} is already archived in {}".format(
+                timestamp, self.directory))
+
+        # Deltas hold canonical records, see compute_changes(), and so
+        # does the base they apply to
+        records = {canonical_record(r) for r in group_values(csv_rows(records))}
+        os.makedirs(self.directory, exist_ok=True)
+
+        if not self._chain():
+            path = os.path.join(self.directory, 'base-{}.csv'.format(timestamp))
+            with open(path, 'w', newline='') as fout:
+                write_records(records, fout)
+            return path
+
+        changes = compute_changes(ARCHIVE_ZONE, self.records_at(), records)
+        if not changes:
+            return None
+
+        path = os.path.join(self.directory, 'delta-{}.csv'.format(timestamp))
+        with open(path, 'w', newline='') as fout:
+            out = csv.writer(fout)
+            out.writerow(['OPERATION'] + CSV_HEADER)
+            for change in changes:
+                for row in csv_rows([change["record"]]):
+                    out.writerow([change["operation"]] + row)
+        return path
+
+    def write_csv(self, fout, at=None):
+        """
+        Writes the zone as it was at the time `at` as a CSV dump.
+        """
+        write_records(self.records_at(at), fout)
+
+    def compact(self, at=None) -> str:
+        """
+        Folds the base and deltas up to the time `at` (the latest snapshot
+        if None) into a new base snapshot, removing the files it replaces.
+        Snapshots older than `at` can no longer be rebuilt afterwards.
+
+        :return: the path of the new base, or None if there's nothing to
+                 compact
+        """
+        chain = self._chain(at)
+        if len(chain) < 2:
+            return None
+
+        timestamp = chain[-1][0]
+        records = self.records_at(timestamp)
+
+        path = os.path.join(self.directory, 'base-{}.csv'.format(timestamp))
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', newline='') as fout:
+            write_records(records, fout)
+
+        # The new base is in place before the files it replaces are gone,
+        # so an interrupted compaction never loses a snapshot
+        replaced = [snapshot[2] for snapshot in self.snapshots()
+                    if snapshot[0] <= timestamp and snapshot[2] != path]
+        os.replace(tmp_path, path)
+        for replaced_path in replaced:
+            os.remove(replaced_path)
+
+        return path
+
+
+def archive(con, zone_name, directory, **kwargs):
+    """
+    Archives a snapshot of a Route53 zone in the `SnapshotArchive` stored
+    in `directory`.
+
+    Arguments are Route53 connection, zone name, archive directory, vpc
+    info, and whether to `compact` the archive afterwards.
+
+    :return: the path of the file written, or None if nothing changed
+    """
+    vpc = kwargs.get('vpc', {})
+
+    zone = get_zone(con, zone_name, vpc, zones=kwargs.get('zones'),
+                    cache=kwargs.get('zone_cache'))
+    if not zone:
+        exit_with_error("ERROR: {} zone {} not found!".format(
+            'Private' if vpc.get('is_private') else 'Public', zone_name))
+
+    snapshot_archive = SnapshotArchive(directory)
+    path = snapshot_archive.add(iter_rrsets(con, zone['id']))
+
+    if kwargs.get('compact'):
+        compacted = snapshot_archive.compact()
+        if compacted:
+            path = compacted
+
+    return path
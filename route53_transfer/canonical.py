@@ -0,0 +1,97 @@
+"""
+Canonical form of resource record sets
+
+The same record set can be written in several ways: a zone file may give
+its TTL and weight as `"0300"`, its name in upper case or without the
+trailing dot, TXT values unquoted and IPv6 addresses in full, while
+Route53 lists them the way it stores them. Comparing records as written
+would turn every such difference into a DELETE and a CREATE of a record
+that hasn't changed.
+
+`canonical_record()` rewrites a record the way Route53 lists it, so that
+`compute_changes()` and `merge_changes()` only find the records that
+really differ. Values that can't be parsed are left as they are, for
+Route53 to reject.
+"""
+
+import ipaddress
+
+from .app import ComparableRecord
+
+
+def canonical_name(name) -> str:
+    """
+    Returns a name the way Route53 stores it: in lower case, ending with a
+    dot, and with `*` escaped as `\\052`.
+    """
+    name = name.lower().replace('*', '\\052')
+    return name if name.endswith('.') else name + '.'
+
+
+def canonical_number(value):
+    """
+    Returns a TTL or weight as the decimal string Route53 lists it as.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        return str(int(value))
+    except ValueError:
+        return value
+
+
+def canonical_txt(value) -> str:
+    """
+    Returns a TXT or SPF value as a quoted character string, unless it's
+    quoted already.
+    """
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value
+    return '"{}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def canonical_ipv6(value) -> str:
+    """
+    Returns an IPv6 address in its compressed, lower case form.
+    """
+    try:
+        return ipaddress.IPv6Address(value).compressed
+    except ValueError:
+        return value
+
+
+VALUE_CANONICALIZERS = {
+    'AAAA': canonical_ipv6,
+    'SPF': canonical_txt,
+    'TXT': canonical_txt,
+}
+
+
+def canonical_record(record) -> ComparableRecord:
+    """
+    Returns the canonical ComparableRecord of a record, or the record
+    itself when it's a ComparableRecord in canonical form already.
+    """
+    canonical_value = VALUE_CANONICALIZERS.get(record.type)
+    resource_records = record.resource_records or ()
+    if canonical_value is not None:
+        resource_records = tuple(canonical_value(value) for value in resource_records)
+
+    alias_dns_name = record.alias_dns_name
+    evaluate_target_health = None
+    if alias_dns_name:
+        alias_dns_name = canonical_name(alias_dns_name)
+        # Route53 lists every alias with EvaluateTargetHealth, false by default
+        evaluate_target_health = bool(record.alias_evaluate_target_health)
+
+    values = (canonical_name(record.name), record.type, canonical_number(record.ttl),
+              resource_records, record.alias_hosted_zone_id, alias_dns_name,
+              record.identifier or None, canonical_number(record.weight),
+              record.region or None, evaluate_target_health,
+              record.health_check or None, record.failover or None)
+
+    # Most records are listed or read in canonical form already, and are
+    # kept rather than built again
+    if isinstance(record, ComparableRecord) and values == record._values:
+        return record
+    return ComparableRecord(*values)
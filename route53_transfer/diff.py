@@ -0,0 +1,146 @@
+"""
+Streaming comparison of two zones
+
+`compute_changes()` holds both the existing and the desired records of a
+zone in sets. `merge_changes()` computes the same changes from two
+streams of records sorted by `record_sort_key()`, merge-joining them and
+only holding the records of one record set identity at a time, besides
+the changes themselves.
+
+Records are compared in canonical form, and must come sorted by the
+`record_sort_key()` of their canonical form. `open_records()` reads CSV
+dumps in that order, sorting their rows in bounded memory, and binary
+snapshots hold their records in that order. `dump --sorted` writes CSV
+dumps that are already sorted, which are then read without having to
+reorder anything.
+"""
+
+import itertools
+
+from .app import csv_group_key, get_file, group_values, read_lines, record_sort_key, \
+    skip_apex_soa_ns
+from .canonical import canonical_name, canonical_record
+
+
+def check_sorted(records):
+    """
+    Yields `records`, making sure they come in `record_sort_key()` order.
+
+    :raises ValueError: on the first record out of order
+    """
+    previous = None
+    for record in records:
+        key = record_sort_key(record)
+        if previous is not None and key < previous:
+            raise ValueError("Records are not sorted: {} comes after {}".format(
+                ' '.join(key), ' '.join(previous)))
+        previous = key
+        yield record
+
+
+def skip_apex_records(records):
+    """
+    Drops the SOA and NS records of the zone apex from sorted records,
+    the apex being the name that holds the SOA record. Use it instead of
+    `skip_apex_soa_ns()` when the name of the zone isn't known.
+    """
+    for _, named in itertools.groupby(records, key=lambda r: r.name):
+        named = list(named)
+        if any(r.type == 'SOA' for r in named):
+            named = [r for r in named if r.type not in ('SOA', 'NS')]
+        yield from named
+
+
+def canonical_group_key(row: list) -> tuple:
+    """
+    Returns the `csv_group_key()` of a CSV row with its name in canonical
+    form, which orders rows like the `record_sort_key()` of the canonical
+    records they make up.
+    """
+    return (canonical_name(row[0]),) + csv_group_key(row)[1:]
+
+
+def _record_sets(zone, records):
+    """
+    Puts sorted records in canonical form and groups them by
+    `record_sort_key()`, leaving out the SOA and NS records of the zone
+    apex.
+
+    :raises ValueError: if the canonical records aren't sorted
+    :return: generator of (key, set of ComparableRecord) tuples
+    """
+    records = check_sorted(map(canonical_record, records))
+    if zone is None:
+        records = skip_apex_records(records)
+    else:
+        records = skip_apex_soa_ns(zone, records)
+
+    for key, group in itertools.groupby(records, key=record_sort_key):
+        yield key, set(group)
+
+
+def merge_changes(zone, existing_records, desired_records, use_upsert=False):
+    """
+    Computes the changes bringing a zone from `existing_records` to
+    `desired_records`, both sorted by the `record_sort_key()` of their
+    canonical form.
+
+    The changes are the ones `compute_changes()` computes for the same
+    records, in the same order.
+
+    :param zone: Route53 zone object, or None when the name of the zone
+           isn't known, in which case the apex is found from the SOA record
+    :raises ValueError: if the records aren't sorted
+    :return: list of ResourceRecordSet changes to be applied
+    """
+    existing = _record_sets(zone, existing_records)
+    desired = _record_sets(zone, desired_records)
+
+    deletes = []
+    creates = []
+
+    old, new = next(existing, None), next(desired, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            removed, added = old[1], set()
+            old = next(existing, None)
+        elif old is None or new[0] < old[0]:
+            removed, added = set(), new[1]
+            new = next(desired, None)
+        else:
+            removed, added = old[1] - new[1], new[1] - old[1]
+            old, new = next(existing, None), next(desired, None)
+
+        for record in added:
+            op_type = "CREATE"
+            if use_upsert and removed:
+                removed.pop()
+                op_type = "UPSERT"
+            creates.append({"zone": zone,
+                            "operation": op_type,
+                            "record": record})
+        deletes.extend(removed)
+
+    return [{"zone": zone, "operation": "DELETE", "record": record}
+            for record in reversed(deletes)] + creates
+
+
+def open_records(filename, stack):
+    """
+    Opens a CSV dump or a binary snapshot, closed when `stack`, an
+    `ExitStack`, is.
+
+    :return: iterable of ComparableRecord, sorted by the `record_sort_key()`
+             of their canonical form
+    """
+    from .snapshot import Snapshot, is_snapshot
+
+    if filename != '-':
+        with open(filename, 'rb') as f:
+            if is_snapshot(f.read(4)):
+                return stack.enter_context(Snapshot.open(filename))
+
+    file_in = get_file(filename, 'r')
+    if filename != '-':
+        stack.enter_context(file_in)
+    return group_values(read_lines(file_in), key=canonical_group_key)
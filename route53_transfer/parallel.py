@@ -0,0 +1,86 @@
+"""
+Parsing and diffing a zone on several cores
+
+Grouping the rows of a CSV dump into records and diffing them against the
+records of the zone run on a single core in `load()`. For very large
+zones, `parallel_changes()` splits both the rows of the dump and the
+existing records into shards by a CRC32 of the record name, so that all
+the rows of a record set, and both versions of a record, end up in the
+same shard. The shards are parsed and diffed by a pool of processes, and
+their changes merged back into the order `compute_changes()` returns
+them in, so that the result is the same as the serial one.
+
+Only the main process reads the dump, and records go to and from the
+workers pickled, so the pool only pays off for large zones and with
+several cores to spare.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+import os
+import zlib
+
+from .app import compute_changes, group_values, read_lines, record_sort_key
+from .canonical import canonical_name
+
+
+def shard_of(name, shards) -> int:
+    """
+    Returns the shard of a record name, the same for every way of writing
+    it. Unlike `hash()`, CRC32 gives the same shard in every process.
+    """
+    return zlib.crc32(canonical_name(name).encode('utf-8')) % shards
+
+
+def _diff_shard(zone, existing_records, rows, use_upsert):
+    """
+    Parses the CSV rows of a shard and diffs them against its existing
+    records, in a worker process.
+
+    :return: tuple of the changes, and the number of records parsed
+    """
+    desired_records = list(group_values(rows))
+    changes = compute_changes(zone, existing_records, desired_records, use_upsert=use_upsert)
+    return changes, len(desired_records)
+
+
+def parallel_changes(zone, existing_records, file_in, use_upsert=False, processes=None):
+    """
+    Computes the changes bringing a zone from `existing_records` to the
+    records of the CSV dump `file_in`, parsing and diffing shards of them
+    in `processes` worker processes.
+
+    :param processes: number of worker processes and shards, by default
+           the number of CPUs
+    :return: tuple of the changes, as returned by `compute_changes()`,
+             and the number of records read from `file_in`
+    """
+    shards = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=shards) as executor:
+        existing_shards = [[] for _ in range(shards)]
+        for record in existing_records:
+            existing_shards[shard_of(record.name, shards)].append(record)
+
+        row_shards = [[] for _ in range(shards)]
+        for row in read_lines(file_in):
+            row_shards[shard_of(row[0], shards)].append(row)
+
+        futures = [executor.submit(_diff_shard, zone, existing, rows, use_upsert)
+                   for existing, rows in zip(existing_shards, row_shards)]
+        results = [future.result() for future in futures]
+
+    # compute_changes() returns the deletes, in reverse key order, followed
+    # by the creates and upserts in key order, and so does every shard
+    deletes, creates = [], []
+    for changes, _ in results:
+        split = next((i for i, c in enumerate(changes) if c["operation"] != "DELETE"),
+                     len(changes))
+        deletes.append(changes[:split])
+        creates.append(changes[split:])
+
+    def change_key(change):
+        return record_sort_key(change["record"])
+
+    changes = list(heapq.merge(*deletes, key=change_key, reverse=True))
+    changes.extend(heapq.merge(*creates, key=change_key))
+    return changes, sum(count for _, count in results)
@@ -0,0 +1,199 @@
+"""
+Change plans computed once and committed later
+
+`load --dry-run` prints the changes a load would make, but the load that
+follows lists the zone, parses the file and computes the changes all
+over again. `write_plan()` saves the ChangeBatches of a load instead, as
+a gzipped JSON plan file, along with a fingerprint of the records of the
+zone the plan touches. `apply_plan()` commits those batches as they are,
+after checking that the records of the names the plan touches haven't
+changed since, which only lists those names rather than the whole zone.
+
+Plan files hold, besides a format version::
+
+    {"zone": {"id": ..., "name": ...},
+     "fingerprint": "<sha256 of the records of the touched names>",
+     "batches": [{"prio": 1, "changes": [["CREATE", [<record fields>]], ...]}, ...]}
+
+where the record fields are the values of `ComparableRecord.FIELDS`.
+"""
+
+import gzip
+import hashlib
+import json
+
+from .app import ChangeBatch, ComparableRecord, commit_update_batches, compute_load_changes, \
+    create_zone, exit_with_error, get_record_count, get_zone, iter_rrsets, iter_r53_updates, \
+    skip_apex_soa_ns
+from .canonical import canonical_name, canonical_record
+from .stats import RunStats
+
+PLAN_VERSION = 1
+
+# Record sets per ListResourceRecordSets page, when listing a whole zone
+LIST_PAGE_SIZE = 300
+
+
+def plan_names(batches) -> set:
+    """
+    Returns the names of the records the changes of `batches` touch.
+    """
+    return {change["record"].name for batch in batches for change in batch.changes}
+
+
+def fingerprint(zone, records, names) -> str:
+    """
+    Returns a digest of the records having one of `names`, in canonical
+    form, which changes whenever any of them does. Like the changes, it
+    leaves out the SOA and NS records of the zone apex.
+    """
+    records = sorted(repr([getattr(record, field) for field in ComparableRecord.FIELDS])
+                     for record in skip_apex_soa_ns(zone, map(canonical_record, records))
+                     if record.name in names)
+    digest = hashlib.sha256()
+    for record in records:
+        digest.update(record.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def iter_named_rrsets(con, zone_id, name):
+    """
+    Lists the record sets of a zone named `name`, starting the listing
+    at that name.
+    """
+    page = con.get_all_rrsets(zone_id, name=name)
+    while True:
+        for record in page[:]:
+            if canonical_name(record.name) != name:
+                return
+            yield record
+        if not page.is_truncated:
+            return
+        page = con.get_all_rrsets(zone_id,
+                                  name=page.next_record_name,
+                                  type=page.next_record_type,
+                                  identifier=page.next_record_identifier)
+
+
+def get_named_records(con, zone_id, names) -> list:
+    """
+    Returns the records of a zone having one of `names`, listing either
+    each name on its own, or the whole zone when that takes fewer
+    requests.
+    """
+    if not names:
+        return []
+    if len(names) >= get_record_count(con, zone_id) / LIST_PAGE_SIZE:
+        return [record for record in iter_rrsets(con, zone_id)
+                if canonical_name(record.name) in names]
+    return [record for name in sorted(names)
+            for record in iter_named_rrsets(con, zone_id, name)]
+
+
+def write_plan(zone, existing_records, batches, fout):
+    """
+    Writes a plan file of the ChangeBatches of a zone to the binary file
+    `fout`.
+
+    :param existing_records: records of the zone the changes were computed
+           against
+    """
+    plan = {
+        "version": PLAN_VERSION,
+        "zone": zone,
+        "fingerprint": fingerprint(zone, existing_records, plan_names(batches)),
+        "batches": [{"prio": batch.prio,
+                     "changes": [[change["operation"],
+                                  [getattr(change["record"], field)
+                                   for field in ComparableRecord.FIELDS]]
+                                 for change in batch.changes]}
+                    for batch in batches],
+    }
+    with gzip.GzipFile(fileobj=fout, mode='wb', mtime=0) as gz:
+        gz.write(json.dumps(plan, separators=(',', ':')).encode('utf-8'))
+
+
+def read_plan(fin) -> tuple:
+    """
+    Reads a plan file written by `write_plan()` from the binary file `fin`.
+
+    :raises ValueError: if it isn't a plan file of a known version
+    :return: tuple of the zone, the fingerprint and the list of ChangeBatch
+    """
+    try:
+        with gzip.GzipFile(fileobj=fin, mode='rb') as gz:
+            plan = json.loads(gz.read().decode('utf-8'))
+    except (OSError, ValueError) as e:
+        raise ValueError("Not a plan file: {}".format(e))
+    if not isinstance(plan, dict) or plan.get("version") != PLAN_VERSION:
+        raise ValueError("Unsupported plan file version {}".format(
+            plan.get("version") if isinstance(plan, dict) else None))
+
+    batches = []
+    for batch_plan in plan["batches"]:
+        batch = ChangeBatch(prio=batch_plan["prio"])
+        for operation, values in batch_plan["changes"]:
+            batch.add_change({"operation": operation, "record": ComparableRecord(*values)})
+        batches.append(batch)
+    return plan["zone"], plan["fingerprint"], batches
+
+
+def plan(con, zone_name, file_in, fout, **kwargs):
+    """
+    Computes the changes loading `file_in` would make to a zone, like
+    `load()`, prints them and writes them to the plan file `fout` instead
+    of committing them. A missing zone is only created by `apply_plan()`.
+
+    :return: the number of changes planned
+    """
+    stats = kwargs.get('stats') or RunStats()
+    kwargs = dict(kwargs, stats=stats, dry_run=True)
+
+    zone, existing_records, changes = compute_load_changes(con, zone_name, file_in, **kwargs)
+    with stats.phase('plan'):
+        batches = list(iter_r53_updates(zone, changes))
+    commit_update_batches(con, zone, batches, **kwargs)
+
+    with stats.phase('write'):
+        write_plan(zone, existing_records, batches, fout)
+    return len(changes)
+
+
+def apply_plan(con, fin, **kwargs):
+    """
+    Commits the ChangeBatches of a plan file written by `plan()`, once the
+    records of the names they touch are checked to be the ones the plan
+    was computed against. Takes the `wait` options of `load()`.
+
+    :return: the number of changes committed
+    """
+    stats = kwargs.get('stats') or RunStats()
+    kwargs = dict(kwargs, stats=stats)
+
+    zone, expected, batches = read_plan(fin)
+    names = plan_names(batches)
+
+    with stats.phase('zone'):
+        if zone['id'] is None:
+            vpc = kwargs.get('vpc', {})
+            zone_name = zone['name'].rstrip('.')
+            zone = get_zone(con, zone_name, vpc, cache=kwargs.get('zone_cache')) or \
+                create_zone(con, zone_name, vpc, cache=kwargs.get('zone_cache'))
+
+    with stats.phase('list'):
+        records = get_named_records(con, zone['id'], names)
+    stats.count('records_listed', len(records))
+    if fingerprint(zone, records, names) != expected:
+        exit_with_error("ERROR: The records of zone {} changed since the plan was made, "
+                        "plan it again\n".format(zone['name']))
+
+    commit_update_batches(con, zone, batches, **kwargs)
+
+    # The plan only knows about the records it changes
+    if kwargs.get('rrset_cache') is not None:
+        kwargs['rrset_cache'].invalidate(zone['id'])
+
+    change_count = sum(len(batch.changes) for batch in batches)
+    stats.count('changes', change_count)
+    return change_count
@@ -0,0 +1,96 @@
+"""
+Waiting for changes to propagate
+
+Route53 answers a ChangeResourceRecordSets request as soon as it accepts
+the change, with a PENDING status, and only switches the change to
+INSYNC once every one of its authoritative DNS servers serves it.
+`ChangeWaiter` keeps track of the changes committed by a load and polls
+their status with GetChange, all the pending ones at every round, backing
+off between rounds, until they're all INSYNC.
+"""
+
+import time
+
+# Seconds between the first rounds of GetChange requests, growing by
+# POLL_BACKOFF after every round still finding pending changes
+POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 15.0
+POLL_BACKOFF = 1.5
+
+# Seconds to wait for changes to be INSYNC before giving up
+DEFAULT_WAIT_TIMEOUT = 1800
+
+
+class ChangeWaiter(object):
+    """
+    Changes committed to Route53, and the time they were seen INSYNC
+
+    :param con: Route53 connection
+    :param timeout: seconds `wait()` waits for the changes at most
+    """
+    def __init__(self, con, timeout=DEFAULT_WAIT_TIMEOUT, poll_interval=POLL_INTERVAL,
+                 max_poll_interval=MAX_POLL_INTERVAL, clock=time.monotonic, sleep=time.sleep):
+        self._con = con
+        self._clock = clock
+        self._sleep = sleep
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        # Change id -> time it was committed, and seen INSYNC
+        self.submitted = {}
+        self.insync = {}
+
+    @property
+    def pending(self) -> list:
+        return [change_id for change_id in self.submitted if change_id not in self.insync]
+
+    def add(self, change_info):
+        """
+        Starts tracking a change, given the `ChangeInfo` dict of the
+        ChangeResourceRecordSets response that submitted it.
+        """
+        now = self._clock()
+        change_id = change_info['Id']
+        self.submitted[change_id] = now
+        if change_info.get('Status') == 'INSYNC':
+            self.insync[change_id] = now
+
+    def poll(self) -> list:
+        """
+        Gets the status of every pending change.
+
+        :return: the ids of the changes still pending
+        """
+        for change_id in self.pending:
+            res = self._con.get_change(change_id.replace('/change/', ''))
+            if res['GetChangeResponse']['ChangeInfo']['Status'] == 'INSYNC':
+                self.insync[change_id] = self._clock()
+        return self.pending
+
+    def wait(self) -> float:
+        """
+        Waits for every change added so far to be INSYNC.
+
+        :return: seconds spent waiting
+        :raises TimeoutError: if changes are still pending after `timeout`
+        """
+        start = self._clock()
+        interval = self.poll_interval
+        while self.poll():
+            waited = self._clock() - start
+            if waited >= self.timeout:
+                raise TimeoutError("Changes {} not INSYNC after {:.0f} seconds".format(
+                    ', '.join(self.pending), waited))
+            self._sleep(min(interval, self.timeout - waited))
+            interval = min(self.max_poll_interval, interval * POLL_BACKOFF)
+        return self._clock() - start
+
+    def latency(self) -> float:
+        """
+        Returns the seconds between the first change being committed and
+        the last one being seen INSYNC, which is the time the changes
+        took to propagate, give or take a polling interval.
+        """
+        if not self.insync:
+            return 0.0
+        return max(self.insync.values()) - min(self.submitted.values())
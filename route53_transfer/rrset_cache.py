@@ -0,0 +1,88 @@
+"""
+Cache of the records of hosted zones
+
+Before computing the changes to apply, `load()` needs every record set of
+the zone, and listing a large zone takes one Route53 request for every 300
+record sets. When the same zones are loaded over and over again, and the
+changes made to them only come from route53-transfer, most of that listing
+is wasted.
+
+The cache keeps the records of each zone in a JSON file named after the
+zone id, along with their count. It's revalidated with a single
+GetHostedZone request, comparing the number of record sets Route53 reports
+with the cached one. After a load, the cache is updated with the records
+the zone holds once the changes are applied, and the id of the last
+change submitted.
+
+Route53 doesn't tell the id of the latest change made to a zone, so edits
+made by other means that keep the same number of record sets (changing a
+TTL or a value) go unnoticed. Only use the cache for zones managed by
+route53-transfer alone.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .app import ComparableRecord
+
+
+class RRSetCache(object):
+    """
+    Records of hosted zones, stored in `directory`, one file per zone
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, zone_id):
+        zone_id = zone_id.replace('/hostedzone/', '').strip('/')
+        return os.path.join(self.directory, '{}.json'.format(zone_id))
+
+    def get(self, zone_id, record_count):
+        """
+        Returns the cached records of a zone, as a set of ComparableRecord,
+        or None if they aren't cached or their count differs from
+        `record_count`, the number of record sets the zone has now.
+        """
+        path = self._path(zone_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except ValueError:
+            # A corrupt cache file is as good as a missing one
+            return None
+
+        if entry['record_count'] != int(record_count):
+            return None
+        return {ComparableRecord(*values) for values in entry['records']}
+
+    def put(self, zone_id, records, change_id=None):
+        """
+        Stores the records of a zone. `change_id` is the id of the change
+        that left the zone with these records, if any.
+        """
+        entry = {
+            'zone_id': zone_id,
+            'time': time.time(),
+            'change_id': change_id,
+            'record_count': len(records),
+            'records': [[getattr(r, f) for f in ComparableRecord.FIELDS] for r in records],
+        }
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.rrset-cache')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(zone_id))
+
+    def invalidate(self, zone_id):
+        with self._lock:
+            try:
+                os.remove(self._path(zone_id))
+            except FileNotFoundError:
+                pass
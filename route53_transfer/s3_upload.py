@@ -0,0 +1,187 @@
+"""
+Streaming compressed dumps to S3
+
+`dump_to_s3()` writes a zone dump straight into an S3 multipart upload,
+compressed on the fly with gzip or zstd, without any local file. Parts are
+uploaded by a pool of threads while the dump goes on paginating through
+the zone, and at most `concurrency` parts are in flight at any time, so
+that memory use stays around `part_size * (concurrency + 1)` bytes.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import gzip
+import io
+import threading
+
+from .app import dump
+
+# S3 rejects multipart uploads with parts smaller than 5 MiB, except the last
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_UPLOAD_CONCURRENCY = 4
+
+COMPRESSIONS = ('gzip', 'zstd', 'none')
+
+# Suffix added to the name of the S3 key for each compression
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst', 'none': ''}
+
+
+class MultipartUploadWriter(io.RawIOBase):
+    """
+    Binary file object uploading what is written to it as an S3 multipart
+    upload to `key_name` in a boto `bucket`
+
+    Data is buffered until a whole part is available, which is then handed
+    to a thread pool for upload. Writes block while `concurrency` parts are
+    already being uploaded. The upload is completed on `close()`, or
+    cancelled by `abort()`.
+    """
+    def __init__(self, bucket, key_name, part_size=DEFAULT_PART_SIZE,
+                 concurrency=DEFAULT_UPLOAD_CONCURRENCY):
+        super().__init__()
+        self._upload = None
+        if part_size < MIN_PART_SIZE:
+            raise ValueError("S3 parts must be at least {} bytes".format(MIN_PART_SIZE))
+
+        self.part_size = part_size
+        self.bytes_written = 0
+        self._buffer = bytearray()
+        self._part_num = 0
+        self._futures = []
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._upload = bucket.initiate_multipart_upload(key_name)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed file")
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._upload_part(part)
+        return len(data)
+
+    def _upload_part(self, part):
+        # Fail early when a part already failed to upload
+        for future in self._futures:
+            if future.done():
+                future.result()
+
+        self._slots.acquire()
+        self._part_num += 1
+
+        def upload(part_num):
+            try:
+                self._upload.upload_part_from_file(io.BytesIO(part), part_num, size=len(part))
+            finally:
+                self._slots.release()
+
+        self._futures.append(self._executor.submit(upload, self._part_num))
+
+    def close(self):
+        """
+        Uploads the last part and completes the upload.
+        """
+        if self.closed or self._upload is None:
+            super().close()
+            return
+        try:
+            if self._buffer or not self._part_num:
+                self._upload_part(bytes(self._buffer))
+                self._buffer = bytearray()
+            for future in self._futures:
+                future.result()
+            self._upload.complete_upload()
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self._executor.shutdown()
+            super().close()
+
+    def abort(self):
+        """
+        Cancels the upload, discarding the parts already uploaded.
+        """
+        if self.closed or self._upload is None:
+            super().close()
+            return
+        self._executor.shutdown(cancel_futures=True)
+        self._upload.cancel_upload()
+        super().close()
+
+
+def compressor(fout, compression):
+    """
+    Returns a binary file object compressing what is written to it into
+    `fout`, which it leaves open when closed.
+    """
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=fout, mode='wb')
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor().stream_writer(fout, closefd=False)
+    elif compression == 'none':
+        return _Unclosed(fout)
+    raise ValueError('Unknown compression "{}"'.format(compression))
+
+
+class _Unclosed(io.RawIOBase):
+    def __init__(self, fout):
+        super().__init__()
+        self._fout = fout
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self._fout.write(data)
+
+
+def dump_to_s3(con, zone_name, bucket, key_name, **kwargs):
+    """
+    Dumps a zone to an S3 key, without going through a local file.
+
+    Arguments are the same as `dump()`'s, with a boto S3 `bucket` and the
+    name of the key instead of the output file, and:
+
+    :param compression: `gzip` (default), `zstd` or `none`
+    :param part_size: size of the multipart upload parts, in bytes
+    :param concurrency: number of parts uploaded at the same time
+    :return: number of resource record sets written
+    """
+    compression = kwargs.pop('compression', 'gzip')
+    writer = MultipartUploadWriter(bucket, key_name,
+                                   part_size=kwargs.pop('part_size', DEFAULT_PART_SIZE),
+                                   concurrency=kwargs.pop('concurrency', DEFAULT_UPLOAD_CONCURRENCY))
+    compressed = fout = None
+    try:
+        compressed = compressor(writer, compression)
+        if kwargs.get('file_format') == 'binary':
+            fout = compressed
+        else:
+            fout = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+
+        record_count = dump(con, zone_name, fout, **kwargs)
+        fout.close()
+    except BaseException:
+        # Closed now, as they would otherwise flush into the aborted upload
+        # once garbage collected
+        for f in (fout, compressed):
+            if f is not None:
+                with contextlib.suppress(Exception):
+                    f.close()
+        writer.abort()
+        raise
+
+    writer.close()
+    return record_count
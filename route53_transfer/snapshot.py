@@ -0,0 +1,340 @@
+"""
+Compact binary snapshots of a zone
+
+A CSV dump has to be parsed in full to find anything in it. A binary
+snapshot holds the same records in a layout that can be memory-mapped and
+searched by name without reading the rest of the file:
+
+    header      MAGIC, format version
+    records     one after the other, sorted by name, type and set id
+    strings     offsets of the interned strings, then their UTF-8 bytes
+    index       every distinct name, sorted, with the offset of its first
+                record and its number of records
+    trailer     offsets and counts of the sections above, then MAGIC
+
+Every string appearing in the records (names, types, values, ...) is
+stored only once. The name of a record is the one of its index entry, and
+the rest is encoded as LEB128 variable-length integers, most of which
+take a single byte: a bit mask of the fields that aren't None, a
+reference for each of them, the number of values and a reference for
+each value. References are 0 for False, 1 for True, and `2 * n + 2` for
+the string number `n`. Integer fields (boto gives alias records a TTL of
+600) are stored as strings, referenced by `2 * n + 3`.
+
+`write_snapshot()` writes records to a snapshot, `Snapshot` reads them,
+and `csv_to_snapshot()` and `snapshot_to_csv()` convert to and from the
+CSV layout of `dump()`.
+"""
+
+import csv
+import mmap
+import struct
+
+from .app import (
+    CSV_HEADER,
+    ComparableRecord,
+    iter_records,
+    record_sort_key,
+    record_to_stringlist,
+)
+
+MAGIC = b'R53S'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHH')
+# strings offset, string bytes offset, index offset, string count,
+# name count, record count, magic
+TRAILER = struct.Struct('<IIIIII4s')
+# name string number, offset of the first record, number of records
+INDEX_ENTRY = struct.Struct('<III')
+STRING_OFFSET = struct.Struct('<I')
+
+REF_FALSE, REF_TRUE = 0, 1
+FIRST_STRING_REF = 2
+
+# The name of a record is the one of its index entry, and its values are
+# encoded apart, after all the other fields
+VALUES_FIELD = ComparableRecord.FIELDS.index('resource_records')
+ENCODED_FIELDS = tuple(i for i, field in enumerate(ComparableRecord.FIELDS)
+                       if field not in ('name', 'resource_records'))
+
+
+def _encode_varint(n, out: bytearray):
+    while n >= 0x80:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _decode_varint(data, offset):
+    """
+    Decodes a LEB128 integer from `data` starting at `offset`.
+
+    :return: tuple of the integer, and the offset past it
+    """
+    n = data[offset]
+    offset += 1
+    if n < 0x80:
+        return n, offset
+
+    n &= 0x7f
+    shift = 7
+    while True:
+        byte = data[offset]
+        offset += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, offset
+        shift += 7
+
+
+class _StringTable(object):
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def ref(self, value) -> int:
+        if value is False:
+            return REF_FALSE
+        if value is True:
+            return REF_TRUE
+        return 2 * self.string_id(str(value)) + FIRST_STRING_REF + isinstance(value, int)
+
+    def string_id(self, value: str) -> int:
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+
+def write_snapshot(records, fout) -> int:
+    """
+    Writes records to `fout`, a file opened in binary mode, as a snapshot.
+
+    :param records: boto Records or ComparableRecords
+    :return: number of records written
+    """
+    records = sorted({ComparableRecord.from_record(r) for r in records}, key=record_sort_key)
+    strings = _StringTable()
+    index = []
+
+    fout.write(HEADER.pack(MAGIC, VERSION, 0))
+    offset = HEADER.size
+    for record in records:
+        if index and strings.strings[index[-1][0]] == record.name:
+            index[-1][2] += 1
+        else:
+            index.append([strings.string_id(record.name), offset, 1])
+
+        fields = [getattr(record, ComparableRecord.FIELDS[i]) for i in ENCODED_FIELDS]
+        present = 0
+        for bit, value in enumerate(fields):
+            if value is not None:
+                present |= 1 << bit
+
+        data = bytearray()
+        _encode_varint(present, data)
+        for value in fields:
+            if value is not None:
+                _encode_varint(strings.ref(value), data)
+        _encode_varint(len(record.resource_records), data)
+        for value in record.resource_records:
+            _encode_varint(strings.ref(value), data)
+        fout.write(data)
+        offset += len(data)
+
+    strings_offset = offset
+    encoded = [s.encode('utf-8') for s in strings.strings]
+    string_offset = 0
+    for s in encoded:
+        fout.write(STRING_OFFSET.pack(string_offset))
+        string_offset += len(s)
+    fout.write(STRING_OFFSET.pack(string_offset))
+    blob_offset = strings_offset + STRING_OFFSET.size * (len(encoded) + 1)
+    fout.write(b''.join(encoded))
+
+    index_offset = blob_offset + string_offset
+    for name_id, name_offset, count in index:
+        fout.write(INDEX_ENTRY.pack(name_id, name_offset, count))
+
+    fout.write(TRAILER.pack(strings_offset, blob_offset, index_offset,
+                            len(encoded), len(index), len(records), MAGIC))
+    return len(records)
+
+
+def is_snapshot(data) -> bool:
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+
+class Snapshot(object):
+    """
+    Records of a binary snapshot, read from a bytes-like object
+
+    Records are only decoded when they're looked up or iterated, and the
+    names are binary searched in the index, so a memory-mapped snapshot
+    (see `Snapshot.open()`) can be queried without reading it in full.
+    """
+    def __init__(self, data):
+        self._data = data
+        self._mmap = None
+
+        if len(data) < HEADER.size + TRAILER.size:
+            raise ValueError("Truncated snapshot")
+        magic, version, _ = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a route53-transfer snapshot")
+        if version != VERSION:
+            raise ValueError("Unsupported snapshot version {}".format(version))
+
+        (self._strings_offset, self._blob_offset, self._index_offset,
+         self._string_count, self._name_count, self._record_count,
+         magic) = TRAILER.unpack_from(data, len(data) - TRAILER.size)
+        if magic != MAGIC:
+            raise ValueError("Truncated snapshot")
+
+        self._strings = {}
+
+    @classmethod
+    def open(cls, path):
+        """
+        Opens a snapshot file, memory-mapped.
+        """
+        with open(path, 'rb') as f:
+            return cls.from_file(f)
+
+    @classmethod
+    def from_file(cls, f):
+        """
+        Reads a snapshot from a file object opened in binary mode, mapping
+        it in memory when it's a regular file.
+        """
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            return cls(f.read())
+        try:
+            snapshot = cls(data)
+        except BaseException:
+            data.close()
+            raise
+        snapshot._mmap = data
+        return snapshot
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._record_count
+
+    def _string(self, string_id) -> str:
+        string = self._strings.get(string_id)
+        if string is None:
+            start, end = struct.unpack_from(
+                '<II', self._data, self._strings_offset + STRING_OFFSET.size * string_id)
+            string = bytes(self._data[self._blob_offset + start:self._blob_offset + end]).decode('utf-8')
+            self._strings[string_id] = string
+        return string
+
+    def _value(self, ref):
+        if ref < FIRST_STRING_REF:
+            return ref == REF_TRUE
+        string_id, is_int = divmod(ref - FIRST_STRING_REF, 2)
+        value = self._string(string_id)
+        return int(value) if is_int else value
+
+    def _read_records(self, name, offset, count):
+        data = self._data
+        value = self._value
+        for _ in range(count):
+            fields = [None] * len(ComparableRecord.FIELDS)
+            fields[0] = name
+
+            present, offset = _decode_varint(data, offset)
+            for bit, i in enumerate(ENCODED_FIELDS):
+                if present >> bit & 1:
+                    ref, offset = _decode_varint(data, offset)
+                    fields[i] = value(ref)
+
+            value_count, offset = _decode_varint(data, offset)
+            values = []
+            for _ in range(value_count):
+                ref, offset = _decode_varint(data, offset)
+                values.append(value(ref))
+            fields[VALUES_FIELD] = values
+
+            yield ComparableRecord(*fields)
+
+    def _index_entry(self, i) -> tuple:
+        name_id, offset, count = INDEX_ENTRY.unpack_from(
+            self._data, self._index_offset + INDEX_ENTRY.size * i)
+        return self._string(name_id), offset, count
+
+    def _bisect(self, name) -> int:
+        lo, hi = 0, self._name_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._index_entry(mid)[0] < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __iter__(self):
+        for i in range(self._name_count):
+            yield from self._read_records(*self._index_entry(i))
+
+    def names(self):
+        for i in range(self._name_count):
+            yield self._index_entry(i)[0]
+
+    def lookup(self, name) -> list:
+        """
+        Returns the records named exactly `name`.
+        """
+        i = self._bisect(name)
+        if i < self._name_count:
+            entry = self._index_entry(i)
+            if entry[0] == name:
+                return list(self._read_records(*entry))
+        return []
+
+    def lookup_prefix(self, prefix):
+        """
+        Yields the records whose name starts with `prefix`, in name order.
+        """
+        for i in range(self._bisect(prefix), self._name_count):
+            entry = self._index_entry(i)
+            if not entry[0].startswith(prefix):
+                break
+            yield from self._read_records(*entry)
+
+
+def csv_to_snapshot(file_in, fout) -> int:
+    """
+    Converts a CSV dump read from `file_in` to a snapshot written to `fout`.
+
+    :return: number of records converted
+    """
+    return write_snapshot(iter_records(file_in), fout)
+
+
+def snapshot_to_csv(snapshot, fout) -> int:
+    """
+    Writes the records of a `Snapshot` to `fout` as a CSV dump.
+
+    :return: number of records converted
+    """
+    out = csv.writer(fout)
+    out.writerow(CSV_HEADER)
+    for record in snapshot:
+        out.writerows(record_to_stringlist(record))
+    return len(snapshot)
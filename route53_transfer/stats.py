@@ -0,0 +1,211 @@
+"""
+Timing and counters of a run
+
+A `RunStats` collects where the time of a load or dump goes: the
+wall-clock and CPU time of each phase (finding the zone, listing its
+records, parsing the zone file, computing and planning the changes,
+committing them), the Route53 calls made and how long they took, the
+bytes sent to and received from Route53, and counters of the records,
+changes and batches processed. `report()` sums it all up, with the peak
+memory of the process, as a dict that `write_text()` prints for humans
+and `write_json()` writes for monitoring.
+
+Phases can be entered any number of times, from several threads, and
+their times add up. The CPU time is the one of the whole process, so
+phases running concurrently each get the CPU time of the others too.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+import json
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+def peak_memory():
+    """
+    Returns the peak resident memory of the process in bytes, or None
+    where it can't be known.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux, but in bytes on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+class RunStats(object):
+    """
+    Phase timings, Route53 calls and counters of a run
+
+    :param clock: wall-clock time, in seconds
+    :param cpu_clock: CPU time of the process, in seconds
+    """
+    def __init__(self, clock=time.perf_counter, cpu_clock=time.process_time):
+        self._clock = clock
+        self._cpu_clock = cpu_clock
+        self._lock = threading.Lock()
+        self._start = clock()
+        self._cpu_start = cpu_clock()
+        self.phases = {}
+        self.calls = {}
+        self.counters = Counter()
+        self.throttle = None
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager adding the time spent in its block to phase `name`.
+        """
+        start, cpu_start = self._clock(), self._cpu_clock()
+        try:
+            yield
+        finally:
+            seconds = self._clock() - start
+            cpu_seconds = self._cpu_clock() - cpu_start
+            with self._lock:
+                phase = self.phases.setdefault(name, {'count': 0, 'seconds': 0.0,
+                                                      'cpu_seconds': 0.0})
+                phase['count'] += 1
+                phase['seconds'] += seconds
+                phase['cpu_seconds'] += cpu_seconds
+
+    def count(self, key, n=1):
+        with self._lock:
+            self.counters[key] += n
+
+    def add_call(self, operation, seconds, error=False):
+        """
+        Records a Route53 call of `operation` that took `seconds`.
+        """
+        with self._lock:
+            call = self.calls.setdefault(operation, {'calls': 0, 'errors': 0, 'seconds': 0.0})
+            call['calls'] += 1
+            call['errors'] += bool(error)
+            call['seconds'] += seconds
+
+    def report(self, **extra) -> dict:
+        """
+        Returns the stats of the run so far. `extra` items, such as the
+        command and zone, are added as they are.
+        """
+        with self._lock:
+            report = dict(extra)
+            report['seconds'] = self._clock() - self._start
+            report['cpu_seconds'] = self._cpu_clock() - self._cpu_start
+            report['peak_memory_bytes'] = peak_memory()
+            report['phases'] = {name: dict(phase) for name, phase in self.phases.items()}
+            report['api_calls'] = {op: dict(call) for op, call in self.calls.items()}
+            report['api_call_count'] = sum(call['calls'] for call in self.calls.values())
+            report['pages'] = self.calls.get('get_all_rrsets', {}).get('calls', 0)
+            report['counters'] = dict(self.counters)
+            if self.throttle is not None:
+                report['throttle'] = dict(self.throttle)
+        return report
+
+    def write_json(self, fout, **extra):
+        json.dump(self.report(**extra), fout, sort_keys=True)
+        fout.write('\n')
+        fout.flush()
+
+    def write_text(self, fout, **extra):
+        report = self.report(**extra)
+        write = fout.write
+
+        write('{:<20}{:>8}{:>12}{:>12}\n'.format('PHASE', 'COUNT', 'SECONDS', 'CPU'))
+        for name, phase in report['phases'].items():
+            write('{:<20}{:>8}{:>12.3f}{:>12.3f}\n'.format(
+                name, phase['count'], phase['seconds'], phase['cpu_seconds']))
+        write('{:<20}{:>8}{:>12.3f}{:>12.3f}\n'.format(
+            'total', '', report['seconds'], report['cpu_seconds']))
+
+        if report['api_calls']:
+            write('\n{:<28}{:>8}{:>8}{:>12}\n'.format('API CALL', 'CALLS', 'ERRORS', 'SECONDS'))
+            for operation, call in sorted(report['api_calls'].items()):
+                write('{:<28}{:>8}{:>8}{:>12.3f}\n'.format(
+                    operation, call['calls'], call['errors'], call['seconds']))
+
+        write('\n')
+        for key, value in sorted(report['counters'].items()):
+            write('{}: {}\n'.format(key, value))
+        for key, value in sorted((report.get('throttle') or {}).items()):
+            write('{}: {}\n'.format(key, round(value, 3) if isinstance(value, float) else value))
+        if report['peak_memory_bytes'] is not None:
+            write('peak memory: {:.1f} MiB\n'.format(report['peak_memory_bytes'] / 1024 / 1024))
+        fout.flush()
+
+
+class StatsConnection(object):
+    """
+    Proxy for a Route53 connection timing and counting the calls made
+    through it in a `RunStats`
+
+    Other attributes are passed through as they are.
+    """
+    def __init__(self, con, stats):
+        self._con = con
+        self._stats = stats
+
+    @property
+    def connection(self):
+        return self._con
+
+    def __getattr__(self, name):
+        attr = getattr(self._con, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def timed_call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = attr(*args, **kwargs)
+            except BaseException:
+                self._stats.add_call(name, time.perf_counter() - start, error=True)
+                raise
+            self._stats.add_call(name, time.perf_counter() - start)
+            return result
+
+        return timed_call
+
+
+class _CountingResponse(object):
+    def __init__(self, response, stats):
+        self._response = response
+        self._stats = stats
+
+    def read(self, *args):
+        body = self._response.read(*args)
+        self._stats.count('bytes_received', len(body))
+        return body
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+def count_transfers(con, stats):
+    """
+    Counts the bytes of the requests `con`, a boto connection, sends and
+    of the responses it reads, as `bytes_sent` and `bytes_received`.
+
+    boto sends every request of a connection through its `make_request()`
+    method, which is replaced on `con` by one doing the counting.
+    """
+    make_request = con.make_request
+
+    def counting_make_request(action, path, headers=None, data='', *args, **kwargs):
+        if isinstance(data, str):
+            stats.count('bytes_sent', len(data.encode('utf-8')))
+        elif data:
+            stats.count('bytes_sent', len(data))
+        return _CountingResponse(make_request(action, path, headers, data, *args, **kwargs),
+                                 stats)
+
+    con.make_request = counting_make_request
+    return con
@@ -0,0 +1,633 @@
+"""
+Tools to exercise route53-transfer without AWS
+
+`generate_zone()` builds a synthetic zone of any size, with the mix of
+record sets found in real zones, and `mutate_zone()` derives a modified
+copy of it to diff against. Both are seeded, so that the same arguments
+always give the same records.
+
+`FakeRoute53Connection` stands in for a boto Route53 connection, keeping
+its hosted zones in memory, so that `load()`, `dump()` and the command
+line can be run and timed end to end, with simulated latency and
+throttling.
+"""
+
+from bisect import bisect_left
+from collections import Counter
+import itertools
+import random
+import threading
+import time
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from boto.route53.exception import DNSServerError
+from boto.route53.record import Record, ResourceRecordSets
+
+from .canonical import canonical_name
+
+# Relative frequency of each kind of record set in a generated zone
+RECORD_KINDS = (
+    ('a', 50),
+    ('txt', 15),
+    ('cname', 10),
+    ('weighted', 8),
+    ('latency', 7),
+    ('failover', 5),
+    ('alias_chain', 5),
+)
+
+REGIONS = ('us-east-1', 'us-west-2', 'eu-west-1', 'eu-central-1', 'ap-southeast-1')
+
+TTLS = ('60', '300', '3600', '86400')
+
+
+class _ZoneGenerator(object):
+    def __init__(self, zone_name, zone_id, seed, max_alias_chain):
+        self.zone_name = zone_name.rstrip('.') + '.'
+        self.zone_id = zone_id
+        self.max_alias_chain = max_alias_chain
+        self.random = random.Random(seed)
+        self.serial = 0
+
+    def name(self, prefix):
+        self.serial += 1
+        return '{}{}.{}'.format(prefix, self.serial, self.zone_name)
+
+    def ip(self):
+        return '10.{}.{}.{}'.format(*(self.random.randrange(256) for _ in range(3)))
+
+    def ttl(self):
+        return self.random.choice(TTLS)
+
+    def a_record(self, name=None, **kwargs):
+        values = {self.ip() for _ in range(self.random.randint(1, 4))}
+        return Record(name=name or self.name('host'), type='A', ttl=self.ttl(),
+                      resource_records=sorted(values), **kwargs)
+
+    def a(self):
+        return [self.a_record()]
+
+    def txt(self):
+        values = ['"{}"'.format('%032x' % self.random.getrandbits(128))
+                  for _ in range(self.random.randint(1, 3))]
+        return [Record(name=self.name('txt'), type='TXT', ttl=self.ttl(),
+                       resource_records=values)]
+
+    def cname(self):
+        target = 'www{}.example.com.'.format(self.random.randrange(1000))
+        return [Record(name=self.name('cname'), type='CNAME', ttl=self.ttl(),
+                       resource_records=[target])]
+
+    def weighted(self):
+        name = self.name('weighted')
+        return [self.a_record(name, identifier='w{}'.format(n), weight=str(self.random.randint(0, 255)))
+                for n in range(self.random.randint(2, 4))]
+
+    def latency(self):
+        name = self.name('latency')
+        return [self.a_record(name, identifier=region, region=region)
+                for region in self.random.sample(REGIONS, self.random.randint(2, 3))]
+
+    def failover(self):
+        name = self.name('failover')
+        health_check = '{:08x}-0000-0000-0000-000000000000'.format(self.random.getrandbits(32))
+        return [self.a_record(name, identifier='primary', failover='PRIMARY', health_check=health_check),
+                self.a_record(name, identifier='secondary', failover='SECONDARY')]
+
+    def alias_chain(self):
+        records = [self.a_record()]
+        for _ in range(self.random.randint(1, self.max_alias_chain)):
+            records.append(Record(name=self.name('alias'), type='A',
+                                  alias_hosted_zone_id=self.zone_id,
+                                  alias_dns_name=records[-1].name,
+                                  alias_evaluate_target_health=False))
+        return records
+
+    def generate(self, size):
+        kinds = [kind for kind, _ in RECORD_KINDS]
+        weights = [weight for _, weight in RECORD_KINDS]
+        records = []
+        while len(records) < size:
+            kind = self.random.choices(kinds, weights)[0]
+            records.extend(getattr(self, kind)())
+        # Alias chains start with their target, so cutting the list keeps
+        # every alias pointing to an existing record
+        return records[:size]
+
+
+def generate_zone(zone_name, size, seed=0, zone_id='ZGENERATED', max_alias_chain=3):
+    """
+    Generates `size` record sets for a zone: A and TXT records with one or
+    more values, CNAMEs, weighted, latency and failover sets, and chains
+    of up to `max_alias_chain` aliases to other records of the zone, which
+    use `zone_id`.
+
+    :return: list of boto Records
+    """
+    return _ZoneGenerator(zone_name, zone_id, seed, max_alias_chain).generate(size)
+
+
+def mutate_zone(records, changed_ratio=0.1, seed=0):
+    """
+    Returns a copy of `records` where about `changed_ratio` of the record
+    sets have their TTL changed, are deleted, or get a new record added
+    after them, in equal parts. Records that are the target of an alias are
+    never deleted.
+
+    :return: list of boto Records
+    """
+    rnd = random.Random(seed)
+    alias_targets = {r.alias_dns_name for r in records if r.alias_dns_name}
+    mutated = []
+    for n, record in enumerate(records):
+        if rnd.random() >= changed_ratio:
+            mutated.append(record)
+            continue
+
+        change = rnd.randrange(3)
+        if change == 0 and not record.alias_dns_name:
+            mutated.append(Record(
+                name=record.name, type=record.type, ttl=rnd.choice(TTLS),
+                resource_records=list(record.resource_records),
+                identifier=record.identifier, weight=record.weight,
+                region=record.region, health_check=record.health_check,
+                failover=record.failover))
+        elif change == 1 and record.name not in alias_targets:
+            continue
+        else:
+            mutated.append(record)
+            mutated.append(Record(name='new{}.{}'.format(n, record.name), type='A',
+                                  ttl=rnd.choice(TTLS), resource_records=['10.255.0.1']))
+    return mutated
+
+
+ROUTE53_XMLNS = 'https://route53.amazonaws.com/doc/2013-04-01/'
+
+# Route53 limits for a single ChangeResourceRecordSets request
+MAX_CHANGE_RECORDS = 1000
+MAX_CHANGE_VALUE_CHARS = 32000
+
+ERROR_XML = (
+    '<?xml version="1.0"?>\n'
+    '<ErrorResponse xmlns="{xmlns}"><Error><Type>Sender</Type><Code>{code}</Code>'
+    '<Message>{message}</Message></Error><RequestId>fake</RequestId></ErrorResponse>')
+
+
+def _listing_key(name, type_='', identifier='') -> tuple:
+    # Route53 lists names with their labels reversed: com.example.www
+    return tuple(reversed(name.rstrip('.').split('.'))), type_ or '', identifier or ''
+
+
+def _copy_record(record) -> Record:
+    copy = Record(name=record.name, type=record.type,
+                  resource_records=list(record.resource_records),
+                  alias_hosted_zone_id=record.alias_hosted_zone_id,
+                  alias_dns_name=record.alias_dns_name,
+                  identifier=record.identifier, weight=record.weight,
+                  region=record.region,
+                  alias_evaluate_target_health=record.alias_evaluate_target_health,
+                  health_check=record.health_check, failover=record.failover)
+    if not record.alias_dns_name:
+        copy.ttl = record.ttl
+    return copy
+
+
+def _record_state(record) -> tuple:
+    return (record.name, record.type, None if record.alias_dns_name else str(record.ttl),
+            tuple(sorted(record.resource_records)), record.alias_hosted_zone_id,
+            record.alias_dns_name and canonical_name(record.alias_dns_name),
+            record.identifier, record.weight and str(record.weight), record.region,
+            bool(record.alias_evaluate_target_health) if record.alias_dns_name else None,
+            record.health_check, record.failover)
+
+
+_accounts = itertools.count(1)
+
+
+class _FakeResponse(object):
+    def __init__(self, body, status=200, reason='OK'):
+        self.body = body.encode('utf-8')
+        self.status = status
+        self.reason = reason
+
+    def read(self):
+        return self.body
+
+
+class _FakeZone(object):
+    def __init__(self, zone_id, name, private=False, vpcs=(), comment='', caller_ref=''):
+        self.id = zone_id
+        self.name = canonical_name(name)
+        self.private = private
+        self.vpcs = list(vpcs)
+        self.comment = comment
+        self.caller_ref = caller_ref
+        self.records = {}
+        self._keys = None
+
+    def key(self, record) -> tuple:
+        return _listing_key(record.name, record.type, record.identifier)
+
+    def sorted_keys(self) -> list:
+        if self._keys is None:
+            self._keys = sorted(self.records)
+        return self._keys
+
+    def replace_records(self, records):
+        self.records = records
+        self._keys = None
+
+    def summary(self) -> dict:
+        return {'Id': '/hostedzone/' + self.id, 'Name': self.name,
+                'CallerReference': self.caller_ref,
+                'Config': {'Comment': self.comment,
+                           'PrivateZone': 'true' if self.private else 'false'},
+                'ResourceRecordSetCount': str(len(self.records))}
+
+
+class FakeRoute53Connection(object):
+    """
+    In-memory stand-in for a boto Route53 connection
+
+    It implements the calls route53-transfer makes: listing, looking up and
+    creating hosted zones, listing record sets page by page, and committing
+    changes to them. Names are stored the way Route53 does it (see
+    `canonical_name()`), record sets are listed in Route53's order, and
+    change batches are checked like Route53 does, failing with an
+    InvalidChangeBatch error when they're over the request limits, create
+    record sets that exist, delete ones that don't match, or add aliases to
+    missing records of the zone.
+
+    :param page_size: record sets per ListResourceRecordSets page
+    :param zone_page_size: hosted zones per page of the zone listings
+    :param latency: seconds every request takes
+    :param max_rate: requests per second accepted before throttling the
+           requests with a Throttling error, or None for no limit
+    :param insync_after: seconds before a committed change is INSYNC
+
+    Requests are counted by operation in `calls`, and the throttled ones
+    in `throttled`. Use `add_zone()` to set up zones directly.
+    """
+    Version = '2013-04-01'
+    XMLNameSpace = ROUTE53_XMLNS
+
+    def __init__(self, page_size=300, zone_page_size=100, latency=0.0, max_rate=None,
+                 insync_after=0.0, aws_access_key_id=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.page_size = page_size
+        self.zone_page_size = zone_page_size
+        self.latency = latency
+        self.max_rate = max_rate
+        self.insync_after = insync_after
+        # Every instance is a separate account, so that the hosted zone
+        # lookups cached for one don't leak into another
+        self.aws_access_key_id = aws_access_key_id or 'AKIAFAKE{:012d}'.format(next(_accounts))
+        self.num_retries = 0
+        self.calls = Counter()
+        self.throttled = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._zones = {}
+        self._changes = {}
+        self._recent_requests = []
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    # Setup and inspection
+
+    def add_zone(self, name, records=(), private=False, vpcs=()):
+        """
+        Adds a hosted zone, with an SOA and NS record like Route53 creates,
+        and the given boto Records.
+
+        :param vpcs: VPCs of a private zone, as `{"VPCRegion": ...,
+               "VPCId": ...}` dicts
+        :return: the id of the zone
+        """
+        with self._lock:
+            zone = _FakeZone('ZFAKE{:09d}'.format(next(self._ids)), name, private, vpcs)
+            apex = [
+                Record(name=zone.name, type='SOA', ttl='900', resource_records=[
+                    'ns-1.awsdns-01.org. awsdns-hostmaster.amazon.com. 1 7200 900 1209600 86400']),
+                Record(name=zone.name, type='NS', ttl='172800', resource_records=[
+                    'ns-1.awsdns-01.org.', 'ns-2.awsdns-02.co.uk.']),
+            ]
+            records_by_key = {}
+            for record in itertools.chain(apex, records):
+                record = _copy_record(record)
+                record.name = canonical_name(record.name)
+                records_by_key[zone.key(record)] = record
+            zone.replace_records(records_by_key)
+            self._zones[zone.id] = zone
+            return zone.id
+
+    def zone_records(self, zone_id) -> list:
+        """
+        Returns copies of the records of a zone, in listing order.
+        """
+        with self._lock:
+            zone = self._get_zone(zone_id)
+            return [_copy_record(zone.records[key]) for key in zone.sorted_keys()]
+
+    # Request handling
+
+    def _error(self, status, code, message):
+        body = ERROR_XML.format(xmlns=ROUTE53_XMLNS, code=code, message=escape(message))
+        reason = {400: 'Bad Request', 404: 'Not Found'}.get(status, 'Error')
+        return DNSServerError(status, reason, body)
+
+    def _request(self, operation):
+        """
+        Counts a request, waits for its latency, and raises a Throttling
+        error when it exceeds `max_rate`.
+        """
+        if self.latency:
+            self._sleep(self.latency)
+        with self._lock:
+            self.calls[operation] += 1
+            if self.max_rate is None:
+                return
+            now = self._clock()
+            self._recent_requests = [t for t in self._recent_requests if now - t < 1.0]
+            if len(self._recent_requests) >= self.max_rate:
+                self.throttled += 1
+                raise self._error(400, 'Throttling', 'Rate exceeded')
+            self._recent_requests.append(now)
+
+    def _get_zone(self, hosted_zone_id) -> _FakeZone:
+        zone = self._zones.get(hosted_zone_id.replace('/hostedzone/', ''))
+        if zone is None:
+            raise self._error(404, 'NoSuchHostedZone',
+                              'No hosted zone found with ID: {}'.format(hosted_zone_id))
+        return zone
+
+    def make_request(self, action, path, headers=None, data='', params=None):
+        """
+        Answers the raw API requests route53-transfer sends itself:
+        ListHostedZonesByName, ListHostedZonesByVPC and GetHostedZone.
+        """
+        params = params or {}
+        prefix = '/{}/'.format(self.Version)
+        operation = path[len(prefix):] if path.startswith(prefix) else path
+        try:
+            if operation == 'hostedzonesbyname':
+                self._request('ListHostedZonesByName')
+                body = self._hosted_zones_by_name(params)
+            elif operation == 'hostedzonesbyvpc':
+                self._request('ListHostedZonesByVPC')
+                body = self._hosted_zones_by_vpc(params)
+            elif operation.startswith('hostedzone/'):
+                self._request('GetHostedZone')
+                body = self._hosted_zone_xml(operation[len('hostedzone/'):])
+            else:
+                raise self._error(400, 'InvalidInput', 'Unsupported request {}'.format(path))
+        except DNSServerError as e:
+            return _FakeResponse(e.body, e.status, e.reason)
+        return _FakeResponse(body)
+
+    def _hosted_zones_by_name(self, params):
+        with self._lock:
+            zones = sorted(self._zones.values(), key=lambda z: (_listing_key(z.name), z.id))
+            keys = [(_listing_key(z.name), z.id) for z in zones]
+            start = 0
+            if params.get('dnsname'):
+                start = bisect_left(keys, (_listing_key(canonical_name(params['dnsname'])),
+                                           params.get('hostedzoneid') or ''))
+            page_size = int(params.get('maxitems') or self.zone_page_size)
+            listed = zones[start:start + page_size]
+            next_zones = zones[start + page_size:start + page_size + 1]
+
+        body = '<ListHostedZonesByNameResponse xmlns="{}"><HostedZones>'.format(ROUTE53_XMLNS)
+        for zone in listed:
+            body += ('<HostedZone><Id>/hostedzone/{}</Id><Name>{}</Name>'
+                     '<CallerReference>{}</CallerReference><Config><Comment>{}</Comment>'
+                     '<PrivateZone>{}</PrivateZone></Config>'
+                     '<ResourceRecordSetCount>{}</ResourceRecordSetCount></HostedZone>').format(
+                zone.id, escape(zone.name), escape(zone.caller_ref), escape(zone.comment),
+                'true' if zone.private else 'false', len(zone.records))
+        body += '</HostedZones>'
+        if next_zones:
+            body += ('<IsTruncated>true</IsTruncated><NextDNSName>{}</NextDNSName>'
+                     '<NextHostedZoneId>{}</NextHostedZoneId>').format(
+                escape(next_zones[0].name), next_zones[0].id)
+        else:
+            body += '<IsTruncated>false</IsTruncated>'
+        body += '<MaxItems>{}</MaxItems></ListHostedZonesByNameResponse>'.format(page_size)
+        return body
+
+    def _hosted_zones_by_vpc(self, params):
+        vpc = {'VPCRegion': params.get('vpcregion'), 'VPCId': params.get('vpcid')}
+        with self._lock:
+            zones = sorted((z for z in self._zones.values() if vpc in z.vpcs), key=lambda z: z.id)
+        start = int(params.get('nexttoken') or 0)
+        listed = zones[start:start + self.zone_page_size]
+
+        body = '<ListHostedZonesByVPCResponse xmlns="{}"><HostedZoneSummaries>'.format(ROUTE53_XMLNS)
+        for zone in listed:
+            body += ('<HostedZoneSummary><HostedZoneId>{}</HostedZoneId><Name>{}</Name>'
+                     '<Owner><OwningAccount>000000000000</OwningAccount></Owner>'
+                     '</HostedZoneSummary>').format(zone.id, escape(zone.name))
+        body += '</HostedZoneSummaries><MaxItems>{}</MaxItems>'.format(self.zone_page_size)
+        if start + self.zone_page_size < len(zones):
+            body += '<NextToken>{}</NextToken>'.format(start + self.zone_page_size)
+        body += '</ListHostedZonesByVPCResponse>'
+        return body
+
+    def _hosted_zone_xml(self, hosted_zone_id):
+        with self._lock:
+            zone = self._get_zone(hosted_zone_id)
+            body = ('<GetHostedZoneResponse xmlns="{}"><HostedZone><Id>/hostedzone/{}</Id>'
+                    '<Name>{}</Name><CallerReference>{}</CallerReference><Config>'
+                    '<Comment>{}</Comment><PrivateZone>{}</PrivateZone></Config>'
+                    '<ResourceRecordSetCount>{}</ResourceRecordSetCount></HostedZone>').format(
+                ROUTE53_XMLNS, zone.id, escape(zone.name), escape(zone.caller_ref),
+                escape(zone.comment), 'true' if zone.private else 'false', len(zone.records))
+            if zone.private:
+                body += '<VPCs>' + ''.join(
+                    '<VPC><VPCRegion>{}</VPCRegion><VPCId>{}</VPCId></VPC>'.format(
+                        escape(vpc['VPCRegion']), escape(vpc['VPCId'])) for vpc in zone.vpcs)
+                body += '</VPCs>'
+            else:
+                body += ('<DelegationSet><NameServers><NameServer>ns-1.awsdns-01.org</NameServer>'
+                         '</NameServers></DelegationSet>')
+        return body + '</GetHostedZoneResponse>'
+
+    # boto Route53Connection methods
+
+    def get_all_hosted_zones(self, start_marker=None, zone_list=None):
+        # boto follows the pagination itself, sending one request per page
+        with self._lock:
+            zones = sorted(self._zones.values(), key=lambda z: z.id)
+        for _ in range(max(1, -(-len(zones) // self.zone_page_size))):
+            self._request('ListHostedZones')
+        return {'ListHostedZonesResponse': {
+            'HostedZones': [z.summary() for z in zones],
+            'IsTruncated': 'false', 'MaxItems': str(self.zone_page_size)}}
+
+    def get_hosted_zone(self, hosted_zone_id):
+        self._request('GetHostedZone')
+        with self._lock:
+            zone = self._get_zone(hosted_zone_id)
+            response = {'HostedZone': zone.summary()}
+            if zone.private:
+                response['VPCs'] = [dict(vpc) for vpc in zone.vpcs]
+            return {'GetHostedZoneResponse': response}
+
+    def create_hosted_zone(self, domain_name, caller_ref=None, comment='',
+                           private_zone=False, vpc_id=None, vpc_region=None):
+        self._request('CreateHostedZone')
+        with self._lock:
+            if caller_ref and any(zone.caller_ref == caller_ref for zone in self._zones.values()):
+                raise self._error(409, 'HostedZoneAlreadyExists',
+                                  'A hosted zone has already been created with the '
+                                  'caller reference {}'.format(caller_ref))
+        vpcs = [{'VPCRegion': vpc_region, 'VPCId': vpc_id}] if private_zone else []
+        zone_id = self.add_zone(domain_name, private=bool(private_zone), vpcs=vpcs)
+        with self._lock:
+            zone = self._zones[zone_id]
+            zone.comment = comment or ''
+            zone.caller_ref = caller_ref or ''
+            return {'CreateHostedZoneResponse': {
+                'HostedZone': zone.summary(),
+                'ChangeInfo': self._submit_change()}}
+
+    def get_all_rrsets(self, hosted_zone_id, type=None, name=None, identifier=None,
+                       maxitems=None):
+        self._request('ListResourceRecordSets')
+        page_size = min(int(maxitems or self.page_size), self.page_size)
+        with self._lock:
+            zone = self._get_zone(hosted_zone_id)
+            keys = zone.sorted_keys()
+            start = 0
+            if name is not None:
+                start = bisect_left(keys, _listing_key(canonical_name(name), type, identifier))
+            end = start + page_size
+            page = ResourceRecordSets(self, hosted_zone_id)
+            page.extend(_copy_record(zone.records[key]) for key in keys[start:end])
+            page.is_truncated = end < len(keys)
+            if page.is_truncated:
+                next_record = zone.records[keys[end]]
+                page.next_record_name = next_record.name
+                page.next_record_type = next_record.type
+                page.next_record_identifier = next_record.identifier
+        return page
+
+    def change_rrsets(self, hosted_zone_id, xml_body):
+        self._request('ChangeResourceRecordSets')
+        changes = self._parse_changes(xml_body)
+        with self._lock:
+            zone = self._get_zone(hosted_zone_id)
+            self._check_limits(changes)
+            # Alias targets have to exist before the batch is committed
+            targets = {(r.name, r.type) for r in zone.records.values()} \
+                if any(r.alias_hosted_zone_id == zone.id for _, r in changes) else set()
+            records = dict(zone.records)
+            for action, record in changes:
+                self._apply_change(zone, records, action, record, targets)
+            zone.replace_records(records)
+            return {'ChangeResourceRecordSetsResponse': {'ChangeInfo': self._submit_change()}}
+
+    def get_change(self, change_id):
+        self._request('GetChange')
+        with self._lock:
+            change_id = change_id.replace('/change/', '')
+            submitted = self._changes.get(change_id)
+            if submitted is None:
+                raise self._error(404, 'NoSuchChange',
+                                  'A change with the specified change ID does not exist.')
+            status = 'INSYNC' if self._clock() - submitted >= self.insync_after else 'PENDING'
+            return {'GetChangeResponse': {'ChangeInfo': {
+                'Id': '/change/' + change_id, 'Status': status}}}
+
+    # Change batches
+
+    def _submit_change(self) -> dict:
+        change_id = 'CFAKE{:09d}'.format(next(self._ids))
+        self._changes[change_id] = self._clock()
+        status = 'INSYNC' if not self.insync_after else 'PENDING'
+        return {'Id': '/change/' + change_id, 'Status': status,
+                'SubmittedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+
+    def _parse_changes(self, xml_body) -> list:
+        """
+        Parses a ChangeResourceRecordSets request body.
+
+        :return: list of (action, boto Record) tuples
+        """
+        ns = {'r53': ROUTE53_XMLNS}
+        root = ElementTree.fromstring(xml_body.encode('utf-8') if isinstance(xml_body, str)
+                                      else xml_body)
+        changes = []
+        for change in root.iterfind('r53:ChangeBatch/r53:Changes/r53:Change', ns):
+            rrset = change.find('r53:ResourceRecordSet', ns)
+
+            def text(path):
+                element = rrset.find(path, ns)
+                return element.text if element is not None else None
+
+            record = Record(name=canonical_name(text('r53:Name')), type=text('r53:Type'),
+                            identifier=text('r53:SetIdentifier'), weight=text('r53:Weight'),
+                            region=text('r53:Region'), failover=text('r53:Failover'),
+                            health_check=text('r53:HealthCheckId'),
+                            resource_records=[v.text for v in rrset.iterfind(
+                                'r53:ResourceRecords/r53:ResourceRecord/r53:Value', ns)])
+            if rrset.find('r53:AliasTarget', ns) is not None:
+                record.alias_hosted_zone_id = text('r53:AliasTarget/r53:HostedZoneId')
+                record.alias_dns_name = text('r53:AliasTarget/r53:DNSName')
+                record.alias_evaluate_target_health = \
+                    text('r53:AliasTarget/r53:EvaluateTargetHealth') == 'true'
+            else:
+                record.ttl = text('r53:TTL')
+            changes.append((change.find('r53:Action', ns).text, record))
+        return changes
+
+    def _check_limits(self, changes):
+        records = value_chars = 0
+        for action, record in changes:
+            factor = 2 if action == 'UPSERT' else 1
+            records += len(record.resource_records) * factor
+            value_chars += sum(map(len, record.resource_records)) * factor
+        if records > MAX_CHANGE_RECORDS:
+            raise self._error(400, 'InvalidChangeBatch',
+                              'Number of records limit of {} exceeded.'.format(MAX_CHANGE_RECORDS))
+        if value_chars > MAX_CHANGE_VALUE_CHARS:
+            raise self._error(400, 'InvalidChangeBatch',
+                              'Number of characters limit of {} exceeded.'.format(
+                                  MAX_CHANGE_VALUE_CHARS))
+
+    def _apply_change(self, zone, records, action, record, targets):
+        key = zone.key(record)
+        description = '{} type {}'.format(record.name, record.type)
+        if record.identifier:
+            description += ' with set identifier {}'.format(record.identifier)
+
+        if action == 'DELETE':
+            existing = records.get(key)
+            if existing is None:
+                raise self._error(400, 'InvalidChangeBatch',
+                                  'Tried to delete resource record set [name=\'{}\'] '
+                                  'but it was not found'.format(description))
+            if _record_state(existing) != _record_state(record):
+                raise self._error(400, 'InvalidChangeBatch',
+                                  'Tried to delete resource record set [name=\'{}\'] '
+                                  'but the values provided do not match the current '
+                                  'values'.format(description))
+            del records[key]
+            return
+
+        if action == 'CREATE' and key in records:
+            raise self._error(400, 'InvalidChangeBatch',
+                              'Tried to create resource record set [name=\'{}\'] '
+                              'but it already exists'.format(description))
+        if action not in ('CREATE', 'UPSERT'):
+            raise self._error(400, 'InvalidInput', 'Invalid action {}'.format(action))
+
+        if record.alias_dns_name and record.alias_hosted_zone_id == zone.id:
+            target = canonical_name(record.alias_dns_name)
+            if (target, record.type) not in targets:
+                raise self._error(400, 'InvalidChangeBatch',
+                                  'Tried to create an alias that targets {}, type {} in '
+                                  'zone {}, but that target was not found'.format(
+                                      target, record.type, zone.id))
+        records[key] = record
@@ -0,0 +1,196 @@
+"""
+Rate limiting and retries for Route53 API calls
+
+Route53 accepts about five requests per second per account, and answers
+with `Throttling` or `PriorRequestNotComplete` errors when it gets more.
+`ThrottledConnection` wraps a boto Route53 connection so that every call
+made through it is paced by a token bucket, and retried with exponential
+backoff and jitter when Route53 pushes back. The request rate adapts to
+the throttling errors it sees: it's halved on every throttled call and
+slowly raised again after successful ones.
+"""
+
+from http.client import HTTPException
+import random
+import threading
+import time
+
+from boto.exception import BotoServerError
+
+# Requests per second sent to Route53 when starting out
+DEFAULT_RATE = 5.0
+
+# Bounds for the adaptive request rate
+MIN_RATE = 0.5
+MAX_RATE = 5.0
+
+# Requests per second added to the rate after every successful call
+RATE_INCREASE = 0.05
+
+DEFAULT_MAX_RETRIES = 8
+BACKOFF_BASE = 0.5
+MAX_BACKOFF = 20.0
+
+# Error codes that mean the same request can simply be sent again later
+RETRYABLE_ERRORS = ('Throttling', 'PriorRequestNotComplete',
+                    'ServiceUnavailable', 'RequestExpired')
+
+# Error codes that mean we're going too fast
+THROTTLING_ERRORS = ('Throttling', 'PriorRequestNotComplete')
+
+# Calls that change a zone, and may have done so even though they failed
+# with a server or connection error, so that sending them again could
+# apply their changes twice. They're only retried on throttling errors,
+# which mean the request was turned down.
+NON_IDEMPOTENT_CALLS = ('change_rrsets',)
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket handing out one token per request, refilled at
+    `rate` tokens per second, and holding at most `capacity` tokens.
+    """
+    def __init__(self, rate, capacity=1.0, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """
+        Takes a token, waiting for one if the bucket is empty.
+
+        :return: seconds spent waiting
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait:
+            self._sleep(wait)
+        return wait
+
+
+def is_retryable(error: BotoServerError) -> bool:
+    if error.error_code in RETRYABLE_ERRORS or error.status >= 500:
+        return True
+    # When boto runs out of its own retries on a throttled request, it
+    # raises the error without the response body, hence without a code
+    return error.status == 400 and not error.error_code
+
+
+def is_throttling(error: BotoServerError) -> bool:
+    return error.error_code in THROTTLING_ERRORS or \
+        (error.status == 400 and not error.error_code)
+
+
+class ThrottledConnection(object):
+    """
+    Proxy for a boto Route53 connection that paces and retries its calls
+
+    Every public method of the wrapped connection is available, and calling
+    it goes through `call()`. Other attributes are passed through as they
+    are. Counters of the calls made are kept in `stats`:
+
+    * `calls`: calls made, not counting retries
+    * `retries`: calls sent again after a retryable error
+    * `throttled`: errors telling us to slow down
+    * `wait_seconds`: time spent waiting for the rate limiter or backing off
+
+    A single instance can be shared by several threads.
+    """
+    def __init__(self, con, rate=DEFAULT_RATE, min_rate=MIN_RATE, max_rate=MAX_RATE,
+                 max_retries=DEFAULT_MAX_RETRIES, sleep=time.sleep):
+        self._con = con
+        self._bucket = TokenBucket(rate, sleep=sleep)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_retries = max_retries
+        self.stats = {'calls': 0, 'retries': 0, 'throttled': 0, 'wait_seconds': 0.0}
+
+        # Retries are handled here, where throttling errors are seen and
+        # counted, rather than hidden in boto's own retry loop
+        if hasattr(con, 'num_retries'):
+            con.num_retries = 0
+
+    @property
+    def connection(self):
+        return self._con
+
+    @property
+    def rate(self) -> float:
+        return self._bucket.rate
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def _adapt_rate(self, throttled):
+        with self._lock:
+            if throttled:
+                self._bucket.rate = max(self.min_rate, self._bucket.rate / 2)
+            else:
+                self._bucket.rate = min(self.max_rate, self._bucket.rate + RATE_INCREASE)
+
+    def call(self, method, *args, **kwargs):
+        """
+        Calls `method` once the rate limiter allows it, retrying it with
+        exponential backoff and full jitter on retryable Route53 errors and
+        on connection errors, or only on throttling errors for the methods
+        of `NON_IDEMPOTENT_CALLS`.
+        """
+        return self._call(getattr(method, '__name__', None), method, args, kwargs)
+
+    def _call(self, name, method, args, kwargs):
+        idempotent = name not in NON_IDEMPOTENT_CALLS
+        self._count('calls')
+        attempt = 0
+        while True:
+            self._count('wait_seconds', self._bucket.acquire())
+            try:
+                result = method(*args, **kwargs)
+            except (BotoServerError, HTTPException, OSError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                if isinstance(e, BotoServerError):
+                    throttled = is_throttling(e)
+                    if not (is_retryable(e) if idempotent else throttled):
+                        raise
+                elif idempotent:
+                    throttled = False
+                else:
+                    raise
+
+                if throttled:
+                    self._count('throttled')
+                self._adapt_rate(throttled)
+
+                backoff = random.uniform(0, min(MAX_BACKOFF, BACKOFF_BASE * 2 ** attempt))
+                self._sleep(backoff)
+                self._count('wait_seconds', backoff)
+                self._count('retries')
+                attempt += 1
+            else:
+                self._adapt_rate(False)
+                return result
+
+    def __getattr__(self, name):
+        attr = getattr(self._con, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def throttled_call(*args, **kwargs):
+            return self._call(name, attr, args, kwargs)
+
+        return throttled_call
@@ -0,0 +1,86 @@
+"""
+Transfer of a zone between two accounts
+
+Migrating a zone with `dump` and `load` writes it to a file and parses it
+back, and only lists the target zone once the source has been dumped.
+`transfer()` lists the target zone in a background thread while the
+source zone is listed, turning each page of source records into the
+desired records of the target as it arrives, and then commits the
+changes like `load()`.
+
+Aliases pointing to records of the source zone itself are pointed to the
+target zone instead. Aliases to other hosted zones, such as load
+balancers or other zones of the source account, are copied as they are.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .app import ComparableRecord, commit_changes, compute_changes, create_zone, \
+    exit_with_error, get_zone, get_zone_records, iter_rrset_pages
+from .canonical import canonical_record
+from .stats import RunStats
+
+
+def retarget_alias(record, source_zone_id, target_zone_id) -> ComparableRecord:
+    """
+    Returns `record` pointing to the target zone, if it's an alias to a
+    record of the source zone.
+    """
+    if record.alias_dns_name and record.alias_hosted_zone_id == source_zone_id:
+        return ComparableRecord(resource_records=record.resource_records,
+                                **dict(record.to_change_dict(),
+                                       alias_hosted_zone_id=target_zone_id))
+    return record
+
+
+def transfer(source_con, target_con, zone_name, **kwargs):
+    """
+    Copies a zone from the account of `source_con` to the account of
+    `target_con`, creating the target zone if needed. Takes the same
+    options as `load()`, `vpc` applying to both zones.
+
+    :return: the number of changes made to the target zone
+    """
+    dry_run = kwargs.get('dry_run', False)
+    vpc = kwargs.get('vpc', {})
+    zone_cache = kwargs.get('zone_cache')
+    stats = kwargs.get('stats') or RunStats()
+
+    with stats.phase('zone'):
+        source_zone = get_zone(source_con, zone_name, vpc, cache=zone_cache)
+        if not source_zone:
+            exit_with_error("ERROR: {} zone {} not found!".format(
+                'Private' if vpc.get('is_private') else 'Public', zone_name))
+
+        target_zone = get_zone(target_con, zone_name, vpc, cache=zone_cache)
+        if not target_zone:
+            if dry_run:
+                print('CREATE ZONE:', zone_name)
+            else:
+                target_zone = create_zone(target_con, zone_name, vpc, cache=zone_cache)
+
+    # A dry run creating the zone leaves the aliases as they are
+    target_zone_id = target_zone['id'] if target_zone else source_zone['id']
+    desired_records = set()
+
+    # Both zones are listed at the same time, each on its own connection
+    with stats.phase('list'), ThreadPoolExecutor(max_workers=1) as executor:
+        if target_zone:
+            existing = executor.submit(get_zone_records, target_con, target_zone_id,
+                                       cache=kwargs.get('rrset_cache'))
+        for page in iter_rrset_pages(source_con, source_zone['id']):
+            desired_records.update(
+                retarget_alias(canonical_record(record), source_zone['id'], target_zone_id)
+                for record in page)
+        existing_records = existing.result() if target_zone else set()
+    stats.count('records_read', len(desired_records))
+    stats.count('records_listed', len(existing_records))
+
+    zone = target_zone or {'id': None, 'name': source_zone['name']}
+    with stats.phase('diff'):
+        changes = compute_changes(zone, existing_records, desired_records,
+                                  use_upsert=kwargs.get('use_upsert', False))
+    stats.count('changes', len(changes))
+
+    commit_changes(target_con, zone, changes, existing_records, **dict(kwargs, stats=stats))
+    return len(changes)
@@ -0,0 +1,164 @@
+"""
+Checking zone files without Route53
+
+`validate_file()` reads a zone file the way `load()` does and reports what
+Route53 would reject, or what `load()` would misread, without connecting
+to anything. CSV dumps are checked row by row, with the line number of
+every problem, and then record set by record set. Binary snapshots are
+checked by decoding every record of them.
+"""
+
+import csv
+import struct
+import sys
+
+from .app import CSV_HEADER, csv_group_key
+from .snapshot import Snapshot, is_snapshot
+
+RECORD_TYPES = ('A', 'AAAA', 'CAA', 'CNAME', 'DS', 'HTTPS', 'MX', 'NAPTR', 'NS', 'PTR',
+                'SOA', 'SPF', 'SRV', 'SSHFP', 'SVCB', 'TLSA', 'TXT')
+FAILOVER_VALUES = ('PRIMARY', 'SECONDARY')
+EVALUATE_HEALTH_VALUES = ('', 'True', 'False')
+
+# Route53 weights of weighted record sets
+MAX_WEIGHT = 255
+
+
+def _is_int(value, max_value=None) -> bool:
+    return value.isdigit() and (max_value is None or int(value) <= max_value)
+
+
+def validate_row(row) -> list:
+    """
+    Returns the problems of a single CSV row, as a list of messages.
+    """
+    if len(row) != len(CSV_HEADER):
+        return ['expected {} columns, found {}'.format(len(CSV_HEADER), len(row))]
+
+    name, type_, value, ttl, region, weight, identifier, failover, evaluate_health, _ = row
+    problems = []
+    if not name:
+        problems.append('missing name')
+    if type_ not in RECORD_TYPES:
+        problems.append('unknown type "{}"'.format(type_))
+
+    if value.startswith('ALIAS'):
+        alias = value.split(':')
+        if len(alias) != 3 or not all(alias[1:]):
+            problems.append('alias values are "ALIAS:<hosted zone id>:<DNS name>"')
+    else:
+        if not value:
+            problems.append('missing value')
+        if not _is_int(ttl):
+            problems.append('TTL "{}" is not a number of seconds'.format(ttl))
+
+    if weight and not _is_int(weight, MAX_WEIGHT):
+        problems.append('weight "{}" is not a number from 0 to {}'.format(weight, MAX_WEIGHT))
+    if failover and failover not in FAILOVER_VALUES:
+        problems.append('failover "{}" is not one of {}'.format(failover, ', '.join(FAILOVER_VALUES)))
+    if (region or weight or failover) and not identifier:
+        problems.append('weighted, latency and failover records need a SETID')
+    if evaluate_health not in EVALUATE_HEALTH_VALUES:
+        problems.append('EVALUATE_HEALTH "{}" is neither True nor False'.format(evaluate_health))
+    return problems
+
+
+def validate_csv(file_in) -> tuple:
+    """
+    Checks a CSV zone dump.
+
+    :return: tuple of the number of record sets, and the list of problems
+             found, as (line number, message) tuples
+    """
+    problems = []
+    # Group key -> line and fields of the first row of every record set,
+    # and the values seen so far
+    record_sets = {}
+
+    reader = csv.reader(file_in)
+    for row in reader:
+        line = reader.line_num
+        if not row or (line == 1 and row[0] == CSV_HEADER[0]):
+            continue
+        # Dumps written before the HEALTH_CHECK column have one column less
+        if len(row) == len(CSV_HEADER) - 1:
+            row.append('')
+
+        row_problems = validate_row(row)
+        problems.extend((line, message) for message in row_problems)
+        if len(row) != len(CSV_HEADER):
+            continue
+
+        key = csv_group_key(row)
+        record_set = record_sets.get(key)
+        if record_set is None:
+            record_sets[key] = (line, row, {row[2]})
+            continue
+
+        first_line, first_row, values = record_set
+        if row[2] in values:
+            problems.append((line, 'duplicate value "{}"'.format(row[2])))
+        elif first_row[2].startswith('ALIAS') or row[2].startswith('ALIAS'):
+            problems.append((line, 'alias records have a single value, see line {}'.format(
+                first_line)))
+        elif row[1] == 'CNAME':
+            problems.append((line, 'CNAME records have a single value, see line {}'.format(
+                first_line)))
+        values.add(row[2])
+
+        for i in (3, 4, 5):
+            if row[i] != first_row[i]:
+                problems.append((line, '{} "{}" differs from "{}" on line {}'.format(
+                    CSV_HEADER[i], row[i], first_row[i], first_line)))
+
+    return len(record_sets), problems
+
+
+def validate_snapshot(data) -> tuple:
+    """
+    Checks a binary snapshot, given its contents.
+
+    :return: tuple of the number of records decoded, and the list of
+             problems found, as (None, message) tuples
+    """
+    record_count = 0
+    try:
+        snapshot = Snapshot(data)
+        for _ in snapshot:
+            record_count += 1
+    except (ValueError, IndexError, struct.error, UnicodeDecodeError) as e:
+        return record_count, [(None, 'corrupt snapshot: {}'.format(e))]
+
+    if record_count != len(snapshot):
+        return record_count, [(None, 'snapshot holds {} records, not {}'.format(
+            record_count, len(snapshot)))]
+    return record_count, []
+
+
+def validate_file(filename) -> tuple:
+    """
+    Checks a CSV dump or a binary snapshot.
+
+    :return: see `validate_csv()`
+    """
+    with open(filename, 'rb') as f:
+        if is_snapshot(f.read(4)):
+            f.seek(0)
+            return validate_snapshot(f.read())
+
+    with open(filename, newline='') as file_in:
+        try:
+            return validate_csv(file_in)
+        except UnicodeDecodeError as e:
+            return 0, [(None, 'not a UTF-8 file: {}'.format(e))]
+
+
+def print_problems(filename, record_count, problems, fout=None):
+    fout = fout or sys.stdout
+    for line, message in problems:
+        if line is None:
+            fout.write('{}: {}\n'.format(filename, message))
+        else:
+            fout.write('{}:{}: {}\n'.format(filename, line, message))
+    fout.write('{}: {} record sets, {} problems\n'.format(filename, record_count, len(problems)))
+    fout.flush()
@@ -0,0 +1,119 @@
+"""
+Cache of hosted zone lookups
+
+Resolving a zone name to its hosted zone id takes at least one Route53
+request, and private zones need more of them to match the VPC they're
+associated with. The cache keeps the result of those lookups in memory
+and, optionally, in a JSON file shared by later invocations, so that
+repeated runs against the same zones don't need to list them again.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Seconds the lookups stored in a cache file remain valid
+DEFAULT_ZONE_CACHE_TTL = 3600
+
+
+class ZoneCache(object):
+    """
+    Hosted zone lookups keyed by account, privacy flag and zone name
+
+    :param path: JSON file where the lookups are persisted. If None, the
+           cache only lives in memory.
+    :param ttl: seconds after which a persisted lookup is considered stale
+    """
+    def __init__(self, path=None, ttl=DEFAULT_ZONE_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._entries = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(account, is_private, zone_name):
+        zone_name = zone_name.rstrip('.').lower() + '.'
+        return '{}:{}:{}'.format(account or '', 'private' if is_private else 'public', zone_name)
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except ValueError:
+                # A corrupt cache file is as good as an empty one
+                self._entries = {}
+
+    def _save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.zone-cache')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+    def _get(self, key):
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry['time'] > self.ttl:
+                return None
+            return entry['value']
+
+    def _put(self, key, value):
+        with self._lock:
+            self._load()
+            self._entries[key] = {'time': time.time(), 'value': value}
+            self._save()
+
+    def get(self, account, is_private, zone_name):
+        """
+        Returns the cached hosted zones for the given name, or None when
+        there's no cached lookup or it's stale.
+        """
+        return self._get(self.key(account, is_private, zone_name))
+
+    def put(self, account, is_private, zone_name, zones):
+        self._put(self.key(account, is_private, zone_name), zones)
+
+    def _invalidate(self, key):
+        with self._lock:
+            self._load()
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def invalidate(self, account, is_private, zone_name):
+        self._invalidate(self.key(account, is_private, zone_name))
+
+    def get_zone_vpcs(self, account, zone_id):
+        """
+        Returns the cached VPC associations of a private hosted zone, as a
+        list of `{"VPCRegion": ..., "VPCId": ...}` dicts, or None.
+        """
+        return self._get('vpcs:{}:{}'.format(account or '', zone_id))
+
+    def put_zone_vpcs(self, account, zone_id, vpcs):
+        self._put('vpcs:{}:{}'.format(account or '', zone_id), vpcs)
+
+    def invalidate_zone_vpcs(self, account, zone_id):
+        self._invalidate('vpcs:{}:{}'.format(account or '', zone_id))
+
+    def get_vpc_zones(self, account, vpc_region, vpc_id):
+        """
+        Returns the cached ids of the hosted zones associated with a VPC,
+        or None.
+        """
+        return self._get('vpc-zones:{}:{}:{}'.format(account or '', vpc_region, vpc_id))
+
+    def put_vpc_zones(self, account, vpc_region, vpc_id, zone_ids):
+        self._put('vpc-zones:{}:{}:{}'.format(account or '', vpc_region, vpc_id), zone_ids)
+
+    def invalidate_vpc_zones(self, account, vpc_region, vpc_id):
+        self._invalidate('vpc-zones:{}:{}:{}'.format(account or '', vpc_region, vpc_id))
@@ -2,8 +2,16 @@
 Helper and custom assert methods to test dns zone updates
 """
 
+import bisect
+import csv
+import io
+
+from boto.route53.record import Record, ResourceRecordSets
+
 from route53_transfer import app
 from route53_transfer.app import ComparableRecord
+from route53_transfer.canonical import canonical_record
+from route53_transfer.testing import FakeRoute53Connection, generate_zone
 
 TEST_ZONE_ID = 1
 TEST_ZONE_NAME = "test.dev"
@@ -19,8 +27,33 @@ def diff_zone_upsert(rrset_before, rrset_after):
     return diff_zone(rrset_before, rrset_after, use_upsert=True)
 
 
+def make_records(count, zone_name=TEST_ZONE_NAME):
+    return [Record(name=f"server{n}.{zone_name}.", type="A", ttl="300",
+                   resource_records=[f"10.0.0.{n}"]) for n in range(count)]
+
+
+def make_fake_zone(size, zone_name=TEST_ZONE_NAME):
+    """
+    Returns a fake Route53 connection with an empty `zone_name` zone, its
+    id, and `size` records generated for it
+    """
+    con = FakeRoute53Connection(page_size=100)
+    zone_id = con.add_zone(zone_name)
+    records = generate_zone(zone_name, size, zone_id=zone_id)
+    return con, zone_id, records
+
+
 def to_comparable(r):
-    return r if type(r) == ComparableRecord else ComparableRecord(r)
+    return ComparableRecord.from_record(r)
+
+
+def to_csv(records):
+    fout = io.StringIO()
+    out = csv.writer(fout)
+    out.writerow(app.CSV_HEADER)
+    for record in records:
+        out.writerows(app.record_to_stringlist(record))
+    return fout.getvalue()
 
 
 def assert_change_eq(c1: dict, c2: dict):
@@ -33,8 +66,9 @@ def assert_change_eq(c1: dict, c2: dict):
     assert c1["zone"]["name"] == c2["zone"]["name"], \
         f"Expected zone name to be {c2['zone']['name']} but was {c1['zone']['name']}"
 
+    # Computed changes hold records in their canonical form
     c1_record = to_comparable(c1["record"])
-    c2_record = to_comparable(c2["record"])
+    c2_record = canonical_record(c2["record"])
 
     assert_record_eq(c1_record, c2_record)
 
@@ -71,3 +105,138 @@ def assert_changes_eq(cl1: list, cl2: list):
     for i in range(len(cl1)):
         assert_change_eq(cl1[i], cl2[i])
 
+
+class FakeClock(object):
+    """
+    Clock whose time only moves as it sleeps, recording how long each time
+    """
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class StubResponse(object):
+    def __init__(self, body, status=200):
+        self.body = body
+        self.status = status
+        self.reason = "OK" if status < 300 else "Error"
+
+    def read(self):
+        return self.body
+
+
+class PagedConnection(object):
+    """
+    Minimal Route53 connection for a set of public zones, whose records and
+    hosted zones are listed in pages of `page_size` items
+    """
+    Version = "2013-04-01"
+    aws_access_key_id = "AKIASTUB"
+
+    def __init__(self, zones, page_size):
+        self.zones = zones
+        self.page_size = page_size
+        self.requested_pages = 0
+        self.zone_listings = 0
+        self.changes = []
+
+    def make_request(self, action, path, headers=None, data='', params=None):
+        assert path == f"/{self.Version}/hostedzonesbyname"
+        zone_names = sorted(self.zones)
+        start = bisect.bisect_left(zone_names, params["dnsname"].rstrip("."))
+        if params.get("hostedzoneid"):
+            start = zone_names.index(params["hostedzoneid"])
+        listed = zone_names[start:start + self.page_size]
+        next_zones = zone_names[start + self.page_size:start + self.page_size + 1]
+
+        body = "<ListHostedZonesByNameResponse><HostedZones>"
+        for zone_name in listed:
+            body += (f"<HostedZone><Id>/hostedzone/{zone_name}</Id><Name>{zone_name}.</Name>"
+                     f"<Config><PrivateZone>false</PrivateZone></Config></HostedZone>")
+        body += "</HostedZones>"
+        if next_zones:
+            body += (f"<IsTruncated>true</IsTruncated><NextDNSName>{next_zones[0]}.</NextDNSName>"
+                     f"<NextHostedZoneId>{next_zones[0]}</NextHostedZoneId>")
+        else:
+            body += "<IsTruncated>false</IsTruncated>"
+        body += "</ListHostedZonesByNameResponse>"
+
+        self.zone_listings += 1
+        return StubResponse(body.encode())
+
+    def get_all_hosted_zones(self):
+        self.zone_listings += 1
+        return {"ListHostedZonesResponse": {"HostedZones": [
+            {"Id": f"/hostedzone/{zone_name}", "Name": zone_name + ".",
+             "Config": {"PrivateZone": "false"}} for zone_name in self.zones]}}
+
+    def get_all_rrsets(self, hosted_zone_id, type=None, name=None,
+                       identifier=None, maxitems=None):
+        records = self.zones[hosted_zone_id]
+        start = 0
+        if name is not None:
+            start = [r.name for r in records].index(name)
+        end = start + self.page_size
+
+        page = ResourceRecordSets(self, hosted_zone_id)
+        page.extend(records[start:end])
+        page.is_truncated = end < len(records)
+        if page.is_truncated:
+            page.next_record_name = records[end].name
+            page.next_record_type = records[end].type
+        self.requested_pages += 1
+        return page
+
+    def get_hosted_zone(self, hosted_zone_id):
+        return {"GetHostedZoneResponse": {"HostedZone": {
+            "Id": f"/hostedzone/{hosted_zone_id}", "Name": hosted_zone_id + ".",
+            "ResourceRecordSetCount": str(len(self.zones[hosted_zone_id]))}}}
+
+    def change_rrsets(self, hosted_zone_id, xml_body):
+        self.changes.append((hosted_zone_id, xml_body))
+        return {"ChangeResourceRecordSetsResponse": {"ChangeInfo": {
+            "Id": f"/change/C{len(self.changes)}", "Status": "PENDING"}}}
+
+
+class FakeMultiPartUpload(object):
+    def __init__(self, bucket, key_name):
+        self.bucket = bucket
+        self.key_name = key_name
+        self.parts = {}
+        self.completed = False
+        self.cancelled = False
+
+    def upload_part_from_file(self, fp, part_num, size=None, **kwargs):
+        if self.bucket.fail_part == part_num:
+            raise IOError(f"Failed to upload part {part_num}")
+        self.parts[part_num] = fp.read()
+
+    def complete_upload(self):
+        self.completed = True
+        self.bucket.keys[self.key_name] = b"".join(
+            self.parts[n] for n in sorted(self.parts))
+
+    def cancel_upload(self):
+        self.cancelled = True
+
+
+class FakeBucket(object):
+    """
+    In-memory stand-in for a boto S3 bucket, supporting multipart uploads
+    """
+    def __init__(self, fail_part=None):
+        self.keys = {}
+        self.uploads = []
+        self.fail_part = fail_part
+
+    def initiate_multipart_upload(self, key_name, **kwargs):
+        upload = FakeMultiPartUpload(self, key_name)
+        self.uploads.append(upload)
+        return upload
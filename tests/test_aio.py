@@ -0,0 +1,156 @@
+"""
+Unit tests for the asyncio versions of load and dump
+"""
+
+import asyncio
+import contextlib
+import io
+import time
+
+import pytest
+from boto.route53.record import Record
+
+from route53_transfer import aio, app
+from route53_transfer.propagation import ChangeWaiter
+from route53_transfer.stats import RunStats
+from route53_transfer.testing import FakeRoute53Connection
+from route53_transfer.zone_cache import ZoneCache
+from helpers import FakeClock, PagedConnection, make_fake_zone, make_records, to_csv
+
+
+def test_async_dump_matches_dump():
+    records = make_records(7)
+    con = PagedConnection({"test.dev": records}, page_size=3)
+
+    expected = io.StringIO()
+    count = app.dump(con, "test.dev", expected, zone_cache=ZoneCache())
+
+    out = io.StringIO()
+    assert asyncio.run(aio.dump(con, "test.dev", out, zone_cache=ZoneCache())) == count
+    assert out.getvalue() == expected.getvalue()
+
+
+def test_async_load_dry_run_matches_load(capsys):
+    records = make_records(7)
+    con = PagedConnection({"test.dev": records}, page_size=3)
+
+    csv_in = ("NAME,TYPE,VALUE,TTL,REGION,WEIGHT,SETID,FAILOVER,EVALUATE_HEALTH\n"
+              "server1.test.dev.,A,10.0.0.1,300,,,,,\n"
+              "server2.test.dev.,A,10.0.1.2,300,,,,,\n"
+              "new.test.dev.,A,ALIAS:test.dev:server2.test.dev.,,,,,,False\n")
+
+    count = app.load(con, "test.dev", io.StringIO(csv_in), dry_run=True,
+                     zone_cache=ZoneCache())
+    expected = capsys.readouterr().out
+
+    async_count = asyncio.run(aio.load(con, "test.dev", io.StringIO(csv_in),
+                                       dry_run=True, zone_cache=ZoneCache()))
+    assert async_count == count
+    assert capsys.readouterr().out == expected
+
+
+def test_async_load_waits_for_dependent_batches():
+    clock = FakeClock()
+    con = FakeRoute53Connection(insync_after=5, clock=clock)
+    zone_id = con.add_zone("test.dev")
+    waiter = ChangeWaiter(con, clock=clock, sleep=clock.sleep)
+    records = [Record(name="host.test.dev.", type="A", ttl="300", resource_records=["10.0.0.1"]),
+               Record(name="www.test.dev.", type="A", alias_hosted_zone_id=zone_id,
+                      alias_dns_name="host.test.dev.", alias_evaluate_target_health=False)]
+    stats = RunStats()
+
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        assert asyncio.run(aio.load(con, "test.dev", io.StringIO(to_csv(records)), wait=True,
+                                    change_waiter=waiter, stats=stats)) == 2
+
+    submitted = sorted(waiter.submitted.values())
+    assert len(submitted) == 2 and submitted[0] < submitted[1]
+    assert waiter.pending == []
+    assert "Changes in sync after" in out.getvalue()
+    assert stats.counters["batches"] == 2
+    assert stats.counters["changes"] == 2
+    assert {"zone", "list", "parse", "diff", "commit", "wait"} <= set(stats.phases)
+
+
+def test_async_binary_and_sorted_dumps_match_dump():
+    con, _, records = make_fake_zone(500)
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.load(con, "test.dev", io.StringIO(to_csv(records)))
+
+    for options in ({"sort": True}, {"file_format": "binary"}):
+        fout = io.BytesIO() if options.get("file_format") else io.StringIO()
+        expected = fout.__class__()
+        count = app.dump(con, "test.dev", expected, **options)
+        stats = RunStats()
+        assert asyncio.run(aio.dump(con, "test.dev", fout, stats=stats, **options)) == count
+        assert fout.getvalue() == expected.getvalue()
+        assert stats.counters["records_written"] == count
+
+
+def test_async_load_of_a_binary_snapshot():
+    con, _, records = make_fake_zone(300)
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.load(con, "test.dev", io.StringIO(to_csv(records)))
+    snapshot = io.BytesIO()
+    app.dump(con, "test.dev", snapshot, file_format="binary")
+
+    target = FakeRoute53Connection(page_size=100)
+    target.add_zone("test.dev")
+    with contextlib.redirect_stdout(io.StringIO()):
+        snapshot.seek(0)
+        assert asyncio.run(aio.load(target, "test.dev", snapshot, file_format="binary")) > 0
+        snapshot.seek(0)
+        assert app.load(target, "test.dev", snapshot, file_format="binary") == 0
+
+
+def test_async_dry_run_of_a_missing_zone():
+    con = FakeRoute53Connection()
+    records = [Record(name="www.test.dev.", type="A", ttl="300", resource_records=["10.0.0.1"])]
+
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        assert asyncio.run(aio.load(con, "test.dev", io.StringIO(to_csv(records)),
+                                    dry_run=True)) == 1
+    assert out.getvalue().startswith("CREATE ZONE: test.dev\n")
+    assert app.get_zone(con, "test.dev", {}) is None
+
+
+def test_failed_zone_lookup_waits_for_the_parsing(monkeypatch):
+    class SlowFile(io.StringIO):
+        def __next__(self):
+            time.sleep(0.01)
+            return super().__next__()
+
+    def get_zone(*args, **kwargs):
+        raise RuntimeError("lookup failed")
+
+    monkeypatch.setattr(app, "get_zone", get_zone)
+    _, _, records = make_fake_zone(50)
+    file_in = SlowFile(to_csv(records))
+
+    async def load():
+        with pytest.raises(RuntimeError, match="lookup failed"):
+            await aio.load(FakeRoute53Connection(), "test.dev", file_in)
+        # The parsing is over by the time the error is raised
+        return file_in.read()
+
+    assert asyncio.run(load()) == ""
+
+
+def test_unknown_options_are_rejected():
+    con = FakeRoute53Connection()
+    with pytest.raises(TypeError, match="dryrun"):
+        asyncio.run(aio.load(con, "test.dev", io.StringIO(""), dryrun=True))
+    with pytest.raises(TypeError, match="sorted"):
+        asyncio.run(aio.dump(con, "test.dev", io.StringIO(), sorted=True))
+
+
+def test_async_load_with_processes():
+    con, _, records = make_fake_zone(2000)
+    stats = RunStats()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        count = asyncio.run(aio.load(con, "test.dev", io.StringIO(to_csv(records)),
+                                     processes=2, stats=stats))
+        assert count > 0
+        assert app.load(con, "test.dev", io.StringIO(to_csv(records))) == 0
+    assert stats.counters["records_read"] == len(records)
@@ -0,0 +1,94 @@
+"""
+Unit tests for the snapshot archive
+"""
+
+import io
+
+import pytest
+from boto.route53.record import Record
+
+from route53_transfer import app
+from route53_transfer.app import comparable, read_records
+from route53_transfer.archive import SnapshotArchive, archive
+from helpers import PagedConnection
+
+
+def make_zone(count, ttl="300"):
+    records = [Record(name="test.dev.", type="SOA", ttl="900",
+                      resource_records=["ns1.test.dev. admin.test.dev. 1 7200 900 1209600 86400"])]
+    records += [Record(name=f"server{n}.test.dev.", type="A", ttl=ttl,
+                       resource_records=[f"10.0.0.{n}", f"10.0.1.{n}"]) for n in range(count)]
+    return records
+
+
+def test_first_snapshot_is_a_base_then_deltas(tmp_path):
+    snapshots = SnapshotArchive(str(tmp_path))
+
+    base = snapshots.add(make_zone(3), "20240101T000000Z")
+    changed = make_zone(4)
+    changed[1] = Record(name="server0.test.dev.", type="A", ttl="60",
+                        resource_records=["10.0.0.9"])
+    delta = snapshots.add(changed, "20240101T010000Z")
+
+    assert base.endswith("base-20240101T000000Z.csv")
+    assert delta.endswith("delta-20240101T010000Z.csv")
+    with open(delta) as f:
+        # Header, server0 deleted and created again, server3 created
+        assert len(f.readlines()) == 1 + 2 + 3
+
+    assert snapshots.records_at("20240101T000000Z") == comparable(make_zone(3))
+    assert snapshots.records_at("20240101T003000Z") == comparable(make_zone(3))
+    assert snapshots.records_at() == comparable(changed)
+
+
+def test_unchanged_snapshot_writes_nothing(tmp_path):
+    snapshots = SnapshotArchive(str(tmp_path))
+    snapshots.add(make_zone(3), "20240101T000000Z")
+
+    assert snapshots.add(make_zone(3), "20240101T010000Z") is None
+    assert len(snapshots.snapshots()) == 1
+
+
+def test_compact_folds_deltas_into_a_new_base(tmp_path):
+    snapshots = SnapshotArchive(str(tmp_path))
+    snapshots.add(make_zone(1), "20240101T000000Z")
+    snapshots.add(make_zone(2), "20240101T010000Z")
+    snapshots.add(make_zone(3), "20240101T020000Z")
+
+    path = snapshots.compact()
+
+    assert path.endswith("base-20240101T020000Z.csv")
+    assert [kind for _, kind, _ in snapshots.snapshots()] == ["base"]
+    assert snapshots.records_at() == comparable(make_zone(3))
+
+
+def test_snapshot_csv_can_be_loaded(tmp_path):
+    snapshots = SnapshotArchive(str(tmp_path))
+    snapshots.add(make_zone(2), "20240101T000000Z")
+    snapshots.add(make_zone(5, ttl="60"), "20240101T010000Z")
+
+    fout = io.StringIO()
+    snapshots.write_csv(fout, at="20240101T000000Z")
+
+    assert comparable(read_records(io.StringIO(fout.getvalue()))) == comparable(make_zone(2))
+
+
+def test_archive_zone(tmp_path):
+    con = PagedConnection({"test.dev": make_zone(5)}, page_size=2)
+
+    assert archive(con, "test.dev", str(tmp_path)) is not None
+    assert SnapshotArchive(str(tmp_path)).records_at() == comparable(make_zone(5))
+
+
+def test_archive_twice_in_the_same_second(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr("route53_transfer.archive.snapshot_timestamp",
+                        lambda: "20240101T000000Z")
+    con = PagedConnection({"test.dev": make_zone(5)}, page_size=2)
+    params = {'archive': True, '<zone>': 'test.dev', '<dir>': str(tmp_path),
+              '--access-key-id': 'AKIAFAKE', '--secret-key': 'secret'}
+
+    app.run(params, con=con)
+    with pytest.raises(SystemExit):
+        app.run(params, con=con)
+
+    assert "already archived" in capsys.readouterr().err
@@ -0,0 +1,107 @@
+import contextlib
+import csv
+import io
+import ipaddress
+
+from boto.route53.record import Record
+
+from route53_transfer import app
+from route53_transfer.canonical import canonical_record
+from route53_transfer.testing import FakeRoute53Connection, generate_zone
+
+ZONE = {"id": "Z1", "name": "test.dev."}
+
+
+def rewrite_row(row):
+    """
+    Writes a row of a dump the way a person editing it might: names in
+    upper case without the trailing dot, zero padded TTLs and weights,
+    unquoted TXT values and IPv6 addresses in full.
+    """
+    name, type_, value, ttl, region, weight, identifier, failover, health, health_check = row
+    name = name.upper().rstrip('.').replace('\\052', '*')
+    if value.startswith('ALIAS:'):
+        _, zone_id, target = value.split(':')
+        value = ':'.join(['ALIAS', zone_id, target.upper().rstrip('.')])
+    elif type_ == 'TXT':
+        value = value.strip('"')
+    elif type_ == 'AAAA':
+        value = ipaddress.IPv6Address(value).exploded.upper()
+    ttl = ttl and '0' + ttl
+    weight = weight and '00' + weight
+    return [name, type_, value, ttl, region, weight, identifier, failover, health, health_check]
+
+
+def test_records_written_differently_are_equal():
+    listed = Record(name="\\052.test.dev.", type="TXT", ttl="300",
+                    resource_records=['"v=spf1 -all"', '"say \\"hi\\""'])
+    written = Record(name="*.Test.Dev", type="TXT", ttl="0300",
+                     resource_records=['v=spf1 -all', 'say "hi"'])
+    assert canonical_record(written) == canonical_record(listed)
+
+    listed = Record(name="v6.test.dev.", type="AAAA", ttl="60",
+                    resource_records=["2001:db8::1"])
+    written = Record(name="V6.test.dev.", type="AAAA", ttl=60,
+                     resource_records=["2001:0DB8:0000:0000:0000:0000:0000:0001"])
+    assert canonical_record(written) == canonical_record(listed)
+
+    listed = Record(name="alias.test.dev.", type="A", alias_hosted_zone_id="Z1",
+                    alias_dns_name="www.test.dev.", alias_evaluate_target_health=False,
+                    identifier="one", weight="10")
+    written = Record(name="alias.test.dev", type="A", alias_hosted_zone_id="Z1",
+                     alias_dns_name="WWW.test.dev", identifier="one", weight="010")
+    assert canonical_record(written) == canonical_record(listed)
+
+
+def test_canonical_records_are_kept():
+    record = canonical_record(Record(name="www.test.dev.", type="A", ttl="300",
+                                     resource_records=["10.0.0.1"]))
+    assert canonical_record(record) is record
+
+
+def test_unparsable_values_are_left_alone():
+    record = canonical_record(Record(name="v6.test.dev.", type="AAAA", ttl="soon",
+                                     resource_records=["not-an-address"]))
+    assert record.ttl == "soon"
+    assert record.resource_records == ("not-an-address",)
+
+
+def test_only_real_differences_are_changed():
+    existing = [Record(name="www.test.dev.", type="A", ttl="300", resource_records=["10.0.0.1"]),
+                Record(name="txt.test.dev.", type="TXT", ttl="300", resource_records=['"a"'])]
+    desired = [Record(name="WWW.test.dev", type="A", ttl="0300", resource_records=["10.0.0.1"]),
+               Record(name="txt.test.dev", type="TXT", ttl="60", resource_records=['a'])]
+
+    changes = app.compute_changes(ZONE, existing, desired, use_upsert=True)
+    assert [(c["operation"], c["record"]) for c in changes] == [
+        ("UPSERT", canonical_record(Record(name="txt.test.dev.", type="TXT", ttl="60",
+                                           resource_records=['"a"'])))]
+
+
+def test_reloading_a_dump_changes_nothing():
+    con = FakeRoute53Connection(page_size=300)
+    # The zone is seeded as generated, health checks included, rather than
+    # loaded from a dump. Zone ids are numbered from ZFAKE000000001.
+    records = generate_zone("test.dev", 10000, zone_id="ZFAKE000000001") + [
+        Record(name="*.test.dev.", type="A", ttl="60", resource_records=["10.0.0.1"]),
+        Record(name="v6.test.dev.", type="AAAA", ttl="60",
+               resource_records=["2001:db8::1", "2001:db8:0:1::"]),
+    ]
+    assert con.add_zone("test.dev", records) == "ZFAKE000000001"
+    assert any(r.health_check for r in records)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        fout = io.StringIO()
+        app.dump(con, "test.dev", fout)
+        assert app.load(con, "test.dev", io.StringIO(fout.getvalue())) == 0
+
+        fout.seek(0)
+        rows = list(csv.reader(fout))
+        rewritten = io.StringIO()
+        out = csv.writer(rewritten)
+        out.writerow(rows[0])
+        out.writerows(rewrite_row(row) for row in rows[1:])
+        assert app.load(con, "test.dev", io.StringIO(rewritten.getvalue())) == 0
+        assert app.load(con, "test.dev", io.StringIO(rewritten.getvalue()), processes=2) == 0
+
+    assert not con.calls["ChangeResourceRecordSets"]
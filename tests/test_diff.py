@@ -0,0 +1,116 @@
+import contextlib
+import csv
+import io
+
+import pytest
+from boto.route53.record import Record
+
+from route53_transfer import app
+from route53_transfer.app import compute_changes, dump, iter_records, read_records
+from route53_transfer.diff import merge_changes
+from route53_transfer.testing import FakeRoute53Connection, generate_zone, mutate_zone
+from helpers import to_csv
+
+ZONE = {"id": "Z1", "name": "test.dev."}
+
+
+def sorted_records(records):
+    return list(iter_records(io.StringIO(to_csv(records))))
+
+
+def operations(changes):
+    return [(c["operation"], c["record"]) for c in changes]
+
+
+@pytest.mark.parametrize("use_upsert", [False, True])
+def test_same_changes_as_compute_changes(use_upsert):
+    records = generate_zone("test.dev", 1000)
+    modified = mutate_zone(records, 0.2)
+    modified += [Record(name="new.test.dev.", type="A", ttl="60", resource_records=["10.0.0.1"])]
+
+    existing, desired = sorted_records(records), sorted_records(modified)
+    expected = compute_changes(ZONE, existing, desired, use_upsert=use_upsert)
+    assert expected
+    assert operations(merge_changes(ZONE, existing, desired, use_upsert=use_upsert)) == \
+        operations(expected)
+
+
+def test_apex_records_are_skipped_without_a_zone():
+    existing = [
+        Record(name="test.dev.", type="NS", ttl="172800", resource_records=["ns1."]),
+        Record(name="test.dev.", type="SOA", ttl="900", resource_records=["ns1. a. 1"]),
+        Record(name="www.test.dev.", type="NS", ttl="300", resource_records=["ns2."]),
+    ]
+    desired = [
+        Record(name="test.dev.", type="NS", ttl="172800", resource_records=["ns3."]),
+        Record(name="test.dev.", type="SOA", ttl="900", resource_records=["ns3. a. 1"]),
+    ]
+
+    changes = merge_changes(None, existing, desired)
+    assert [(c["operation"], c["record"].name) for c in changes] == [("DELETE", "www.test.dev.")]
+
+
+def test_unsorted_records_are_rejected():
+    records = [Record(name=name, type="A", ttl="60", resource_records=["10.0.0.1"])
+               for name in ("b.test.dev.", "a.test.dev.")]
+    with pytest.raises(ValueError, match="not sorted"):
+        merge_changes(ZONE, records, [])
+
+
+def test_sorted_dump_and_diff_command(tmpdir):
+    con = FakeRoute53Connection()
+    zone_id = con.add_zone("test.dev")
+    records = generate_zone("test.dev", 300, zone_id=zone_id)
+    modified = mutate_zone(records, 0.1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.load(con, "test.dev", io.StringIO(to_csv(records)))
+
+    fout = io.StringIO()
+    dump(con, "test.dev", fout, sort=True)
+    fout.seek(0)
+    dumped = list(csv.reader(fout))[1:]
+    assert dumped == sorted(dumped, key=app.csv_group_key)
+    fout.seek(0)
+    dumped_records = read_records(fout)
+
+    old, new = str(tmpdir.join("old.csv")), str(tmpdir.join("new.csv"))
+    with open(old, 'w') as f:
+        f.write(fout.getvalue())
+    with open(new, 'w') as f:
+        f.write(to_csv(modified))
+
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        assert app.run({'diff': True, '<old>': old, '<new>': new}) == 1
+    expected = compute_changes({"id": zone_id, "name": "test.dev."},
+                               dumped_records, sorted_records(modified))
+    assert out.getvalue().splitlines() == [
+        "{} {}".format(c["operation"], app.record_short_summary(c["record"])) for c in expected]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert not app.run({'diff': True, '<old>': old, '<new>': old})
+
+
+def test_names_written_differently_are_not_changes(tmpdir):
+    con = FakeRoute53Connection()
+    zone_id = con.add_zone("test.dev")
+    records = generate_zone("test.dev", 1000, zone_id=zone_id)
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.load(con, "test.dev", io.StringIO(to_csv(records)))
+
+    fout = io.StringIO()
+    dump(con, "test.dev", fout, sort=True)
+    fout.seek(0)
+    rows = list(csv.reader(fout))
+    old, new = str(tmpdir.join("old.csv")), str(tmpdir.join("new.csv"))
+    with open(old, 'w') as f:
+        f.write(fout.getvalue())
+    with open(new, 'w', newline='') as f:
+        out = csv.writer(f)
+        out.writerow(rows[0])
+        out.writerows([row[0].upper().rstrip('.')] + row[1:] for row in rows[1:])
+
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        assert not app.run({'diff': True, '<old>': old, '<new>': new})
+    assert out.getvalue() == ""
+    with open(new) as f, contextlib.redirect_stdout(io.StringIO()):
+        assert app.load(con, "test.dev", f, dry_run=True) == 0
@@ -0,0 +1,51 @@
+"""
+Unit tests for dumping a zone to CSV
+"""
+
+import csv
+import io
+
+from route53_transfer.app import dump, dump_all
+from helpers import PagedConnection, make_records
+
+
+class FlushRecorder(io.StringIO):
+    def __init__(self, con):
+        super().__init__()
+        self.con = con
+        self.flushes = []
+
+    def flush(self):
+        self.flushes.append(self.con.requested_pages)
+        super().flush()
+
+
+def test_dump_writes_each_page_as_it_arrives():
+    records = make_records(5)
+    con = PagedConnection({"test.dev": records}, page_size=2)
+    fout = FlushRecorder(con)
+
+    dump(con, "test.dev", fout)
+
+    assert con.requested_pages == 3
+    # Header first, before any page is requested, then once per page
+    assert fout.flushes == [0, 1, 2, 3]
+
+    rows = list(csv.reader(io.StringIO(fout.getvalue())))
+    assert rows[0][0] == "NAME"
+    assert [row[0] for row in rows[1:]] == [r.name for r in records]
+
+
+def test_dump_all_writes_one_file_per_zone(tmp_path):
+    zones = {f"zone{n}.dev": make_records(n + 1, f"zone{n}.dev") for n in range(6)}
+    con = PagedConnection(zones, page_size=2)
+
+    results = dump_all(con, str(tmp_path), concurrency=3)
+
+    assert con.zone_listings == 1
+    assert [r["zone"] for r in results] == sorted(zones)
+    for result in results:
+        assert result["error"] is None
+        assert result["count"] == len(zones[result["zone"]])
+        with open(tmp_path / (result["zone"] + ".csv")) as f:
+            assert len(list(csv.reader(f))) == result["count"] + 1
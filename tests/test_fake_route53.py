@@ -0,0 +1,225 @@
+"""
+End to end tests of load and dump against the in-memory Route53 stand-in
+"""
+
+import io
+
+import pytest
+from boto.route53.exception import DNSServerError
+from boto.route53.record import Record, ResourceRecordSets
+
+from route53_transfer import app
+from route53_transfer.app import comparable, create_zone, dump, get_zone, iter_rrsets, load
+from route53_transfer.testing import FakeRoute53Connection, generate_zone
+from route53_transfer.throttle import ThrottledConnection
+from route53_transfer.zone_cache import ZoneCache
+from helpers import FakeClock, to_csv
+
+
+def dumped(con, zone_name):
+    fout = io.StringIO()
+    dump(con, zone_name, fout)
+    return fout.getvalue()
+
+
+def test_load_and_dump_generated_zone():
+    con = FakeRoute53Connection(page_size=50)
+    zone_id = con.add_zone("test.dev")
+    records = generate_zone("test.dev", 1500, zone_id=zone_id)
+
+    assert load(con, "test.dev", io.StringIO(to_csv(records))) == len(records)
+    assert con.calls["ChangeResourceRecordSets"] > 1
+
+    csv_data = dumped(con, "test.dev")
+    assert load(con, "test.dev", io.StringIO(csv_data)) == 0
+    assert len(list(iter_rrsets(con, zone_id))) == len(records) + 2
+
+
+def test_load_creates_missing_zone():
+    con = FakeRoute53Connection()
+    records = [Record(name="www.test.dev.", type="A", ttl="300", resource_records=["10.0.0.1"])]
+
+    load(con, "test.dev", io.StringIO(to_csv(records)))
+
+    zone = get_zone(con, "test.dev", {})
+    assert [r.name for r in iter_rrsets(con, zone["id"])] == \
+        ["test.dev.", "test.dev.", "www.test.dev."]
+
+
+def test_listing_follows_route53_order_and_pagination():
+    con = FakeRoute53Connection(page_size=2)
+    zone_id = con.add_zone("test.dev", [
+        Record(name="b.test.dev.", type="A", ttl="60", resource_records=["10.0.0.1"],
+               identifier=f"w{n}", weight="1") for n in range(3)] + [
+        Record(name="a.b.test.dev.", type="A", ttl="60", resource_records=["10.0.0.2"]),
+        Record(name="Z.test.dev", type="TXT", ttl="60", resource_records=['"z"'])])
+
+    names = [(r.name, r.identifier) for r in iter_rrsets(con, zone_id)]
+
+    assert names == [("test.dev.", None), ("test.dev.", None),
+                     ("b.test.dev.", "w0"), ("b.test.dev.", "w1"), ("b.test.dev.", "w2"),
+                     ("a.b.test.dev.", None), ("z.test.dev.", None)]
+    assert con.calls["ListResourceRecordSets"] == 4
+
+
+def test_change_batches_are_validated():
+    con = FakeRoute53Connection()
+    zone_id = con.add_zone("test.dev", [
+        Record(name="www.test.dev.", type="A", ttl="300", resource_records=["10.0.0.1"])])
+
+    def commit(*changes):
+        rrsets = ResourceRecordSets(con, zone_id)
+        for action, record in changes:
+            rrsets.add_change_record(action, record)
+        return rrsets.commit()
+
+    with pytest.raises(DNSServerError, match="already exists"):
+        commit(("CREATE", Record(name="www.test.dev.", type="A", ttl="300",
+                                 resource_records=["10.0.0.1"])))
+    with pytest.raises(DNSServerError, match="do not match"):
+        commit(("DELETE", Record(name="www.test.dev.", type="A", ttl="60",
+                                 resource_records=["10.0.0.1"])))
+    with pytest.raises(DNSServerError, match="target was not found"):
+        commit(("CREATE", Record(name="alias.test.dev.", type="A", alias_hosted_zone_id=zone_id,
+                                 alias_dns_name="api.test.dev.",
+                                 alias_evaluate_target_health=False)))
+    with pytest.raises(DNSServerError, match="records limit"):
+        commit(*[("CREATE", Record(name=f"h{n}.test.dev.", type="A", ttl="300",
+                                   resource_records=["10.0.0.1", "10.0.0.2"]))
+                 for n in range(501)])
+
+    # Failed batches leave the zone untouched
+    assert len(con.zone_records(zone_id)) == 3
+
+    commit(("UPSERT", Record(name="www.test.dev.", type="A", ttl="60",
+                             resource_records=["10.0.0.2"])),
+           ("CREATE", Record(name="alias.test.dev.", type="A", alias_hosted_zone_id=zone_id,
+                             alias_dns_name="www.test.dev.", alias_evaluate_target_health=False)))
+    assert comparable(con.zone_records(zone_id)) >= comparable([
+        Record(name="www.test.dev.", type="A", ttl="60", resource_records=["10.0.0.2"]),
+        Record(name="alias.test.dev.", type="A", alias_hosted_zone_id=zone_id,
+               alias_dns_name="www.test.dev.", alias_evaluate_target_health=False)])
+
+
+def test_deep_alias_chain_is_loaded_in_order():
+    con = FakeRoute53Connection()
+    zone_id = con.add_zone("test.dev")
+    records = [Record(name="host.test.dev.", type="A", ttl="300", resource_records=["10.0.0.1"])]
+    for n in range(6):
+        target = records[-1].name
+        records.append(Record(name=f"alias{n}.test.dev.", type="A", alias_hosted_zone_id=zone_id,
+                              alias_dns_name=target, alias_evaluate_target_health=False))
+
+    assert load(con, "test.dev", io.StringIO(to_csv(records[::-1]))) == 7
+    assert con.calls["ChangeResourceRecordSets"] == 7
+
+    # Deleting the whole chain needs no ordering
+    assert load(con, "test.dev", io.StringIO(to_csv([]))) == 7
+    assert con.calls["ChangeResourceRecordSets"] == 8
+    assert len(con.zone_records(zone_id)) == 2
+
+
+def test_alias_cycle_is_reported_by_the_command_line(tmp_path, capsys):
+    con = FakeRoute53Connection()
+    zone_id = con.add_zone("test.dev")
+    records = [Record(name=f"{name}.test.dev.", type="A", alias_hosted_zone_id=zone_id,
+                      alias_dns_name=f"{target}.test.dev.", alias_evaluate_target_health=False)
+               for name, target in (("a", "b"), ("b", "a"))]
+    path = tmp_path / "zone.csv"
+    path.write_text(to_csv(records))
+    params = {'load': True, '<zone>': 'test.dev', '<file>': str(path),
+              '--access-key-id': 'AKIAFAKE', '--secret-key': 'secret'}
+
+    with pytest.raises(SystemExit):
+        app.run(params, con=con)
+
+    assert "in a cycle" in capsys.readouterr().err
+    assert not con.calls["ChangeResourceRecordSets"]
+
+
+def test_throttled_requests_are_retried():
+    clock = FakeClock()
+    fake = FakeRoute53Connection(page_size=5, max_rate=2, clock=clock, sleep=clock.sleep)
+    zone_id = fake.add_zone("test.dev")
+    records = [r for r in generate_zone("test.dev", 60, zone_id=zone_id) if not r.alias_dns_name]
+    con = ThrottledConnection(fake, rate=100, max_rate=100, sleep=clock.sleep)
+
+    load(con, "test.dev", io.StringIO(to_csv(records)))
+
+    assert fake.throttled > 0
+    assert con.stats["throttled"] == fake.throttled
+    assert load(con, "test.dev", io.StringIO(dumped(con, "test.dev"))) == 0
+
+
+def test_private_zone_lookup():
+    con = FakeRoute53Connection()
+    vpc = {"VPCRegion": "eu-west-1", "VPCId": "vpc-1"}
+    con.add_zone("test.dev")
+    private_id = con.add_zone("test.dev", private=True, vpcs=[vpc])
+    con.add_zone("test.dev", private=True, vpcs=[{"VPCRegion": "eu-west-1", "VPCId": "vpc-2"}])
+
+    zone = get_zone(con, "test.dev", {"is_private": True, "region": "eu-west-1", "id": "vpc-1"},
+                    cache=None)
+
+    assert zone["id"] == private_id
+
+
+def test_created_private_zone_is_found_through_the_cache(tmpdir):
+    con = FakeRoute53Connection()
+    for vpc_id in ("vpc-2", "vpc-3"):
+        con.add_zone("test.dev", private=True, vpcs=[{"VPCRegion": "eu-west-1", "VPCId": vpc_id}])
+    vpc = {"is_private": True, "region": "eu-west-1", "id": "vpc-1"}
+    cache_file = str(tmpdir.join("zones.json"))
+
+    # The lookup caches that vpc-1 has no zones
+    assert get_zone(con, "test.dev", vpc, cache=ZoneCache(cache_file)) is None
+    zone = create_zone(con, "test.dev", vpc, cache=ZoneCache(cache_file))
+    assert zone is not None and zone["id"] is not None
+    assert get_zone(con, "test.dev", vpc, cache=ZoneCache(cache_file)) == zone
+
+
+def test_zone_created_out_of_band_is_not_created_again():
+    con = FakeRoute53Connection()
+    cache = ZoneCache()
+    # A lookup cached before the zone was created by someone else
+    cache.put(getattr(con, "aws_access_key_id", None), False, "test.dev", [])
+    zone_id = con.add_zone("test.dev")
+
+    zone = create_zone(con, "test.dev", {"is_private": False}, cache=cache)
+
+    assert zone["id"] == zone_id
+    assert not con.calls["CreateHostedZone"]
+    assert get_zone(con, "test.dev", {"is_private": False}, cache=cache) == zone
+
+
+def test_load_stops_when_the_created_zone_is_not_found():
+    con = FakeRoute53Connection()
+    # The zone is created, but isn't listed yet
+    con.create_hosted_zone = lambda **kwargs: {"CreateHostedZoneResponse": {
+        "HostedZone": {"Id": "/hostedzone/ZLOST"}}}
+    records = generate_zone("test.dev", 10)
+
+    with pytest.raises(SystemExit):
+        load(con, "test.dev", io.StringIO(to_csv(records)))
+    assert not con.calls["ChangeResourceRecordSets"]
+
+
+def test_retried_zone_creation_creates_a_single_zone():
+    fake = FakeRoute53Connection()
+    create_hosted_zone = fake.create_hosted_zone
+    lost = []
+
+    def create_losing_the_first_response(**kwargs):
+        response = create_hosted_zone(**kwargs)
+        if not lost:
+            lost.append(response)
+            raise ConnectionResetError("Connection reset")
+        return response
+
+    fake.create_hosted_zone = create_losing_the_first_response
+    con = ThrottledConnection(fake, sleep=lambda s: None)
+
+    zone = create_zone(con, "test.dev", {"is_private": False}, cache=ZoneCache())
+    assert zone["id"] == lost[0]["CreateHostedZoneResponse"]["HostedZone"]["Id"].split("/")[-1]
+    assert fake.calls["CreateHostedZone"] == 2
+    assert len(fake.get_all_hosted_zones()["ListHostedZonesResponse"]["HostedZones"]) == 1
@@ -0,0 +1,42 @@
+"""
+Unit tests for the synthetic zone generator
+"""
+
+from route53_transfer.app import comparable
+from route53_transfer.testing import generate_zone, mutate_zone
+from helpers import diff_zone
+
+
+def test_generated_zone_is_seeded():
+    zone = generate_zone("test.dev", 2000, seed=1)
+
+    assert len(zone) == 2000
+    assert comparable(zone) == comparable(generate_zone("test.dev", 2000, seed=1))
+    assert comparable(zone) != comparable(generate_zone("test.dev", 2000, seed=2))
+
+
+def test_generated_zone_has_every_kind_of_record():
+    zone = generate_zone("test.dev", 2000)
+
+    assert {r.type for r in zone} == {"A", "TXT", "CNAME"}
+    assert any(len(r.resource_records) > 1 for r in zone)
+    assert any(r.weight for r in zone)
+    assert any(r.region for r in zone)
+    assert any(r.failover == "PRIMARY" and r.health_check for r in zone)
+
+    names = {r.name for r in zone}
+    aliases = [r for r in zone if r.alias_dns_name]
+    assert aliases
+    assert all(r.alias_dns_name in names for r in aliases)
+    assert any(r.alias_dns_name in {a.name for a in aliases} for r in aliases)
+
+
+def test_mutated_zone_keeps_alias_targets():
+    zone = generate_zone("test.dev", 2000)
+    mutated = mutate_zone(zone, 0.2)
+
+    changes = diff_zone(zone, mutated)
+    assert 0 < len(changes) < len(zone)
+
+    names = {r.name for r in mutated}
+    assert all(r.alias_dns_name in names for r in mutated if r.alias_dns_name)
@@ -0,0 +1,60 @@
+import contextlib
+import io
+import pickle
+
+import pytest
+from boto.route53.record import Record
+
+from route53_transfer import app
+from route53_transfer.app import ComparableRecord, compute_changes
+from route53_transfer.parallel import parallel_changes
+from route53_transfer.testing import FakeRoute53Connection, generate_zone, mutate_zone
+from helpers import to_csv
+
+ZONE = {"id": "Z1", "name": "test.dev."}
+
+
+def operations(changes):
+    return [(c["operation"], c["record"]) for c in changes]
+
+
+def test_records_survive_pickling():
+    record = ComparableRecord("www.test.dev.", "A", "300", ["10.0.0.2", "10.0.0.1"],
+                              weight="10", identifier="one")
+    copy = pickle.loads(pickle.dumps(record))
+    assert copy == record
+    assert hash(copy) == hash(record)
+    assert copy.resource_records == ("10.0.0.1", "10.0.0.2")
+
+
+@pytest.mark.parametrize("use_upsert", [False, True])
+def test_same_changes_as_compute_changes(use_upsert):
+    records = generate_zone("test.dev", 1000)
+    modified = mutate_zone(records, 0.2)
+    modified += [Record(name="new.test.dev.", type="A", ttl="60", resource_records=["10.0.0.1"])]
+
+    existing = app.comparable(records)
+    expected = compute_changes(ZONE, existing, app.read_records(io.StringIO(to_csv(modified))),
+                               use_upsert=use_upsert)
+    assert expected
+
+    changes, record_count = parallel_changes(ZONE, existing, io.StringIO(to_csv(modified)),
+                                             use_upsert=use_upsert, processes=3)
+    assert operations(changes) == operations(expected)
+    assert record_count == len(modified)
+
+
+def test_load_with_processes():
+    con = FakeRoute53Connection()
+    zone_id = con.add_zone("test.dev")
+    records = generate_zone("test.dev", 500, zone_id=zone_id)
+    modified = mutate_zone(records, 0.2)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.load(con, "test.dev", io.StringIO(to_csv(records)), processes=2)
+        app.load(con, "test.dev", io.StringIO(to_csv(modified)), processes=2)
+        assert app.load(con, "test.dev", io.StringIO(to_csv(modified)), processes=2) == 0
+
+    zone = {"id": zone_id, "name": "test.dev."}
+    assert app.comparable(app.skip_apex_soa_ns(zone, app.iter_rrsets(con, zone_id))) == \
+        app.comparable(app.read_records(io.StringIO(to_csv(modified))))
@@ -0,0 +1,131 @@
+import contextlib
+import io
+
+import pytest
+from boto.route53.record import Record, ResourceRecordSets
+
+from route53_transfer import app
+from route53_transfer.plan import apply_plan, plan, read_plan
+from route53_transfer.testing import FakeRoute53Connection, generate_zone, mutate_zone
+from helpers import make_fake_zone, to_csv
+
+
+def load(con, records, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return app.load(con, "test.dev", io.StringIO(to_csv(records)), **kwargs)
+
+
+def make_plan(con, records, **kwargs):
+    fout = io.BytesIO()
+    with contextlib.redirect_stdout(io.StringIO()):
+        count = plan(con, "test.dev", io.StringIO(to_csv(records)), fout, **kwargs)
+    fout.seek(0)
+    return count, fout
+
+
+def apply(con, fin, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return apply_plan(con, fin, **kwargs)
+
+
+def make_zone(size):
+    con, _, records = make_fake_zone(size)
+    load(con, records)
+    return con, records
+
+
+def test_plan_is_applied_without_recomputing():
+    con, records = make_zone(3000)
+    modified = mutate_zone(records, 0.001)
+
+    commits = con.calls["ChangeResourceRecordSets"]
+    count, plan_file = make_plan(con, modified, use_upsert=True)
+    assert count > 0
+    assert con.calls["ChangeResourceRecordSets"] == commits
+
+    # Only the few touched names are listed, not the 3000 records
+    listed = con.calls["ListResourceRecordSets"]
+    assert apply(con, plan_file) == count
+    assert con.calls["ListResourceRecordSets"] - listed <= count
+    assert load(con, modified) == 0
+
+
+def test_plan_batches_are_kept():
+    con, _ = make_zone(300)
+    desired = generate_zone("test.dev", 2000, seed=1)
+    zone = app.get_zone(con, "test.dev", {})
+    changes = app.compute_changes(zone, app.get_zone_records(con, zone["id"]),
+                                  app.read_records(io.StringIO(to_csv(desired))))
+    expected = app.changes_to_r53_updates(zone, changes)
+    assert len(expected) > 1
+
+    _, plan_file = make_plan(con, desired)
+    _, _, batches = read_plan(plan_file)
+    assert [(b.prio, [(c["operation"], c["record"]) for c in b.changes]) for b in batches] == \
+        [(b.prio, [(c["operation"], c["record"]) for c in b.changes]) for b in expected]
+
+
+def test_changes_to_other_names_do_not_matter():
+    con, records = make_zone(500)
+    modified = mutate_zone(records, 0.02)
+    count, plan_file = make_plan(con, modified)
+
+    extra = Record(name="extra.test.dev.", type="A", ttl="60", resource_records=["10.9.9.9"])
+    load(con, records + [extra])
+    assert apply(con, plan_file) == count
+    assert load(con, modified + [extra]) == 0
+
+
+def test_changes_to_touched_names_abort_the_plan():
+    con, records = make_zone(500)
+    _, plan_file = make_plan(con, mutate_zone(records, 0.02))
+    zone, _, batches = read_plan(plan_file)
+    plan_file.seek(0)
+
+    deleted = next(c["record"] for b in batches for c in b.changes if c["operation"] == "DELETE")
+    rrsets = ResourceRecordSets(con, zone["id"])
+    rrsets.add_change_record("DELETE", deleted.to_record())
+    rrsets.commit()
+
+    commits = con.calls["ChangeResourceRecordSets"]
+    with pytest.raises(SystemExit):
+        apply(con, plan_file)
+    assert con.calls["ChangeResourceRecordSets"] == commits
+
+
+def test_missing_zone_is_created_on_apply():
+    con = FakeRoute53Connection()
+    records = generate_zone("test.dev", 200, zone_id="ZNOTYET")
+    records = [r for r in records if not r.alias_dns_name]
+
+    count, plan_file = make_plan(con, records)
+    assert app.get_zone(con, "test.dev", {}) is None
+    assert apply(con, plan_file) == count
+    assert load(con, records) == 0
+
+
+def test_plan_and_apply_commands(tmpdir):
+    con, records = make_zone(300)
+    zone_csv, plan_path = str(tmpdir.join("zone.csv")), str(tmpdir.join("zone.plan"))
+    with open(zone_csv, 'w', newline='') as f:
+        f.write(to_csv(mutate_zone(records, 0.1)))
+    params = {'<zone>': 'test.dev', '<file>': zone_csv, '<plan>': plan_path,
+              '--access-key-id': 'AKIAFAKE', '--secret-key': 'secret', '--max-rate': '1000'}
+
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        app.run(dict(params, plan=True), con=con)
+    assert "Dry-run requested" in out.getvalue()
+    commits = con.calls["ChangeResourceRecordSets"]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.run(dict(params, apply=True), con=con)
+    assert con.calls["ChangeResourceRecordSets"] > commits
+
+    # The zone moved on, so the plan can't be applied again
+    with contextlib.redirect_stdout(io.StringIO()), pytest.raises(SystemExit):
+        app.run(dict(params, apply=True), con=con)
+
+    with open(plan_path, 'wb') as f:
+        f.write(b"not a plan")
+    with pytest.raises(SystemExit):
+        app.run(dict(params, apply=True), con=con)
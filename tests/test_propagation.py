@@ -0,0 +1,81 @@
+import contextlib
+import io
+
+import pytest
+from boto.route53.record import Record, ResourceRecordSets
+
+from route53_transfer.app import load
+from route53_transfer.propagation import ChangeWaiter
+from route53_transfer.testing import FakeRoute53Connection
+from helpers import FakeClock, to_csv
+
+
+def a_record(name):
+    return Record(name=name, type="A", ttl="300", resource_records=["10.0.0.1"])
+
+
+def alias(name, target, zone_id):
+    return Record(name=name, type="A", alias_hosted_zone_id=zone_id, alias_dns_name=target,
+                  alias_evaluate_target_health=False)
+
+
+def change_xml(con, zone_id, record):
+    rrsets = ResourceRecordSets(con, zone_id)
+    rrsets.add_change_record("CREATE", record)
+    return rrsets.to_xml()
+
+
+def test_wait_polls_pending_changes_with_backoff():
+    clock = FakeClock()
+    con = FakeRoute53Connection(insync_after=10, clock=clock)
+    zone_id = con.add_zone("test.dev")
+    waiter = ChangeWaiter(con, clock=clock, sleep=clock.sleep)
+
+    for name in ("a.test.dev.", "b.test.dev."):
+        rrsets = con.change_rrsets(zone_id, change_xml(con, zone_id, a_record(name)))
+        waiter.add(rrsets['ChangeResourceRecordSetsResponse']['ChangeInfo'])
+    assert len(waiter.pending) == 2
+
+    waited = waiter.wait()
+    assert waiter.pending == []
+    assert 10 <= waited < 15
+    # Polls every pending change at each round, less and less often
+    assert con.calls["GetChange"] == 2 * 6
+    assert waiter.latency() == waited
+
+
+def test_wait_times_out():
+    clock = FakeClock()
+    con = FakeRoute53Connection(insync_after=100, clock=clock)
+    zone_id = con.add_zone("test.dev")
+    waiter = ChangeWaiter(con, timeout=30, clock=clock, sleep=clock.sleep)
+    rrsets = con.change_rrsets(zone_id, change_xml(con, zone_id, a_record("a.test.dev.")))
+    waiter.add(rrsets['ChangeResourceRecordSetsResponse']['ChangeInfo'])
+
+    with pytest.raises(TimeoutError):
+        waiter.wait()
+    assert clock.now == 30
+
+
+def test_load_waits_only_for_dependent_batches():
+    clock = FakeClock()
+    con = FakeRoute53Connection(insync_after=5, clock=clock)
+    zone_id = con.add_zone("test.dev")
+    waiter = ChangeWaiter(con, clock=clock, sleep=clock.sleep)
+
+    records = [a_record(f"host{n}.test.dev.") for n in range(1500)]
+    records.append(alias("www.test.dev.", "host0.test.dev.", zone_id))
+    records.append(alias("api.test.dev.", "www.test.dev.", zone_id))
+
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        load(con, "test.dev", io.StringIO(to_csv(records)), wait=True, change_waiter=waiter)
+
+    # host records take two batches, committed back to back, then each
+    # alias waits for the previous level to be INSYNC
+    assert con.calls["ChangeResourceRecordSets"] == 4
+    assert len(waiter.submitted) == 4
+    assert waiter.pending == []
+    submitted = sorted(waiter.submitted.values())
+    assert submitted[0] == submitted[1]
+    assert submitted[1] < submitted[2] < submitted[3]
+    assert "Changes in sync after" in out.getvalue()
@@ -0,0 +1,80 @@
+"""
+Unit tests for the canonical record representation
+"""
+
+import io
+
+import pytest
+from boto.route53.record import Record
+
+from route53_transfer.app import ComparableRecord, group_values, read_records
+
+
+def test_record_values_order_does_not_matter():
+    r1 = ComparableRecord(name="server1", type="A",
+                          resource_records=["1.2.3.4", "1.2.3.5"])
+    r2 = ComparableRecord(name="server1", type="A",
+                          resource_records=["1.2.3.5", "1.2.3.4"])
+    assert r1 == r2
+    assert hash(r1) == hash(r2)
+    assert len({r1, r2}) == 1
+
+
+def test_record_is_immutable():
+    r = ComparableRecord(name="server1", type="A", resource_records=["1.2.3.4"])
+    with pytest.raises(AttributeError):
+        r.ttl = 300
+
+
+def test_boto_record_round_trip():
+    record = Record()
+    record.name = "server2"
+    record.type = "A"
+    record.alias_hosted_zone_id = "Z123"
+    record.alias_dns_name = "server1"
+    record.alias_evaluate_target_health = False
+
+    comparable_record = ComparableRecord.from_record(record)
+    assert ComparableRecord.from_record(comparable_record) is comparable_record
+
+    back = comparable_record.to_record()
+    assert isinstance(back, Record)
+    assert back.to_xml() == record.to_xml()
+
+
+def test_read_records_groups_values():
+    csv_in = io.StringIO(
+        "NAME,TYPE,VALUE,TTL,REGION,WEIGHT,SETID,FAILOVER,EVALUATE_HEALTH\n"
+        "server1.test.dev.,A,1.2.3.4,300,,,,,\n"
+        "server1.test.dev.,A,1.2.3.5,300,,,,,\n"
+        "server2.test.dev.,A,ALIAS:Z123:server1.test.dev.,,,,,,False\n")
+
+    records = read_records(csv_in)
+
+    assert records == [
+        ComparableRecord(name="server1.test.dev.", type="A", ttl="300",
+                         resource_records=["1.2.3.4", "1.2.3.5"]),
+        ComparableRecord(name="server2.test.dev.", type="A",
+                         alias_hosted_zone_id="Z123",
+                         alias_dns_name="server1.test.dev.",
+                         alias_evaluate_target_health=False),
+    ]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 100000])
+def test_read_records_groups_non_adjacent_values(chunk_size):
+    lines = [
+        ["server1.test.dev.", "A", "1.2.3.4", "300", "", "", "", "", ""],
+        ["server2.test.dev.", "A", "1.2.3.6", "300", "", "", "", "", ""],
+        ["server1.test.dev.", "A", "1.2.3.5", "300", "", "", "", "", ""],
+        ["server2.test.dev.", "A", "1.2.3.7", "300", "", "", "", "", ""],
+    ]
+
+    records = list(group_values(lines, chunk_size=chunk_size))
+
+    assert records == [
+        ComparableRecord(name="server1.test.dev.", type="A", ttl="300",
+                         resource_records=["1.2.3.4", "1.2.3.5"]),
+        ComparableRecord(name="server2.test.dev.", type="A", ttl="300",
+                         resource_records=["1.2.3.6", "1.2.3.7"]),
+    ]
@@ -0,0 +1,92 @@
+"""
+Unit tests for the cache of zone records used by load
+"""
+
+import io
+
+from boto.route53.record import Record
+
+from route53_transfer import app
+from route53_transfer.app import apply_changes, comparable, dump, load
+from route53_transfer.rrset_cache import RRSetCache
+from route53_transfer.testing import FakeRoute53Connection
+from helpers import PagedConnection, diff_zone, make_records, to_csv
+
+
+def dumped(con):
+    fout = io.StringIO()
+    dump(con, "test.dev", fout)
+    return fout.getvalue()
+
+
+def test_cache_round_trip(tmp_path):
+    cache = RRSetCache(str(tmp_path))
+    records = comparable(make_records(3) + [
+        Record(name="alias.test.dev.", type="A", alias_hosted_zone_id="Z1",
+               alias_dns_name="server0.test.dev.", alias_evaluate_target_health=False)])
+
+    cache.put("/hostedzone/Z1", records, change_id="/change/C1")
+
+    assert cache.get("/hostedzone/Z1", 4) == records
+    assert cache.get("/hostedzone/Z1", 5) is None
+    assert cache.get("/hostedzone/Z2", 4) is None
+
+    cache.invalidate("/hostedzone/Z1")
+    assert cache.get("/hostedzone/Z1", 4) is None
+
+
+def test_load_reuses_cached_records_until_the_count_changes(tmp_path):
+    records = make_records(10)
+    con = PagedConnection({"test.dev": records}, page_size=3)
+    csv_data = dumped(con)
+    pages = con.requested_pages
+    cache = RRSetCache(str(tmp_path))
+
+    load(con, "test.dev", io.StringIO(csv_data), rrset_cache=cache)
+    assert con.requested_pages == 2 * pages
+
+    load(con, "test.dev", io.StringIO(csv_data), rrset_cache=cache)
+    assert con.requested_pages == 2 * pages
+
+    records.append(Record(name="new.test.dev.", type="A", ttl="300",
+                          resource_records=["10.0.1.1"]))
+    assert load(con, "test.dev", io.StringIO(csv_data), rrset_cache=cache) == 1
+    assert con.requested_pages == 3 * pages
+
+
+def test_load_caches_the_records_left_by_its_changes(tmp_path):
+    records = make_records(4)
+    con = PagedConnection({"test.dev": records}, page_size=10)
+    cache = RRSetCache(str(tmp_path))
+    csv_data = dumped(con)
+
+    con.zones["test.dev"] = records[1:] + [
+        Record(name="server0.test.dev.", type="A", ttl="60", resource_records=["10.0.0.9"])]
+    load(con, "test.dev", io.StringIO(csv_data), rrset_cache=cache, use_upsert=True)
+
+    assert len(con.changes) == 1
+    assert cache.get("test.dev", 4) == comparable(records)
+
+
+def test_command_line_warns_about_edits_the_cache_misses(tmp_path, capsys):
+    con = FakeRoute53Connection()
+    con.add_zone("test.dev")
+    path = tmp_path / "zone.csv"
+    path.write_text(to_csv(make_records(3)))
+    params = {'load': True, '<zone>': 'test.dev', '<file>': str(path),
+              '--rrset-cache': str(tmp_path / "cache"),
+              '--access-key-id': 'AKIAFAKE', '--secret-key': 'secret'}
+
+    app.run(params, con=con)
+
+    assert "WARNING: --rrset-cache" in capsys.readouterr().err
+
+
+def test_apply_changes():
+    before = comparable(make_records(3))
+    after = comparable(make_records(2) + [
+        Record(name="server2.test.dev.", type="A", ttl="60", resource_records=["10.0.0.2"]),
+        Record(name="server3.test.dev.", type="A", ttl="60", resource_records=["10.0.0.3"])])
+
+    assert apply_changes(before, diff_zone(before, after)) == after
+    assert apply_changes(before, diff_zone(before, after, use_upsert=True)) == after
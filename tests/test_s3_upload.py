@@ -0,0 +1,105 @@
+"""
+Unit tests for streaming dumps to S3
+"""
+
+import csv
+import gzip
+import io
+import random
+
+import pytest
+from boto.route53.record import Record
+
+from route53_transfer import s3_upload
+from route53_transfer.s3_upload import MIN_PART_SIZE, MultipartUploadWriter, dump_to_s3
+from route53_transfer.snapshot import Snapshot
+from route53_transfer.app import comparable
+from helpers import FakeBucket, PagedConnection
+
+
+def make_random_records(count):
+    return [Record(name=f"server{n}.test.dev.", type="TXT", ttl="300",
+                   resource_records=[f'"{random.getrandbits(128):032x}"'])
+            for n in range(count)]
+
+
+def test_writer_uploads_parts_of_the_given_size():
+    bucket = FakeBucket()
+    data = random.randbytes(2 * MIN_PART_SIZE + 1000)
+
+    writer = MultipartUploadWriter(bucket, "key", part_size=MIN_PART_SIZE, concurrency=2)
+    for n in range(0, len(data), 100000):
+        writer.write(data[n:n + 100000])
+    writer.close()
+
+    upload = bucket.uploads[0]
+    assert upload.completed
+    assert [len(upload.parts[n]) for n in sorted(upload.parts)] == \
+        [MIN_PART_SIZE, MIN_PART_SIZE, 1000]
+    assert bucket.keys["key"] == data
+
+
+def test_writer_cancels_upload_on_failed_part():
+    bucket = FakeBucket(fail_part=1)
+
+    writer = MultipartUploadWriter(bucket, "key", part_size=MIN_PART_SIZE)
+    writer.write(b"x" * MIN_PART_SIZE)
+    with pytest.raises(IOError):
+        writer.close()
+
+    assert bucket.uploads[0].cancelled
+    assert "key" not in bucket.keys
+
+
+def test_dump_to_s3_gzip():
+    records = make_random_records(5000)
+    con = PagedConnection({"test.dev": records}, page_size=300)
+    bucket = FakeBucket()
+
+    assert dump_to_s3(con, "test.dev", bucket, "test.dev.csv.gz",
+                      part_size=MIN_PART_SIZE) == len(records)
+
+    assert bucket.uploads[0].completed
+    rows = list(csv.reader(io.StringIO(gzip.decompress(bucket.keys["test.dev.csv.gz"]).decode())))
+    assert rows[0][0] == "NAME"
+    assert [row[0] for row in rows[1:]] == [r.name for r in records]
+
+
+def test_dump_to_s3_binary_uncompressed():
+    records = make_random_records(10)
+    con = PagedConnection({"test.dev": records}, page_size=3)
+    bucket = FakeBucket()
+
+    dump_to_s3(con, "test.dev", bucket, "test.dev.r53s", compression="none",
+               file_format="binary")
+
+    assert set(Snapshot(bucket.keys["test.dev.r53s"])) == comparable(records)
+
+
+def test_dump_to_s3_cancels_upload_when_zone_is_missing():
+    con = PagedConnection({"test.dev": []}, page_size=3)
+    bucket = FakeBucket()
+
+    with pytest.raises(SystemExit):
+        dump_to_s3(con, "missing.dev", bucket, "missing.dev.csv.gz")
+
+    assert bucket.uploads[0].cancelled
+    assert bucket.keys == {}
+
+
+def test_dump_to_s3_closes_the_compressor_of_a_failed_dump(monkeypatch):
+    files = []
+
+    def failing_dump(con, zone_name, fout, **kwargs):
+        files.append(fout)
+        fout.write("NAME,TYPE\n")
+        raise IOError("Connection reset")
+
+    monkeypatch.setattr(s3_upload, "dump", failing_dump)
+    bucket = FakeBucket()
+
+    with pytest.raises(IOError):
+        dump_to_s3(PagedConnection({}, page_size=3), "test.dev", bucket, "test.dev.csv.gz")
+
+    assert files[0].closed and files[0].buffer.closed
+    assert bucket.uploads[0].cancelled
@@ -0,0 +1,97 @@
+"""
+Unit tests for binary zone snapshots
+"""
+
+import io
+
+import pytest
+from boto.route53.record import Record
+
+from route53_transfer.app import comparable, dump, read_records
+from route53_transfer.snapshot import (
+    Snapshot,
+    csv_to_snapshot,
+    snapshot_to_csv,
+    write_snapshot,
+)
+from helpers import PagedConnection
+
+RECORDS = [
+    Record(name="test.dev.", type="NS", ttl="172800",
+           resource_records=["ns1.test.dev.", "ns2.test.dev."]),
+    Record(name="www.test.dev.", type="A", ttl="300",
+           resource_records=["10.0.0.1", "10.0.0.2"]),
+    Record(name="www.test.dev.", type="AAAA", ttl="300",
+           resource_records=["::1"]),
+    Record(name="api.test.dev.", type="A", identifier="eu", region="eu-west-1",
+           alias_hosted_zone_id="Z2", alias_dns_name="lb-eu.example.com.",
+           alias_evaluate_target_health=True),
+    Record(name="api.test.dev.", type="A", identifier="us", region="us-east-1",
+           alias_hosted_zone_id="Z2", alias_dns_name="lb-us.example.com.",
+           alias_evaluate_target_health=False),
+    Record(name="wwx.test.dev.", type="TXT", ttl="60",
+           resource_records=['"v=spf1 -all"']),
+]
+
+
+def make_snapshot(records):
+    fout = io.BytesIO()
+    write_snapshot(records, fout)
+    return fout.getvalue()
+
+
+def test_snapshot_round_trip():
+    snapshot = Snapshot(make_snapshot(RECORDS))
+
+    assert len(snapshot) == len(RECORDS)
+    assert set(snapshot) == comparable(RECORDS)
+    assert list(snapshot.names()) == ["api.test.dev.", "test.dev.", "www.test.dev.", "wwx.test.dev."]
+
+
+def test_lookup_by_name_and_prefix():
+    snapshot = Snapshot(make_snapshot(RECORDS))
+
+    assert set(snapshot.lookup("www.test.dev.")) == comparable(RECORDS[1:3])
+    assert snapshot.lookup("ww.test.dev.") == []
+    assert snapshot.lookup("zzz.test.dev.") == []
+    assert set(snapshot.lookup_prefix("ww")) == comparable(RECORDS[1:3] + RECORDS[5:])
+    assert set(snapshot.lookup_prefix("api.")) == comparable(RECORDS[3:5])
+    assert list(snapshot.lookup_prefix("x")) == []
+
+
+def test_open_memory_mapped(tmp_path):
+    path = tmp_path / "zone.r53s"
+    path.write_bytes(make_snapshot(RECORDS))
+
+    with Snapshot.open(str(path)) as snapshot:
+        assert set(snapshot.lookup("test.dev.")) == comparable(RECORDS[:1])
+
+
+def test_truncated_snapshots_are_rejected():
+    data = make_snapshot(RECORDS)
+
+    for truncated in (b"", data[:10], data[:-1]):
+        with pytest.raises(ValueError, match="Truncated snapshot"):
+            Snapshot.from_file(io.BytesIO(truncated))
+
+
+def test_convert_to_and_from_csv():
+    con = PagedConnection({"test.dev": RECORDS}, page_size=2)
+    csv_dump = io.StringIO()
+    dump(con, "test.dev", csv_dump)
+
+    binary = io.BytesIO()
+    assert csv_to_snapshot(io.StringIO(csv_dump.getvalue()), binary) == len(RECORDS)
+
+    converted = io.StringIO()
+    snapshot_to_csv(Snapshot(binary.getvalue()), converted)
+    assert comparable(read_records(io.StringIO(converted.getvalue()))) == \
+        comparable(read_records(io.StringIO(csv_dump.getvalue())))
+
+
+def test_dump_binary():
+    con = PagedConnection({"test.dev": RECORDS}, page_size=2)
+    fout = io.BytesIO()
+
+    assert dump(con, "test.dev", fout, file_format="binary") == len(RECORDS)
+    assert set(Snapshot(fout.getvalue())) == comparable(RECORDS)
@@ -0,0 +1,100 @@
+import contextlib
+import csv
+import io
+import json
+
+from route53_transfer import app
+from route53_transfer.stats import RunStats, StatsConnection, count_transfers
+from route53_transfer.testing import FakeRoute53Connection, generate_zone
+from helpers import FakeClock
+
+
+def write_zone(records, path):
+    with open(path, 'w', newline='') as fout:
+        out = csv.writer(fout)
+        out.writerow(app.CSV_HEADER)
+        for record in records:
+            out.writerows(app.record_to_stringlist(record))
+
+
+def run(con, **params):
+    params.setdefault('--max-rate', '1000')
+    params.update({'--access-key-id': 'AKIAFAKE', '--secret-key': 'secret'})
+    with contextlib.redirect_stdout(io.StringIO()):
+        return app.run(params, con=con)
+
+
+def test_phases_add_up():
+    clock, cpu_clock = FakeClock(), FakeClock()
+    stats = RunStats(clock=clock, cpu_clock=cpu_clock)
+
+    for seconds in (1.0, 2.0):
+        with stats.phase('list'):
+            clock.now += seconds
+            cpu_clock.now += seconds / 2
+    with stats.phase('diff'):
+        clock.now += 0.5
+    stats.count('changes', 3)
+    stats.add_call('get_all_rrsets', 0.25)
+    stats.add_call('get_all_rrsets', 0.25, error=True)
+
+    report = stats.report(command='load')
+    assert report['command'] == 'load'
+    assert report['seconds'] == 3.5
+    assert report['phases']['list'] == {'count': 2, 'seconds': 3.0, 'cpu_seconds': 1.5}
+    assert report['phases']['diff']['seconds'] == 0.5
+    assert report['api_calls']['get_all_rrsets'] == {'calls': 2, 'errors': 1, 'seconds': 0.5}
+    assert report['api_call_count'] == 2
+    assert report['pages'] == 2
+    assert report['counters'] == {'changes': 3}
+
+    fout = io.StringIO()
+    stats.write_text(fout)
+    assert 'get_all_rrsets' in fout.getvalue()
+
+
+def test_stats_connection_counts_calls_and_bytes():
+    stats = RunStats()
+    fake = count_transfers(FakeRoute53Connection(), stats)
+    con = StatsConnection(fake, stats)
+    fake.add_zone('test.dev')
+
+    assert app.get_zone(con, 'test.dev', {}, cache=app.ZoneCache())
+    assert stats.calls['make_request']['calls'] == 1
+    assert stats.counters['bytes_received'] > 0
+    assert con.calls['ListHostedZonesByName'] == 1
+
+
+def test_load_and_dump_stats_json(tmpdir):
+    con = FakeRoute53Connection(page_size=100)
+    zone_id = con.add_zone('test.dev')
+    records = generate_zone('test.dev', 500, zone_id=zone_id, max_alias_chain=2)
+    zone_file = str(tmpdir.join('zone.csv'))
+    stats_file = str(tmpdir.join('stats.json'))
+    write_zone(records, zone_file)
+
+    run(con, **{'load': True, '<zone>': 'test.dev', '<file>': zone_file,
+                '--stats-json': stats_file})
+    with open(stats_file) as f:
+        report = json.load(f)
+
+    assert report['command'] == 'load'
+    assert report['zone'] == 'test.dev'
+    assert set(report['phases']) == {'zone', 'list', 'parse', 'diff', 'plan', 'commit'}
+    assert report['counters']['records_read'] == len(records)
+    assert report['counters']['changes'] == len(records)
+    assert report['counters']['batches'] == report['api_calls']['change_rrsets']['calls']
+    assert report['pages'] == 1
+    assert report['throttle']['calls'] == report['api_call_count']
+
+    dump_file = str(tmpdir.join('dump.csv'))
+    run(con, **{'dump': True, '<zone>': 'test.dev', '<file>': dump_file,
+                '--stats-json': stats_file})
+    with open(stats_file) as f:
+        report = json.load(f)
+
+    assert report['command'] == 'dump'
+    assert set(report['phases']) == {'zone', 'list', 'write'}
+    assert report['phases']['list']['count'] == report['pages'] + 1
+    assert report['pages'] == 6
+    assert report['counters']['records_written'] == len(records) + 2
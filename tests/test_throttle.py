@@ -0,0 +1,115 @@
+"""
+Unit tests for the Route53 call rate limiting and retries
+"""
+
+from http.client import HTTPException
+
+import pytest
+from boto.route53.exception import DNSServerError
+
+from route53_transfer.throttle import ThrottledConnection, TokenBucket
+from helpers import FakeClock
+
+
+def route53_error(code, status=400):
+    body = (f"<ErrorResponse><Error><Type>Sender</Type><Code>{code}</Code>"
+            f"<Message>{code}</Message></Error></ErrorResponse>")
+    return DNSServerError(status, "Bad Request", body)
+
+
+class FlakyConnection(object):
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+        self.num_retries = 6
+
+    def get_change(self, change_id):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"Id": change_id}
+
+    def change_rrsets(self, hosted_zone_id, xml_body):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"Id": "C1"}
+
+
+def test_token_bucket_paces_requests():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=5, clock=clock, sleep=clock.sleep)
+
+    waits = [bucket.acquire() for _ in range(6)]
+
+    assert waits[0] == 0
+    assert waits[1:] == pytest.approx([0.2] * 5)
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_throttled_calls_are_retried_and_slow_down():
+    con = FlakyConnection([route53_error("Throttling"),
+                           route53_error("PriorRequestNotComplete")])
+    clock = FakeClock()
+    throttled_con = ThrottledConnection(con, rate=4, sleep=clock.sleep)
+
+    assert throttled_con.get_change("C1") == {"Id": "C1"}
+
+    assert con.calls == 3
+    assert con.num_retries == 0
+    assert throttled_con.stats["calls"] == 1
+    assert throttled_con.stats["retries"] == 2
+    assert throttled_con.stats["throttled"] == 2
+    assert throttled_con.stats["wait_seconds"] == pytest.approx(sum(clock.sleeps))
+    assert throttled_con.rate < 4
+
+
+def test_other_errors_are_not_retried():
+    con = FlakyConnection([route53_error("InvalidChangeBatch")])
+    throttled_con = ThrottledConnection(con, sleep=lambda s: None)
+
+    with pytest.raises(DNSServerError):
+        throttled_con.get_change("C1")
+
+    assert con.calls == 1
+    assert throttled_con.stats["retries"] == 0
+
+
+def test_retries_are_limited():
+    con = FlakyConnection([route53_error("Throttling")] * 4)
+    throttled_con = ThrottledConnection(con, max_retries=2, sleep=lambda s: None)
+
+    with pytest.raises(DNSServerError):
+        throttled_con.get_change("C1")
+
+    assert con.calls == 3
+
+
+def test_attributes_are_passed_through():
+    con = FlakyConnection([])
+    throttled_con = ThrottledConnection(con)
+
+    assert throttled_con.num_retries == 0
+    assert throttled_con.connection is con
+
+
+@pytest.mark.parametrize("error", [route53_error("InternalFailure", status=500),
+                                   HTTPException("Connection dropped"),
+                                   ConnectionResetError("Connection reset")])
+def test_changes_are_not_sent_twice(error):
+    con = FlakyConnection([error])
+    throttled_con = ThrottledConnection(con, sleep=lambda s: None)
+
+    with pytest.raises(type(error)):
+        throttled_con.change_rrsets("Z1", "<ChangeBatch/>")
+
+    assert con.calls == 1
+    assert throttled_con.stats["retries"] == 0
+
+
+def test_throttled_changes_are_retried():
+    con = FlakyConnection([route53_error("Throttling")])
+    throttled_con = ThrottledConnection(con, sleep=lambda s: None)
+
+    assert throttled_con.change_rrsets("Z1", "<ChangeBatch/>") == {"Id": "C1"}
+    assert con.calls == 2
@@ -0,0 +1,91 @@
+import contextlib
+import io
+
+import pytest
+from boto.route53.record import Record
+
+from route53_transfer import app
+from route53_transfer.canonical import canonical_record
+from route53_transfer.testing import FakeRoute53Connection, generate_zone
+from route53_transfer.transfer import transfer
+from helpers import to_csv
+
+ELB_ZONE_ID = "Z35SXDOTRQ7X7K"
+
+
+def zone_records(con, zone_id):
+    zone = {"id": zone_id, "name": "test.dev."}
+    return {canonical_record(r) for r in app.skip_apex_soa_ns(zone, con.zone_records(zone_id))}
+
+
+def retargeted(records, source_id, target_id):
+    return {canonical_record(Record(
+        name=r.name, type=r.type, ttl=r.ttl, resource_records=r.resource_records,
+        alias_hosted_zone_id=target_id if r.alias_hosted_zone_id == source_id
+        else r.alias_hosted_zone_id,
+        alias_dns_name=r.alias_dns_name, identifier=r.identifier, weight=r.weight,
+        region=r.region, alias_evaluate_target_health=r.alias_evaluate_target_health,
+        health_check=r.health_check, failover=r.failover)) for r in records}
+
+
+def make_accounts(size):
+    source, target = FakeRoute53Connection(page_size=100), FakeRoute53Connection(page_size=100)
+    # Zone ids are numbered by account, and would otherwise be the same
+    target.add_zone("other.dev")
+    source_id = source.add_zone("test.dev")
+    records = generate_zone("test.dev", size, zone_id=source_id) + [
+        Record(name="lb.test.dev.", type="A", alias_hosted_zone_id=ELB_ZONE_ID,
+               alias_dns_name="my-lb-1234.us-east-1.elb.amazonaws.com.",
+               alias_evaluate_target_health=True)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.load(source, "test.dev", io.StringIO(to_csv(records)))
+    return source, target, source_id
+
+
+def test_transfer_creates_the_zone_and_retargets_aliases():
+    source, target, source_id = make_accounts(2000)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        changes = transfer(source, target, "test.dev")
+    target_zone = app.get_zone(target, "test.dev", {})
+    assert target_zone["id"] != source_id
+
+    expected = retargeted(zone_records(source, source_id), source_id, target_zone["id"])
+    assert changes == len(expected)
+    assert zone_records(target, target_zone["id"]) == expected
+    assert any(r.alias_hosted_zone_id == target_zone["id"] for r in expected)
+    assert any(r.alias_hosted_zone_id == ELB_ZONE_ID for r in expected)
+
+    # A second transfer finds nothing left to change
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert transfer(source, target, "test.dev") == 0
+
+
+def test_dry_run_changes_nothing():
+    source, target, _ = make_accounts(200)
+
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        assert transfer(source, target, "test.dev", dry_run=True) > 0
+    assert out.getvalue().startswith("CREATE ZONE: test.dev\n")
+    assert app.get_zone(target, "test.dev", {}) is None
+    assert not target.calls["ChangeResourceRecordSets"]
+
+
+def test_transfer_command():
+    source, target, source_id = make_accounts(500)
+    params = {'transfer': True, '<zone>': 'test.dev', '--max-rate': '1000',
+              '--access-key-id': 'AKIAFAKE', '--secret-key': 'secret',
+              '--stats-json': None}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.run(dict(params, **{'--use-upsert': True}), con=source, target_con=target)
+    target_zone = app.get_zone(target, "test.dev", {})
+    assert zone_records(target, target_zone["id"]) == \
+        retargeted(zone_records(source, source_id), source_id, target_zone["id"])
+
+
+def test_transfer_needs_target_credentials():
+    params = {'transfer': True, '<zone>': 'test.dev',
+              '--access-key-id': 'AKIAFAKE', '--secret-key': 'secret'}
+    with pytest.raises(SystemExit):
+        app.run(params, con=FakeRoute53Connection())
@@ -2,9 +2,13 @@
 Unit tests for the route53 change batch computation
 """
 
+import pytest
 from boto.route53.record import Record
 
-from route53_transfer.app import changes_to_r53_updates
+from route53_transfer.app import (
+    MAX_BATCH_RECORDS,
+    MAX_BATCH_VALUE_CHARS,
+    changes_to_r53_updates)
 from helpers import to_comparable
 
 
@@ -131,3 +135,197 @@ def test_two_chained_aliases_resolved_in_three_updates():
     change_dict = third_update.changes[0]["change_dict"]
     assert change_dict["name"] == "server3"
     assert change_dict["alias_dns_name"] == "server2"
+
+
+def make_a_record(n, values=1):
+    record = Record()
+    record.type = "A"
+    record.name = f"server{n}"
+    record.resource_records = [f"10.0.{n // 256}.{v}" for v in range(values)]
+    return record
+
+
+def test_large_change_sets_are_split_by_record_count():
+    zone = TEST_ZONE
+
+    change_operations = [
+        {"zone": zone, "operation": "CREATE", "record": to_comparable(make_a_record(n))}
+        for n in range(2500)]
+
+    r53_change_batches = changes_to_r53_updates(zone, change_operations)
+    assert [len(b.changes) for b in r53_change_batches] == [1000, 1000, 500]
+    assert all(b.record_count <= MAX_BATCH_RECORDS for b in r53_change_batches)
+
+
+def test_large_change_sets_are_split_by_value_size():
+    zone = TEST_ZONE
+
+    txt = Record()
+    txt.type = "TXT"
+    txt.name = "big"
+    txt.resource_records = ["x" * 20000]
+
+    other_txt = Record()
+    other_txt.type = "TXT"
+    other_txt.name = "other-big"
+    other_txt.resource_records = ["y" * 20000]
+
+    change_operations = [
+        {"zone": zone, "operation": "CREATE", "record": to_comparable(txt)},
+        {"zone": zone, "operation": "CREATE", "record": to_comparable(other_txt)},
+        {"zone": zone, "operation": "CREATE", "record": to_comparable(make_a_record(1))},
+    ]
+
+    r53_change_batches = changes_to_r53_updates(zone, change_operations)
+    assert len(r53_change_batches) == 2
+    assert all(b.value_chars <= MAX_BATCH_VALUE_CHARS for b in r53_change_batches)
+
+
+def test_replaced_record_changes_stay_in_the_same_batch():
+    zone = TEST_ZONE
+
+    change_operations = []
+    for n in range(600):
+        change_operations.append(
+            {"zone": zone, "operation": "DELETE", "record": to_comparable(make_a_record(n))})
+    for n in range(600):
+        change_operations.append(
+            {"zone": zone, "operation": "CREATE", "record": to_comparable(make_a_record(n, 2))})
+
+    r53_change_batches = changes_to_r53_updates(zone, change_operations)
+    assert len(r53_change_batches) == 2
+
+    for batch in r53_change_batches:
+        deleted = [c["record"].name for c in batch.changes if c["operation"] == "DELETE"]
+        created = [c["record"].name for c in batch.changes if c["operation"] == "CREATE"]
+        assert deleted == created
+        operations = [c["operation"] for c in batch.changes]
+        assert operations == sorted(operations, key=lambda op: op != "DELETE")
+
+
+def batch_of_changes(r53_change_batches):
+    return [(i, c["operation"], c["record"].name.rstrip(".").lower())
+            for i, batch in enumerate(r53_change_batches) for c in batch.changes]
+
+
+def test_changes_to_the_same_name_stay_in_the_same_batch():
+    zone = TEST_ZONE
+
+    cname = Record()
+    cname.type = "CNAME"
+    cname.name = "server0"
+    cname.resource_records = ["server1.test.dev."]
+
+    change_operations = [
+        {"zone": zone, "operation": "DELETE", "record": to_comparable(make_a_record(0))}]
+    # Longer values than the deleted record, which packs it last
+    change_operations += [
+        {"zone": zone, "operation": "CREATE", "record": to_comparable(make_a_record(n))}
+        for n in range(2560, 4060)]
+    change_operations.append(
+        {"zone": zone, "operation": "CREATE", "record": to_comparable(cname)})
+
+    r53_change_batches = changes_to_r53_updates(zone, change_operations)
+    assert len(r53_change_batches) == 2
+    assert all(b.record_count <= MAX_BATCH_RECORDS for b in r53_change_batches)
+    assert {i for i, _, name in batch_of_changes(r53_change_batches) if name == "server0"} == {0}
+
+
+def test_names_with_too_many_changes_are_split_deletes_first():
+    zone = TEST_ZONE
+
+    change_operations = []
+    for identifier in range(800):
+        for operation, values in (("DELETE", 1), ("CREATE", 2)):
+            record = make_a_record(0, values)
+            record.identifier = str(identifier)
+            record.weight = "1"
+            change_operations.append(
+                {"zone": zone, "operation": operation, "record": to_comparable(record)})
+    change_operations.sort(key=lambda c: c["operation"] != "DELETE")
+    change_operations.append(
+        {"zone": zone, "operation": "CREATE", "record": to_comparable(make_a_record(1))})
+
+    r53_change_batches = changes_to_r53_updates(zone, change_operations)
+    assert all(b.record_count <= MAX_BATCH_RECORDS for b in r53_change_batches)
+    changes = batch_of_changes(r53_change_batches)
+    assert len(changes) == len(change_operations)
+    last_delete = max(i for i, operation, _ in changes if operation == "DELETE")
+    first_create = min(i for i, operation, name in changes
+                       if operation == "CREATE" and name == "server0")
+    assert last_delete <= first_create
+
+
+def test_upsert_counts_twice_against_the_limits():
+    zone = TEST_ZONE
+
+    change_operations = [
+        {"zone": zone, "operation": "UPSERT", "record": to_comparable(make_a_record(n))}
+        for n in range(600)]
+
+    r53_change_batches = changes_to_r53_updates(zone, change_operations)
+    assert [len(b.changes) for b in r53_change_batches] == [500, 100]
+
+
+def make_alias(n, target):
+    record = Record()
+    record.type = "A"
+    record.name = f"server{n}"
+    record.alias_hosted_zone_id = str(TEST_ZONE_ID)
+    record.alias_dns_name = target
+    record.alias_evaluate_target_health = False
+    return record
+
+
+def test_deep_alias_chain_in_any_order():
+    zone = TEST_ZONE
+
+    records = [make_a_record(0)] + [make_alias(n, f"server{n - 1}") for n in range(1, 6)]
+    change_operations = [
+        {"zone": zone, "operation": "CREATE", "record": to_comparable(record)}
+        for record in [records[3], records[5], records[0], records[4], records[1], records[2]]]
+
+    r53_change_batches = changes_to_r53_updates(zone, change_operations)
+    assert [[c["record"].name for c in b.changes] for b in r53_change_batches] == \
+        [[f"server{n}"] for n in range(6)]
+
+
+def test_independent_aliases_share_batches():
+    zone = TEST_ZONE
+
+    records = [make_a_record(0), make_a_record(1), make_a_record(2),
+               make_alias(3, "server0."), make_alias(4, "server1"), make_alias(5, "server9")]
+    change_operations = [
+        {"zone": zone, "operation": "CREATE", "record": to_comparable(record)}
+        for record in records]
+
+    r53_change_batches = changes_to_r53_updates(zone, change_operations)
+    assert [sorted(c["record"].name for c in b.changes) for b in r53_change_batches] == \
+        [["server0", "server1", "server2", "server5"], ["server3", "server4"]]
+
+
+def test_deleted_targets_go_with_their_aliases():
+    zone = TEST_ZONE
+
+    change_operations = [
+        {"zone": zone, "operation": "DELETE", "record": to_comparable(make_a_record(0))},
+        {"zone": zone, "operation": "DELETE", "record": to_comparable(make_alias(1, "server0"))},
+        {"zone": zone, "operation": "CREATE", "record": to_comparable(make_a_record(2))},
+        {"zone": zone, "operation": "CREATE", "record": to_comparable(make_alias(3, "server2"))},
+    ]
+
+    r53_change_batches = changes_to_r53_updates(zone, change_operations)
+    assert [sorted(c["record"].name for c in b.changes) for b in r53_change_batches] == \
+        [["server0", "server1", "server2"], ["server3"]]
+
+
+def test_alias_cycle_is_rejected():
+    zone = TEST_ZONE
+
+    change_operations = [
+        {"zone": zone, "operation": "CREATE", "record": to_comparable(make_alias(1, "server2"))},
+        {"zone": zone, "operation": "CREATE", "record": to_comparable(make_alias(2, "server1"))},
+    ]
+
+    with pytest.raises(ValueError, match="server1, server2"):
+        changes_to_r53_updates(zone, change_operations)
@@ -0,0 +1,113 @@
+import contextlib
+import csv
+import io
+import os
+import subprocess
+import sys
+
+from route53_transfer import app
+from route53_transfer.snapshot import write_snapshot
+from route53_transfer.testing import generate_zone
+from route53_transfer.validate import validate_csv, validate_file
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+HEADER = ','.join(app.CSV_HEADER)
+
+
+def write_zone(records, fout):
+    out = csv.writer(fout)
+    out.writerow(app.CSV_HEADER)
+    for record in records:
+        out.writerows(app.record_to_stringlist(record))
+
+
+def test_generated_zone_is_valid():
+    records = generate_zone("test.dev", 500)
+    fout = io.StringIO()
+    write_zone(records, fout)
+    fout.seek(0)
+
+    assert validate_csv(fout) == (len(records), [])
+
+
+def test_problems_are_reported_by_line():
+    zone = "\n".join([
+        HEADER,
+        "www.test.dev.,A,10.0.0.1,300,,,,,",
+        "www.test.dev.,A,10.0.0.2,60,,,,,",
+        "www.test.dev.,A,10.0.0.2,300,,,,,",
+        "api.test.dev.,AA,10.0.0.1,soon,,,,,",
+        "w.test.dev.,A,10.0.0.1,300,,300,,,",
+        "alias.test.dev.,A,ALIAS:Z1,600,,,,,",
+        "cname.test.dev.,CNAME,a.test.dev.,300,,,,,",
+        "cname.test.dev.,CNAME,b.test.dev.,300,,,,,",
+        "short.test.dev.,A,10.0.0.1",
+    ])
+
+    record_count, problems = validate_csv(io.StringIO(zone))
+    assert record_count == 5
+    assert problems == [
+        (3, 'TTL "60" differs from "300" on line 2'),
+        (4, 'duplicate value "10.0.0.2"'),
+        (5, 'unknown type "AA"'),
+        (5, 'TTL "soon" is not a number of seconds'),
+        (6, 'weight "300" is not a number from 0 to 255'),
+        (6, 'weighted, latency and failover records need a SETID'),
+        (7, 'alias values are "ALIAS:<hosted zone id>:<DNS name>"'),
+        (9, 'CNAME records have a single value, see line 8'),
+        (10, 'expected 10 columns, found 3'),
+    ]
+
+
+
+def test_newer_record_types_are_known():
+    zone = "\n".join([
+        HEADER,
+        'test.dev.,HTTPS,"1 . alpn=""h2""",300,,,,,',
+        'svc.test.dev.,SVCB,1 svc.test.dev.,300,,,,,',
+        'host.test.dev.,SSHFP,1 2 123456789abcdef67890123456789abcdef67890123456789abcdef123456789a,300,,,,,',
+        '_443._tcp.test.dev.,TLSA,3 1 1 0123456789abcdef,300,,,,,',
+    ])
+    assert validate_csv(io.StringIO(zone)) == (4, [])
+
+def test_snapshots_are_decoded(tmpdir):
+    records = generate_zone("test.dev", 100)
+    path = str(tmpdir.join("zone.r53s"))
+    with open(path, 'wb') as fout:
+        write_snapshot(records, fout)
+    assert validate_file(path) == (len(records), [])
+
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 1)
+    record_count, problems = validate_file(path)
+    assert problems == [(None, 'corrupt snapshot: Truncated snapshot')]
+
+
+def test_validate_runs_offline(tmpdir):
+    path = str(tmpdir.join("zone.csv"))
+    with open(path, 'w', newline='') as fout:
+        write_zone(generate_zone("test.dev", 50), fout)
+        fout.write("www.test.dev.,A,10.0.0.1,300,,,,,,extra,\n")
+
+    # Neither credentials nor a connection are needed
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        assert app.run({'validate': True, '<file>': path}) == 1
+    assert out.getvalue().endswith(": 50 record sets, 1 problems\n")
+
+
+def test_offline_commands_do_not_import_boto(tmpdir):
+    path = str(tmpdir.join("zone.csv"))
+    with open(path, 'w', newline='') as fout:
+        write_zone(generate_zone("test.dev", 50), fout)
+
+    script = (
+        "import sys\n"
+        "from route53_transfer import app\n"
+        "app.run({'validate': True, '<file>': sys.argv[1]})\n"
+        "app.run({'convert': True, '<file>': sys.argv[1], '<output>': sys.argv[2]})\n"
+        "assert not [m for m in sys.modules if m.split('.')[0] == 'boto'], 'boto imported'\n"
+    )
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.run([sys.executable, '-c', script, path, str(tmpdir.join("zone.r53s"))],
+                   check=True, env=env, stdout=subprocess.DEVNULL)
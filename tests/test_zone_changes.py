@@ -249,3 +249,35 @@ def test_replace_simple_a_record_with_upsert():
     }])
 
 
+def test_upsert_only_pairs_records_of_the_same_type():
+    """
+    An UPSERT replaces a record with the same name, type and set identifier.
+    Records that only share the name must still be deleted and created.
+    """
+    server1_txt = Record()
+    server1_txt.type = "TXT"
+    server1_txt.name = "server1"
+    server1_txt.resource_records = ['"v=spf1 -all"']
+
+    server1_a = Record()
+    server1_a.type = "A"
+    server1_a.name = "server1"
+    server1_a.resource_records = ["1.2.3.4"]
+
+    rrset_before = [server1_txt]
+    rrset_after = [server1_a]
+
+    changes = diff_zone_upsert(rrset_before, rrset_after)
+
+    assert_changes_eq(changes, [
+        {
+            "operation": "DELETE",
+            "zone": TEST_ZONE,
+            "record": server1_txt,
+        },
+        {
+            "operation": "CREATE",
+            "zone": TEST_ZONE,
+            "record": server1_a,
+        }
+    ])
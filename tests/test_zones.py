@@ -0,0 +1,156 @@
+"""
+Unit tests for the hosted zone lookups
+"""
+
+from route53_transfer.app import find_hosted_zones, get_zone
+from route53_transfer.zone_cache import ZoneCache
+from helpers import PagedConnection, StubResponse
+
+
+def make_connection():
+    zones = {f"zone{n:02}.dev": [] for n in range(10)}
+    return PagedConnection(zones, page_size=3)
+
+
+def test_lookup_stops_past_the_zone_name():
+    con = make_connection()
+
+    zones = find_hosted_zones(con, "zone04.dev", False, cache=ZoneCache())
+
+    assert [z["Name"] for z in zones] == ["zone04.dev."]
+    assert con.zone_listings == 1
+
+
+def test_lookup_of_a_missing_zone():
+    con = make_connection()
+
+    zone = get_zone(con, "missing.dev", {"is_private": False}, cache=ZoneCache())
+
+    assert zone is None
+
+
+def test_lookups_of_a_missing_zone_are_not_cached():
+    con = make_connection()
+    cache = ZoneCache()
+
+    assert get_zone(con, "missing.dev", {"is_private": False}, cache=cache) is None
+    assert get_zone(con, "missing.dev", {"is_private": False}, cache=cache) is None
+
+    assert con.zone_listings == 2
+
+
+def test_lookups_are_cached_in_memory():
+    con = make_connection()
+    cache = ZoneCache()
+
+    first = get_zone(con, "zone07.dev", {"is_private": False}, cache=cache)
+    second = get_zone(con, "zone07.dev", {"is_private": False}, cache=cache)
+
+    assert first == second == {"id": "zone07.dev", "name": "zone07.dev."}
+    assert con.zone_listings == 1
+
+
+def test_lookups_are_cached_on_disk(tmp_path):
+    con = make_connection()
+    cache_file = str(tmp_path / "zones.json")
+
+    get_zone(con, "zone07.dev", {"is_private": False}, cache=ZoneCache(cache_file))
+    zone = get_zone(con, "zone07.dev", {"is_private": False}, cache=ZoneCache(cache_file))
+    assert zone["id"] == "zone07.dev"
+    assert con.zone_listings == 1
+
+    # A different account doesn't share the cached lookups
+    con.aws_access_key_id = "AKIAOTHER"
+    get_zone(con, "zone07.dev", {"is_private": False}, cache=ZoneCache(cache_file))
+    assert con.zone_listings == 2
+
+
+def test_stale_lookups_are_refreshed(tmp_path):
+    con = make_connection()
+    cache_file = str(tmp_path / "zones.json")
+
+    get_zone(con, "zone07.dev", {"is_private": False}, cache=ZoneCache(cache_file, ttl=-1))
+    get_zone(con, "zone07.dev", {"is_private": False}, cache=ZoneCache(cache_file, ttl=-1))
+    assert con.zone_listings == 2
+
+
+class PrivateZonesConnection(object):
+    """
+    Route53 connection stub with several private zones sharing one name,
+    each associated with its own list of VPCs
+    """
+    Version = "2013-04-01"
+    aws_access_key_id = "AKIASTUB"
+
+    def __init__(self, zone_name, zone_vpcs, allow_list_by_vpc=True):
+        self.zone_name = zone_name
+        self.zone_vpcs = zone_vpcs
+        self.allow_list_by_vpc = allow_list_by_vpc
+        self.requests = []
+
+    def make_request(self, action, path, headers=None, data='', params=None):
+        self.requests.append(path.split("/")[2])
+
+        if path.endswith("/hostedzonesbyname"):
+            body = "<ListHostedZonesByNameResponse><HostedZones>"
+            for zone_id in self.zone_vpcs:
+                body += (f"<HostedZone><Id>/hostedzone/{zone_id}</Id><Name>{self.zone_name}.</Name>"
+                         f"<Config><PrivateZone>true</PrivateZone></Config></HostedZone>")
+            body += "</HostedZones><IsTruncated>false</IsTruncated></ListHostedZonesByNameResponse>"
+
+        elif path.endswith("/hostedzonesbyvpc"):
+            if not self.allow_list_by_vpc:
+                return StubResponse(b"<ErrorResponse><Error><Code>AccessDenied</Code>"
+                                    b"</Error></ErrorResponse>", status=403)
+            body = "<ListHostedZonesByVPCResponse><HostedZoneSummaries>"
+            for zone_id, vpcs in self.zone_vpcs.items():
+                if params["vpcid"] in vpcs:
+                    body += (f"<HostedZoneSummary><HostedZoneId>{zone_id}</HostedZoneId>"
+                             f"<Name>{self.zone_name}.</Name></HostedZoneSummary>")
+            body += "</HostedZoneSummaries></ListHostedZonesByVPCResponse>"
+
+        else:
+            zone_id = path.split("/")[-1]
+            body = f"<GetHostedZoneResponse><HostedZone><Id>/hostedzone/{zone_id}</Id></HostedZone><VPCs>"
+            for vpc_id in self.zone_vpcs[zone_id]:
+                body += f"<VPC><VPCRegion>eu-west-1</VPCRegion><VPCId>{vpc_id}</VPCId></VPC>"
+            body += "</VPCs></GetHostedZoneResponse>"
+
+        return StubResponse(body.encode())
+
+
+PRIVATE_VPC = {"is_private": True, "region": "eu-west-1", "id": "vpc-2"}
+
+
+def test_private_zone_matches_any_vpc_association():
+    con = PrivateZonesConnection("test.dev", {"Z1": ["vpc-1", "vpc-2"]})
+
+    zone = get_zone(con, "test.dev", PRIVATE_VPC, cache=ZoneCache())
+
+    assert zone == {"id": "Z1", "name": "test.dev."}
+    assert con.requests == ["hostedzonesbyname", "hostedzone"]
+
+
+def test_private_zones_are_matched_by_listing_the_vpc_zones():
+    con = PrivateZonesConnection("test.dev", {
+        "Z1": ["vpc-1"], "Z2": ["vpc-3"], "Z3": ["vpc-3", "vpc-2"], "Z4": ["vpc-4"]})
+    cache = ZoneCache()
+
+    zone = get_zone(con, "test.dev", PRIVATE_VPC, cache=cache)
+    assert zone["id"] == "Z3"
+    assert con.requests == ["hostedzonesbyname", "hostedzonesbyvpc"]
+
+    zone = get_zone(con, "test.dev", PRIVATE_VPC, cache=cache)
+    assert zone["id"] == "Z3"
+    assert len(con.requests) == 2
+
+
+def test_private_zones_fall_back_to_getting_each_zone():
+    con = PrivateZonesConnection("test.dev", {
+        "Z1": ["vpc-1"], "Z2": ["vpc-3"], "Z3": ["vpc-3", "vpc-2"], "Z4": ["vpc-4"]},
+        allow_list_by_vpc=False)
+
+    zone = get_zone(con, "test.dev", PRIVATE_VPC, cache=ZoneCache())
+
+    assert zone["id"] == "Z3"
+    assert sorted(con.requests) == ["hostedzone"] * 4 + ["hostedzonesbyname", "hostedzonesbyvpc"]